@@ -2,23 +2,59 @@
 # EN: Defines API routes and HTTP workflow.
 from __future__ import annotations
 
-from fastapi import APIRouter, Body, HTTPException
+import asyncio
+import json
+from typing import List, Optional
 
-from app.evaluation.evaluator import evaluate_frame
-from app.evaluation.problem_validator import validate_references
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic_core import to_json
+from starlette.concurrency import run_in_threadpool
+
+from app.evaluation.evaluator import evaluate_frame, frame_kpis
+from app.evaluation.problem_validator import DEFAULT_MAX_ERRORS, validate_batch, validate_references
+from app.frame.ingest.batch_ingest import DEFAULT_BATCH_WORKERS, MAX_BATCH_FRAMES, prepare_frames, split_frames
 from app.frame.ingest.problem_adapter import load_problem_frame
+from app.frame.ingest.stream_ingest import DEFAULT_CHUNK_SIZE, IngestError, StreamingFrameBuilder
 from app.frame.models.problem import ProblemFrame, State
+from app.frame.repositories.problem_repo import ProblemRepository
+from app.frame.repositories.write_behind import WriteBehindRepository
 from app.frame.services.frame_manager import FrameManager
+from app.frame.services.frame_view import DEFAULT_LOT_PAGE, MAX_LOT_PAGE, frame_json, lot_page, project_frame
+from app.frame.services.requirements import requirements_report
+from app.frame.services.state_patch import StatePatch
+from app.optimization.jobs import JobManager, OptimizationJob
 from app.optimization.optimizer import optimize_frame
+from app.optimization.sweep import parse_sweep, sweep_frame
+from app.telemetry import REGISTRY, stage
 
 
 router = APIRouter()
-manager = FrameManager()
+# Requests return once the in-memory store is updated; disk writes happen behind.
+manager = FrameManager(WriteBehindRepository(ProblemRepository()))
+jobs = JobManager(manager)
 
 
 @router.get("/health")
 def health() -> dict:
-    return {"status": "ok"}
+    return {"status": "ok", "frame_cache": manager.cache_stats(), "persistence": manager.persistence_stats()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    # Prometheus text format: stage / request / optimizer histograms and
+    # counters, plus cache and write-behind gauges read now.
+    gauges = {}
+    for prefix, stats in (("planner_frame_cache", manager.cache_stats()), ("planner_persistence", manager.persistence_stats())):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"{prefix}_{key}"] = value
+    return REGISTRY.render(gauges)
+
+
+@router.post("/persistence/flush")
+def flush_persistence(timeout: float = Query(default=30.0, gt=0)) -> dict:
+    return {"flushed": manager.flush(timeout=timeout), **manager.persistence_stats()}
 
 
 @router.post("/frame")
@@ -31,12 +67,184 @@ def create_frame(payload: dict = Body(...)) -> dict:
     return {"id": frame_id, "frame": problem_frame}
 
 
-@router.get("/frame/{frame_id}")
-def get_frame(frame_id: str) -> ProblemFrame:
-    frame = manager.get(frame_id)
-    if frame is None:
+@router.post("/frames/batch")
+async def create_frames(
+    request: Request,
+    workers: int = Query(default=DEFAULT_BATCH_WORKERS, ge=1),
+    max_errors: int = Query(default=DEFAULT_MAX_ERRORS, ge=1),
+    atomic: bool = Query(default=False),
+) -> dict:
+    # Body: a JSON array of frames, or one frame per line with an
+    # application/x-ndjson content type. Frames are parsed and validated in a
+    # worker pool and the valid ones are saved as one batch; with atomic=true
+    # nothing is saved unless every frame is valid.
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    try:
+        raws = await run_in_threadpool(split_frames, await request.body(), ndjson)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {exc}")
+    if not raws or len(raws) > MAX_BATCH_FRAMES:
+        raise HTTPException(status_code=400, detail=f"A batch holds 1 to {MAX_BATCH_FRAMES} frames")
+    prepared = await run_in_threadpool(prepare_frames, raws, workers, max_errors)
+    valid = [item for item in prepared if item.ok]
+    failed = len(prepared) - len(valid)
+    ids: list = []
+    if valid and not (atomic and failed):
+        ids = await run_in_threadpool(manager.save_many, [(p.frame, p.index, p.timeline) for p in valid])
+    assigned = iter(ids)
+    frames = []
+    for i, item in enumerate(prepared):
+        if not item.ok:
+            frames.append({"index": i, "error": item.error})
+        elif ids:
+            frames.append({"index": i, "id": next(assigned)})
+        else:
+            frames.append({"index": i, "error": "Not saved: the atomic batch has invalid frames"})
+    return {"saved": len(ids), "failed": failed, "frames": frames}
+
+
+@router.post("/frame/ingest")
+async def ingest_frame(
+    request: Request,
+    chunk_size: int = Query(default=DEFAULT_CHUNK_SIZE, ge=1),
+    max_errors: int = Query(default=DEFAULT_MAX_ERRORS, ge=1),
+) -> dict:
+    # NDJSON body: the first line is the frame (big arrays may be left out),
+    # then one {"section": "orders" | "stocks" | "state.plan" | ..., "record": {...}}
+    # per line. Records are validated per chunk while the body is arriving;
+    # parsing and validation run in the threadpool, off the event loop.
+    builder = None
+    line_no = 0
+    buffer = b""
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            if lines:
+                builder = await run_in_threadpool(_ingest_lines, builder, lines, line_no, chunk_size, max_errors)
+                line_no += len(lines)
+        builder = await run_in_threadpool(_ingest_lines, builder, [buffer], line_no, chunk_size, max_errors)
+        if builder is None:
+            raise ValueError("Empty ingest body")
+        problem_frame = await run_in_threadpool(builder.build)
+        frame_id = await run_in_threadpool(manager.save, problem_frame)
+    except IngestError as exc:
+        raise HTTPException(status_code=400, detail={"message": str(exc), "errors": exc.errors})
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"id": frame_id, "rows": builder.rows}
+
+
+def _ingest_lines(
+    builder: StreamingFrameBuilder | None, lines: List[bytes], line_no: int, chunk_size: int, max_errors: int
+) -> StreamingFrameBuilder | None:
+    # lines follow line number line_no.
+    for offset, line in enumerate(lines, start=1):
+        builder = _ingest_line(builder, line, line_no + offset, chunk_size, max_errors)
+    return builder
+
+
+def _ingest_line(
+    builder: StreamingFrameBuilder | None, line: bytes, line_no: int, chunk_size: int, max_errors: int
+) -> StreamingFrameBuilder | None:
+    if not line.strip():
+        return builder
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Line {line_no}: invalid JSON ({exc.msg})") from None
+    if builder is None:
+        return StreamingFrameBuilder(entry, chunk_size=chunk_size, max_errors=max_errors)
+    if not isinstance(entry, dict) or "section" not in entry:
+        raise ValueError(f"Line {line_no}: expected {{\"section\": ..., \"record\": ...}}")
+    builder.add(entry["section"], entry.get("record"))
+    return builder
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def _json(content: bytes, etag: str) -> Response:
+    return Response(content, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/frame/{frame_id}",
+    response_class=Response,
+    responses={
+        200: {
+            "description": "The ProblemFrame as JSON, or only the paths listed in `fields`; carries an ETag",
+            "content": {"application/json": {}},
+        },
+        304: {"description": "Not modified: If-None-Match matches the current ETag"},
+        400: {"description": "Unknown path in `fields`"},
+        404: {"description": "Frame not found"},
+    },
+)
+def get_frame(frame_id: str, request: Request, fields: Optional[str] = Query(default=None)) -> Response:
+    # fields: comma-separated dotted paths (state.meta, state.lots,
+    # problemData.products, ...) to return only those parts of the frame.
+    view = manager.view(frame_id)
+    if view is None:
         raise HTTPException(status_code=404, detail="Frame not found")
-    return frame
+    frame, etag = view
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    try:
+        with stage("response.serialize"):
+            content = frame_json(frame) if fields is None else to_json(project_frame(frame, fields.split(",")))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _json(content, etag)
+
+
+@router.get("/frame/{frame_id}/lots")
+def get_lots(
+    frame_id: str,
+    request: Request,
+    cursor: int = Query(default=0, ge=0),
+    limit: int = Query(default=DEFAULT_LOT_PAGE, ge=1, le=MAX_LOT_PAGE),
+    product: Optional[str] = Query(default=None),
+    week: Optional[str] = Query(default=None),
+    machine: Optional[str] = Query(default=None),
+) -> Response:
+    # One page of state lots, optionally filtered; follow next_cursor for the
+    # next page. Cursors are only meaningful for the same etag.
+    view = manager.view(frame_id)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    frame, etag = view
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    with stage("response.serialize"):
+        page = lot_page(frame.state.lots, cursor, limit, product=product, week=week, machine=machine)
+        content = to_json({"id": frame_id, **page})
+    return _json(content, etag)
+
+
+@router.get("/frame/{frame_id}/requirements")
+def get_requirements(
+    frame_id: str,
+    source: str = Query(default="demand", pattern="^(demand|plan)$"),
+    kind: Optional[str] = Query(default=None, pattern="^(product|intermediate|purchased)$"),
+) -> dict:
+    try:
+        routing = manager.routing(frame_id)
+        if routing is None:
+            raise HTTPException(status_code=404, detail="Frame not found")
+        return {"id": frame_id, **requirements_report(manager.index(frame_id), routing, source, kind)}
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.post("/frame/{frame_id}/state")
@@ -52,12 +260,56 @@ def update_state(frame_id: str, payload: dict = Body(...)) -> ProblemFrame:
         raise HTTPException(status_code=400, detail=str(exc))
 
 
+@router.patch("/frame/{frame_id}/state")
+def patch_state(frame_id: str, patch: StatePatch) -> dict:
+    # Lot-level inserts / updates / deletes keyed by lot_id; only the touched
+    # lots are validated and the KPIs are updated incrementally.
+    try:
+        result = manager.patch_state(frame_id, patch)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    index = result.index
+    return {
+        "id": frame_id,
+        "inserted": result.table.inserted,
+        "updated": result.table.updated,
+        "deleted": result.table.deleted,
+        "touched_products": [index.products.codes[p] for p in result.products.tolist()],
+        "inventory_rows_updated": result.inventory_rows,
+        "kpis": frame_kpis(index, result.kpis),
+    }
+
+
+@router.get("/frame/{frame_id}/states")
+def list_states(frame_id: str) -> dict:
+    versions = manager.states(frame_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    return {"id": frame_id, "versions": versions}
+
+
+@router.get("/frame/{frame_id}/states/{version}")
+def get_state_version(frame_id: str, version: int) -> State:
+    state = manager.state_version(frame_id, version)
+    if state is None:
+        raise HTTPException(status_code=404, detail="State version not found")
+    return state
+
+
 @router.post("/frame/{frame_id}/validate")
-def validate_frame(frame_id: str) -> dict:
+def validate_frame(
+    frame_id: str,
+    mode: str = Query(default="legacy", pattern="^(legacy|batch)$"),
+    max_errors: int = Query(default=DEFAULT_MAX_ERRORS, ge=0),
+) -> dict:
     frame = manager.get(frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
-    errors = validate_references(frame)
+    if mode == "batch":
+        return validate_batch(frame, manager.index(frame_id), max_errors=max_errors).to_dict()
+    errors = validate_references(frame, manager.index(frame_id))
     return {"valid": not errors, "errors": errors}
 
 
@@ -66,15 +318,97 @@ def evaluate(frame_id: str) -> dict:
     frame = manager.get(frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
-    return evaluate_frame(frame)
+    try:
+        return evaluate_frame(frame, manager.index(frame_id), manager.timeline(frame_id), manager.kpis(frame_id))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.post("/frame/{frame_id}/optimize")
-def optimize(frame_id: str, payload: dict = Body(default=None)) -> dict:
+def optimize(
+    frame_id: str,
+    response: Response,
+    payload: dict = Body(default=None),
+    wait: bool = Query(default=False),
+) -> dict:
     frame = manager.get(frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
+    payload = payload or {}
+    if not wait:
+        try:
+            job = jobs.submit(frame_id, payload)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        response.status_code = 202
+        return job.to_dict()
+    try:
+        result = optimize_frame(frame, payload, manager.index(frame_id), timeline=manager.timeline(frame_id))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if payload.get("commit", True):
+        manager.update_state(frame_id, result["state"])
+    return result
+
+
+@router.post("/frame/{frame_id}/sweep")
+def sweep(frame_id: str, payload: dict = Body(...)) -> dict:
+    # One stored frame, many ScenarioConfig variants: a KPI / penalty table
+    # per variant. The frame and its state are left untouched.
+    if manager.get(frame_id) is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
     try:
-        return optimize_frame(frame, payload or {})
-    except NotImplementedError as exc:
-        raise HTTPException(status_code=501, detail=str(exc))
+        config, scenarios, optimize_config = parse_sweep(payload)
+        result = sweep_frame(
+            scenarios,
+            manager.index(frame_id),
+            manager.timeline(frame_id),
+            mode=config.mode,
+            config=optimize_config,
+            kpis=manager.kpis(frame_id) if config.mode == "evaluate" else None,
+            workers=config.workers,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"id": frame_id, **result}
+
+
+def _get_job(job_id: str) -> OptimizationJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs")
+def list_jobs() -> dict:
+    return {"jobs": [job.to_dict() for job in jobs.list()]}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    return _get_job(job_id).to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> dict:
+    _get_job(job_id)
+    return jobs.cancel(job_id).to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, poll_sec: float = Query(default=0.25, gt=0, le=5)) -> StreamingResponse:
+    job = _get_job(job_id)
+
+    async def stream():
+        cursor = 0
+        while True:
+            events = job.events_since(cursor)
+            cursor += len(events)
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                if event["event"] == "done":
+                    return
+            await asyncio.sleep(poll_sec)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
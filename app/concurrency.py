@@ -0,0 +1,11 @@
+# TR: Surec havuzlari icin ortak baslatma baglami (optimizasyon ve toplu yukleme).
+# EN: Shared start context for process pools (optimization and batch ingest).
+from __future__ import annotations
+
+import multiprocessing
+
+
+def pool_context():
+    # forkserver/spawn: worker processes never inherit the server's threads or locks.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
@@ -0,0 +1,244 @@
+# TR: ScenarioConstraint listesini vektorel ceza cekirdeklerine derler.
+# EN: Compiles the ScenarioConstraint list into vectorized penalty kernels.
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Type
+
+import numpy as np
+
+from app.evaluation.objective import sequence_lots
+from app.frame.compiled.capacity import CapacityTimeline
+from app.frame.compiled.frame_index import MISSING, FrameIndex
+from app.frame.compiled.planning_model import PlanningModel
+from app.frame.models.problem import ScenarioConstraint
+
+HARD_WEIGHT = 1e6   # default penalty per violation unit of a hard constraint
+SOFT_WEIGHT = 1.0   # default penalty per violation unit of a soft constraint
+
+
+@dataclass
+class PlanArrays:
+    # Everything a kernel may look at, for N plans at once. Changeover events
+    # are only sequenced when a kernel asks for them.
+    n_plans: int
+    position: np.ndarray                # (N, P, T) closing stock, negative = backlog
+    load: np.ndarray                    # (N, M, T) busy machine minutes
+    events: Optional[Callable[[], tuple]] = None
+    _changeovers: Optional[tuple] = field(default=None, repr=False)
+
+    def changeovers(self) -> tuple:
+        # (plan row, setup start epoch seconds) of every mold change on a machine.
+        if self._changeovers is None:
+            self._changeovers = self.events() if self.events else (np.zeros(0, dtype=np.intp), np.zeros(0))
+        return self._changeovers
+
+
+@dataclass
+class MoveDelta:
+    # What a local search move changes, for kernels that can score it without
+    # the full plan (see ConstraintKernel.delta).
+    backlog: float              # summed backlog over every (product, week)
+    final_backlog: float        # backlog in the last week
+    overload: float             # machine minutes beyond `capacity`
+    capacity: np.ndarray        # (M, T) capacity the overload is measured against
+
+
+def population_changeovers(
+    model: PlanningModel, qty: np.ndarray, machine: np.ndarray, mold: np.ndarray, priority: np.ndarray
+) -> tuple:
+    n, p, t, start = sequence_lots(model, qty, machine, priority)
+    m, k = machine[n, p, t], mold[n, p, t]
+    keep = (m != MISSING) & (k != MISSING)
+    n, t, m, k, start = n[keep], t[keep], m[keep], k[keep], start[keep]
+    switch = (n[1:] == n[:-1]) & (m[1:] == m[:-1]) & (t[1:] == t[:-1]) & (k[1:] != k[:-1])
+    return n[1:][switch], start[1:][switch]
+
+
+def state_changeovers(index: FrameIndex) -> tuple:
+    # Mold changes between consecutive lots of a machine in the stored state.
+    m, k, start = index.lot_machine, index.lot_mold, index.lot_setup_start
+    rows = np.flatnonzero(index.machines.is_known(m) & (k != MISSING) & ~np.isnan(start))
+    rows = rows[np.lexsort((start[rows], m[rows]))]
+    m, k, start = m[rows], k[rows], start[rows]
+    switch = (m[1:] == m[:-1]) & (k[1:] != k[:-1])
+    return np.zeros(int(switch.sum()), dtype=np.intp), start[1:][switch]
+
+
+class ConstraintKernel(ABC):
+    code = ""
+
+    def __init__(
+        self, constraint: ScenarioConstraint, capacity: np.ndarray, timeline: Optional[CapacityTimeline]
+    ) -> None:
+        self.constraint = constraint
+        hard = constraint.type.lower() == "hard"
+        self.hard = hard
+        default = HARD_WEIGHT if hard else SOFT_WEIGHT
+        self.weight = default if constraint.weight is None else float(constraint.weight)
+        self.scope = (constraint.time_scope or "").upper()
+
+    @abstractmethod
+    def violations(self, plan: PlanArrays) -> np.ndarray:
+        # (N,) violation units per plan.
+        ...
+
+    def delta(self, move: MoveDelta) -> Optional[float]:
+        # Violation change of a local move; None when the full plan is needed.
+        return None
+
+
+KERNELS: Dict[str, Type[ConstraintKernel]] = {}
+
+
+def register(cls: Type[ConstraintKernel]) -> Type[ConstraintKernel]:
+    KERNELS[cls.code] = cls
+    return cls
+
+
+@register
+class DemandSatisfaction(ConstraintKernel):
+    # Units short at the end of each week (time_scope HORIZON: only the last one).
+    code = "DEMAND_SATISFACTION_PER_WEEK"
+
+    def violations(self, plan: PlanArrays) -> np.ndarray:
+        short = np.maximum(-plan.position, 0.0)
+        if self.scope == "HORIZON":
+            return short[..., -1].sum(axis=1) if short.shape[-1] else np.zeros(plan.n_plans)
+        return short.sum(axis=(1, 2))
+
+    def delta(self, move: MoveDelta) -> Optional[float]:
+        return move.final_backlog if self.scope == "HORIZON" else move.backlog
+
+
+@register
+class NoMoldChangeAtNight(ConstraintKernel):
+    # Mold changes whose setup starts inside a shift segment tagged with this code.
+    code = "NO_MOLD_CHANGE_AT_NIGHT"
+
+    def __init__(self, constraint, capacity, timeline) -> None:
+        super().__init__(constraint, capacity, timeline)
+        self.timeline = timeline
+        tagged = timeline is not None and timeline.constraints.get(self.code) != MISSING
+        self.active = tagged and bool(timeline.seg_constraints[:, timeline.constraints.get(self.code)].any())
+
+    def violations(self, plan: PlanArrays) -> np.ndarray:
+        if not self.active:
+            return np.zeros(plan.n_plans)
+        rows, start = plan.changeovers()
+        hit = self.timeline.covered_by(start, self.code)
+        return np.bincount(rows[hit], minlength=plan.n_plans).astype(np.float64)
+
+    def delta(self, move: MoveDelta) -> Optional[float]:
+        # Setup start times shift with every lot ahead on the machine.
+        return None if self.active else 0.0
+
+
+@register
+class ShiftTemplates(ConstraintKernel):
+    # Machine minutes scheduled beyond the shift calendar capacity.
+    code = "SHIFT_TEMPLATES"
+
+    def __init__(self, constraint, capacity, timeline) -> None:
+        super().__init__(constraint, capacity, timeline)
+        self.capacity = capacity
+
+    def violations(self, plan: PlanArrays) -> np.ndarray:
+        return np.maximum(plan.load - self.capacity, 0.0).sum(axis=(1, 2))
+
+    def delta(self, move: MoveDelta) -> Optional[float]:
+        return move.overload if move.capacity is self.capacity else None
+
+
+@dataclass
+class CompiledConstraints:
+    kernels: List[ConstraintKernel]
+    skipped: List[str]          # inactive codes
+    unsupported: List[str]      # active codes without a registered kernel
+
+    def evaluate(self, plan: PlanArrays) -> Dict[str, np.ndarray]:
+        # Per constraint: weighted penalty under its code, raw violations under "{code}_raw".
+        result: Dict[str, np.ndarray] = {}
+        total = np.zeros(plan.n_plans)
+        hard = np.zeros(plan.n_plans)
+        for kernel in self.kernels:
+            raw = kernel.violations(plan)
+            result[kernel.code] = raw * kernel.weight
+            result[f"{kernel.code}_raw"] = raw
+            total = total + result[kernel.code]
+            if kernel.hard:
+                hard = hard + raw
+        result["constraints"] = total
+        result["hard_violations"] = hard
+        return result
+
+    def delta(self, move: MoveDelta) -> Optional[float]:
+        # Weighted penalty change of a local move, None if any kernel needs the full plan.
+        total = 0.0
+        for kernel in self.kernels:
+            raw = kernel.delta(move)
+            if raw is None:
+                return None
+            total += raw * kernel.weight
+        return total
+
+    def evaluate_population(
+        self,
+        model: PlanningModel,
+        qty: np.ndarray,
+        machine: np.ndarray,
+        mold: np.ndarray,
+        priority: np.ndarray,
+        position: np.ndarray,
+        load: np.ndarray,
+    ) -> Dict[str, np.ndarray]:
+        plan = PlanArrays(
+            n_plans=qty.shape[0],
+            position=position,
+            load=load,
+            events=lambda: population_changeovers(model, qty, machine, mold, priority),
+        )
+        return self.evaluate(plan)
+
+    def evaluate_state(self, index: FrameIndex, closing: np.ndarray, busy: np.ndarray) -> Dict[str, float]:
+        plan = PlanArrays(
+            n_plans=1, position=closing[None], load=busy[None], events=lambda: state_changeovers(index)
+        )
+        return {name: float(values[0]) for name, values in self.evaluate(plan).items()}
+
+    def describe(self) -> List[Dict[str, object]]:
+        return [
+            {"code": k.code, "type": "hard" if k.hard else "soft", "weight": k.weight, "time_scope": k.scope or None}
+            for k in self.kernels
+        ]
+
+
+def check_constraints(constraints: List[ScenarioConstraint]) -> None:
+    # Results are keyed by code, so an active code may only appear once.
+    # Needs no frame: callers can reject a scenario before any work starts.
+    seen = set()
+    for constraint in constraints:
+        if not constraint.active:
+            continue
+        if constraint.code in seen:
+            raise ValueError(f"Duplicate active constraint '{constraint.code}'")
+        seen.add(constraint.code)
+
+
+def compile_constraints(
+    constraints: List[ScenarioConstraint],
+    capacity: np.ndarray,
+    timeline: Optional[CapacityTimeline] = None,
+) -> CompiledConstraints:
+    # capacity is the (M, T) machine capacity the plan is checked against.
+    check_constraints(constraints)
+    kernels, skipped, unsupported = [], [], []
+    for constraint in constraints:
+        if not constraint.active:
+            skipped.append(constraint.code)
+        elif constraint.code in KERNELS:
+            kernels.append(KERNELS[constraint.code](constraint, capacity, timeline))
+        else:
+            unsupported.append(constraint.code)
+    return CompiledConstraints(kernels, skipped, unsupported)
@@ -2,21 +2,54 @@
 # EN: Evaluates the problem frame for constraints and KPIs.
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, Optional
 
+from app.evaluation.constraints import compile_constraints
+from app.evaluation.kpi import KpiReport, compute_kpis, kpi_summary
 from app.evaluation.problem_validator import validate_references
+from app.frame.compiled.capacity import CapacityTimeline, machine_capacity
+from app.frame.compiled.frame_index import FrameIndex, build_frame_index
 from app.frame.models.problem import ProblemFrame
+from app.telemetry import stage
 
 
-def evaluate_frame(frame: ProblemFrame) -> Dict[str, object]:
-    errors = validate_references(frame)
-    total_qty = sum(item.qty for item in frame.state.lots)
+def frame_kpis(index: FrameIndex, report: KpiReport) -> Dict[str, object]:
+    return {
+        "lots_count": index.n_lots,
+        "inventory_rows": int(index.inv_product.size),
+        "total_qty": float(index.lot_qty.sum()),
+        **kpi_summary(index, report),
+    }
+
+
+def evaluate_frame(
+    frame: ProblemFrame,
+    index: Optional[FrameIndex] = None,
+    timeline: Optional[CapacityTimeline] = None,
+    kpis: Optional[KpiReport] = None,
+) -> Dict[str, object]:
+    index = index or build_frame_index(frame)
+    with stage("evaluate.validate"):
+        errors = validate_references(frame, index)
+    report = kpis
+    if report is None:
+        with stage("evaluate.kpis"):
+            report = compute_kpis(index, timeline)
+    with stage("evaluate.constraints"):
+        constraints = compile_constraints(frame.scenarioConfig.constraints, machine_capacity(index, timeline), timeline)
+        penalties = constraints.evaluate_state(index, report.closing, report.busy)
     return {
         "valid": not errors,
         "errors": errors,
-        "kpis": {
-            "lots_count": len(frame.state.lots),
-            "inventory_rows": len(frame.state.inventory),
-            "total_qty": total_qty,
+        "kpis": frame_kpis(index, report),
+        "constraints": {
+            "penalty": penalties.pop("constraints"),
+            "hard_violations": penalties.pop("hard_violations"),
+            "breakdown": [
+                {**spec, "violation": penalties[f"{spec['code']}_raw"], "penalty": penalties[spec["code"]]}
+                for spec in constraints.describe()
+            ],
+            "skipped": constraints.skipped,
+            "unsupported": constraints.unsupported,
         },
     }
@@ -0,0 +1,140 @@
+# TR: Plan degerlendirmeleri icin kanonik ozetli, sinirli LRU amac fonksiyonu onbellegi.
+# EN: Bounded LRU cache of plan evaluations keyed on a canonical plan digest.
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.evaluation.objective import ObjectiveWeights, evaluate_population, resolve_options
+from app.frame.compiled.frame_index import MISSING
+from app.frame.compiled.planning_model import PlanningModel
+
+if TYPE_CHECKING:
+    from app.evaluation.constraints import CompiledConstraints
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+def sequence_ranks(
+    model: PlanningModel, qty: np.ndarray, option: np.ndarray, priority: np.ndarray
+) -> np.ndarray:
+    # Only the order of lots within a machine and bucket matters, so priority
+    # keys are replaced by their rank in that group (0 for empty lots).
+    N, _, T = qty.shape
+    ranks = np.zeros(qty.shape, dtype=np.int32)
+    machine, _ = resolve_options(model, option)
+    active = (qty > 0) & (machine != MISSING)
+    n, p, t = np.nonzero(active)
+    if not n.size:
+        return ranks
+    group = (n.astype(np.int64) * model.n_machines + machine[active]) * T + t
+    order = np.lexsort((priority[active], group))
+    sorted_group = group[order]
+    starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+    position = np.arange(order.size) - np.repeat(starts, np.diff(np.r_[starts, order.size]))
+    ranks[n[order], p[order], t[order]] = position
+    return ranks
+
+
+def canonical_plan(
+    model: PlanningModel, qty: np.ndarray, option: np.ndarray, priority: np.ndarray
+) -> np.ndarray:
+    # Genes of empty lots do not affect the objective, so they are zeroed to
+    # let plans that differ only there share one entry. Returns (N, bytes).
+    production = np.maximum(qty, 0.0)
+    active = production > 0
+    N = qty.shape[0]
+    parts = [
+        production.astype(np.float64).reshape(N, -1),
+        np.where(active, option, 0).astype(np.int32).reshape(N, -1),
+        sequence_ranks(model, production, option, priority).reshape(N, -1),
+    ]
+    return np.concatenate([np.ascontiguousarray(part).view(np.uint8) for part in parts], axis=1)
+
+
+def plan_keys(model: PlanningModel, qty: np.ndarray, option: np.ndarray, priority: np.ndarray) -> List[bytes]:
+    rows = canonical_plan(model, qty, option, priority)
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in rows]
+
+
+class FitnessCache:
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._names: Optional[Tuple[str, ...]] = None
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: bytes, values: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = values
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evaluate(
+        self,
+        model: PlanningModel,
+        qty: np.ndarray,
+        option: np.ndarray,
+        priority: np.ndarray,
+        weights: ObjectiveWeights,
+        constraints: Optional["CompiledConstraints"] = None,
+    ) -> Dict[str, np.ndarray]:
+        # Drop-in replacement for evaluate_population; only rows missing from
+        # the cache (deduplicated within the batch) are evaluated. One cache
+        # serves one model / weights / constraint set.
+        if self.max_entries <= 0:
+            self.misses += qty.shape[0]
+            return evaluate_population(model, qty, option, priority, weights, constraints)
+        keys = plan_keys(model, qty, option, priority)
+        rows: Dict[bytes, np.ndarray] = {}
+        pending: Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                rows[key] = cached
+                self.hits += 1
+            elif key in pending:
+                self.hits += 1
+            else:
+                pending[key] = i
+                self.misses += 1
+        if pending:
+            index = np.fromiter(pending.values(), dtype=np.intp, count=len(pending))
+            fresh = evaluate_population(model, qty[index], option[index], priority[index], weights, constraints)
+            if self._names is None:
+                self._names = tuple(fresh)
+            table = np.stack([fresh[name] for name in self._names], axis=1)
+            for key, values in zip(pending, table):
+                rows[key] = values
+                self._store(key, values)
+        matrix = np.stack([rows[key] for key in keys])
+        return {name: matrix[:, j].copy() for j, name in enumerate(self._names)}
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def merge_stats(stats: List[Dict[str, float]]) -> Dict[str, float]:
+    merged = {name: sum(s[name] for s in stats) for name in ("hits", "misses", "evictions", "size", "max_entries")}
+    lookups = merged["hits"] + merged["misses"]
+    merged["hit_rate"] = merged["hits"] / lookups if lookups else 0.0
+    return merged
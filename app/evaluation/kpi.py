@@ -0,0 +1,247 @@
+# TR: Urun x hafta dizileri uzerinde vektorel KPI hesaplari (stok dengesi, karsilama, makespan, kullanim).
+# EN: Vectorized KPIs over product x week arrays (stock balance, fulfillment, makespan, utilization).
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from app.evaluation.objective import inventory_positions, machine_load, resolve_options
+from app.frame.compiled.capacity import CapacityTimeline, machine_capacity
+from app.frame.compiled.frame_index import FrameIndex
+from app.frame.compiled.planning_model import PlanningModel
+
+DEFAULT_MAX_MISMATCHES = 100
+_TOLERANCE = 1e-6
+_INVENTORY_FIELDS = ("opening_stock", "production_qty", "demand", "closing_stock")
+_ALL = slice(None)
+
+# Lot selection for the per-lot helpers: all lots or an array of lot rows.
+Rows = Union[slice, np.ndarray]
+
+
+def stock_balance(initial_stock: np.ndarray, production: np.ndarray, demand: np.ndarray):
+    # Opening / closing positions per (..., P, T); negative positions are backlog.
+    closing = inventory_positions(initial_stock, production, demand)
+    first = np.broadcast_to(initial_stock[..., None], closing[..., :1].shape)
+    opening = np.concatenate([first, closing[..., :-1]], axis=-1)
+    return opening, closing
+
+
+def served_on_time(opening: np.ndarray, production: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    # Backlog is served first (FIFO), so a bucket's own demand only gets what
+    # is left of opening + production.
+    return np.clip(opening + production, 0.0, demand)
+
+
+def lot_buckets(index: FrameIndex, rows: Rows = _ALL) -> np.ndarray:
+    # Lot bucket from its week, else from the bucket containing its process start.
+    week = index.lot_week[rows].copy()
+    unknown = ~index.time_buckets.is_known(week)
+    if unknown.any() and index.bucket_start.size:
+        start = index.lot_process_start[rows][unknown]
+        pos = np.searchsorted(index.bucket_start, start, side="right") - 1
+        inside = (pos >= 0) & (start < index.bucket_end[np.maximum(pos, 0)])
+        week[unknown] = np.where(inside, pos, week[unknown])
+    return week
+
+
+def production_matrix(index: FrameIndex, bucket: Optional[np.ndarray] = None, rows: Rows = _ALL) -> np.ndarray:
+    P, T = index.demand.shape
+    bucket = lot_buckets(index, rows) if bucket is None else bucket
+    product = index.lot_product[rows]
+    valid = index.products.is_known(product) & index.time_buckets.is_known(bucket)
+    flat = product[valid].astype(np.int64) * T + bucket[valid]
+    return np.bincount(flat, weights=index.lot_qty[rows][valid], minlength=P * T).reshape(P, T)
+
+
+def lot_busy_minutes(index: FrameIndex, rows: Rows = _ALL) -> np.ndarray:
+    setup = np.nan_to_num(index.lot_setup_end[rows] - index.lot_setup_start[rows])
+    run = np.nan_to_num(index.lot_process_end[rows] - index.lot_process_start[rows])
+    return (np.maximum(setup, 0.0) + np.maximum(run, 0.0)) / 60.0
+
+
+def machine_busy(index: FrameIndex, bucket: np.ndarray, rows: Rows = _ALL) -> np.ndarray:
+    M, T = index.machine_capacity.shape
+    machine = index.lot_machine[rows]
+    valid = index.machines.is_known(machine) & index.time_buckets.is_known(bucket)
+    flat = machine[valid].astype(np.int64) * T + bucket[valid]
+    return np.bincount(flat, weights=lot_busy_minutes(index, rows)[valid], minlength=M * T).reshape(M, T)
+
+
+def makespan_hours(index: FrameIndex) -> Optional[float]:
+    starts = np.concatenate([index.lot_setup_start, index.lot_process_start, index.bucket_start[:1]])
+    ends = index.lot_process_end[~np.isnan(index.lot_process_end)]
+    if ends.size and not np.isnan(starts).all():
+        return float(ends.max() - np.nanmin(starts)) / 3600.0
+    return None
+
+
+@dataclass
+class KpiReport:
+    production: np.ndarray      # (P, T)
+    demand: np.ndarray          # (P, T)
+    opening: np.ndarray         # (P, T)
+    closing: np.ndarray         # (P, T)
+    served: np.ndarray          # (P, T) demand served in its own bucket
+    busy: np.ndarray            # (M, T) machine minutes
+    capacity: np.ndarray        # (M, T) available machine minutes
+    makespan_hours: Optional[float]
+    mismatches: List[Dict[str, object]]
+    mismatch_count: int
+
+    @property
+    def backlog(self) -> np.ndarray:
+        return np.maximum(-self.closing, 0.0)
+
+    @property
+    def fulfillment_rate(self) -> Optional[float]:
+        total = float(self.demand.sum())
+        return float(self.served.sum()) / total if total > 0 else None
+
+    @property
+    def utilization(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.capacity > 0, self.busy / self.capacity, 0.0)
+
+
+def compute_kpis(
+    index: FrameIndex,
+    timeline: Optional[CapacityTimeline] = None,
+    max_mismatches: int = DEFAULT_MAX_MISMATCHES,
+) -> KpiReport:
+    bucket = lot_buckets(index)
+    production = production_matrix(index, bucket)
+    opening, closing = stock_balance(index.initial_stock, production, index.demand)
+    served = served_on_time(opening, production, index.demand)
+    mismatches, count = check_inventory(index, (opening, production, index.demand, closing), max_mismatches)
+    return KpiReport(
+        production=production,
+        demand=index.demand,
+        opening=opening,
+        closing=closing,
+        served=served,
+        busy=machine_busy(index, bucket),
+        capacity=machine_capacity(index, timeline),
+        makespan_hours=makespan_hours(index),
+        mismatches=mismatches,
+        mismatch_count=count,
+    )
+
+
+def solution_kpis(model: PlanningModel, qty: np.ndarray, option: np.ndarray) -> KpiReport:
+    # Bucket-level KPIs of a search solution straight from its (P, T) arrays,
+    # without building lots; no makespan (lots carry no timestamps yet).
+    production = np.maximum(qty, 0.0)
+    opening, closing = stock_balance(model.initial_stock, production, model.demand)
+    machine, _ = resolve_options(model, option)
+    return KpiReport(
+        production=production,
+        demand=model.demand,
+        opening=opening,
+        closing=closing,
+        served=served_on_time(opening, production, model.demand),
+        busy=machine_load(model, production[None], machine[None])[0],
+        capacity=model.capacity,
+        makespan_hours=None,
+        mismatches=[],
+        mismatch_count=0,
+    )
+
+
+def update_kpis(
+    report: KpiReport,
+    before: FrameIndex,
+    removed: np.ndarray,
+    after: FrameIndex,
+    added: np.ndarray,
+    max_mismatches: int = DEFAULT_MAX_MISMATCHES,
+) -> KpiReport:
+    # Moves the lots removed from `before` and added in `after` out of / into
+    # the production and busy matrices; stock balance is only redone for the
+    # products they touch. Makespan and the inventory cross-check are O(lots)
+    # / O(rows) array passes.
+    production = (
+        report.production - production_matrix(before, rows=removed) + production_matrix(after, rows=added)
+    )
+    busy = (
+        report.busy
+        - machine_busy(before, lot_buckets(before, removed), removed)
+        + machine_busy(after, lot_buckets(after, added), added)
+    )
+    products = touched_products(before, removed, after, added)
+    opening, closing, served = report.opening.copy(), report.closing.copy(), report.served.copy()
+    if products.size:
+        rows_opening, rows_closing = stock_balance(
+            after.initial_stock[products], production[products], report.demand[products]
+        )
+        opening[products], closing[products] = rows_opening, rows_closing
+        served[products] = served_on_time(rows_opening, production[products], report.demand[products])
+    mismatches, count = check_inventory(after, (opening, production, report.demand, closing), max_mismatches)
+    return KpiReport(
+        production=production,
+        demand=report.demand,
+        opening=opening,
+        closing=closing,
+        served=served,
+        busy=busy,
+        capacity=report.capacity,
+        makespan_hours=makespan_hours(after),
+        mismatches=mismatches,
+        mismatch_count=count,
+    )
+
+
+def touched_products(before: FrameIndex, removed: np.ndarray, after: FrameIndex, added: np.ndarray) -> np.ndarray:
+    ids = np.concatenate([before.lot_product[removed], after.lot_product[added]])
+    return np.unique(ids[after.products.is_known(ids)])
+
+
+def inventory_cells(index: FrameIndex):
+    # Reported inventory rows that map onto a known (product, bucket) cell.
+    week = np.where(index.time_buckets.is_known(index.inv_week), index.inv_week, index.inv_bucket)
+    rows = np.flatnonzero(index.products.is_known(index.inv_product) & index.time_buckets.is_known(week))
+    return rows, index.inv_product[rows], week[rows]
+
+
+def check_inventory(index: FrameIndex, expected: tuple, max_mismatches: int = DEFAULT_MAX_MISMATCHES):
+    # Compares reported LotInventory rows against the recomputed balance.
+    rows, p, t = inventory_cells(index)
+    if not rows.size:
+        return [], 0
+    reported = np.stack([index.inv_opening, index.inv_production, index.inv_demand, index.inv_closing])[:, rows]
+    computed = np.stack([values[p, t] for values in expected])
+    bad = np.abs(reported - computed) > _TOLERANCE * np.maximum(1.0, np.abs(computed))
+    pos, field = np.nonzero(bad.T)
+    records = [
+        {
+            "product": index.products.codes[p[i]],
+            "week": index.time_buckets.codes[t[i]],
+            "field": _INVENTORY_FIELDS[f],
+            "reported": float(reported[f, i]),
+            "expected": float(computed[f, i]),
+        }
+        for i, f in zip(pos[:max_mismatches].tolist(), field[:max_mismatches].tolist())
+    ]
+    return records, int(bad.sum())
+
+
+def kpi_summary(index: FrameIndex, report: KpiReport) -> Dict[str, object]:
+    busy, capacity = report.busy.sum(axis=1), report.capacity.sum(axis=1)
+    return {
+        "total_demand": float(report.demand.sum()),
+        "fulfilled_on_time": float(report.served.sum()),
+        "order_fulfillment_rate": report.fulfillment_rate,
+        "backlog_qty": float(report.backlog[:, -1].sum()) if report.backlog.size else 0.0,
+        "backlog_unit_weeks": float(report.backlog.sum()),
+        "ending_stock": float(np.maximum(report.closing[:, -1], 0.0).sum()) if report.closing.size else 0.0,
+        "makespan_hours": report.makespan_hours,
+        "machine_utilization": {
+            code: float(busy[m] / capacity[m]) if capacity[m] > 0 else 0.0
+            for m, code in enumerate(index.machines.codes[: index.n_machines])
+        },
+        "overloaded_buckets": int((report.busy > report.capacity + _TOLERANCE).sum()),
+        "inventory_mismatches": report.mismatch_count,
+        "inventory_mismatch_samples": report.mismatches,
+    }
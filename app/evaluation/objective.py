@@ -0,0 +1,127 @@
+# TR: Plan populasyonunun amac fonksiyonunu tek vektorel geciste hesaplar.
+# EN: Computes the objective of a plan population in one vectorized pass.
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.frame.compiled.frame_index import MISSING
+from app.frame.compiled.planning_model import PlanningModel
+
+if TYPE_CHECKING:
+    from app.evaluation.constraints import CompiledConstraints
+
+COMPONENTS = ("backlog", "holding", "setup", "overload", "changeover")
+
+_FIELD_LIMIT = 1 << 20
+_GROUP_LIMIT = 1 << 23
+
+
+class ObjectiveWeights(BaseModel):
+    backlog: float = 100.0      # per unit short at the end of a bucket
+    holding: float = 1.0        # per unit carried at the end of a bucket
+    setup: float = 50.0         # per produced lot
+    overload: float = 1000.0    # per machine minute above capacity
+    changeover: float = 200.0   # per mold change on a machine within a bucket
+
+
+def inventory_positions(initial_stock: np.ndarray, production: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    # Closing position per bucket; negative values are backlog.
+    return initial_stock[..., None] + np.cumsum(production - demand, axis=-1)
+
+
+def resolve_options(model: PlanningModel, option: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.arange(model.n_products)[:, None]
+    return model.opt_machine[rows, option], model.opt_mold[rows, option]
+
+
+def machine_load(model: PlanningModel, qty: np.ndarray, machine: np.ndarray) -> np.ndarray:
+    # Busy minutes per (individual, machine, bucket) from lot setup + run time.
+    N, P, T = qty.shape
+    M = model.n_machines
+    active = (qty > 0) & (machine != MISSING)
+    minutes = model.setup_min[:, None] + qty * model.unit_min[:, None]
+    n, _, t = np.nonzero(active)
+    flat = (n * M + machine[active]) * T + t
+    load = np.bincount(flat, weights=minutes[active], minlength=N * M * T)
+    return load.reshape(N, M, T)
+
+
+def sequence_lots(
+    model: PlanningModel, qty: np.ndarray, machine: np.ndarray, priority: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Lots (qty > 0) ordered by individual, machine, bucket and priority and
+    # laid back to back from the bucket start. Returns (n, p, t, setup start
+    # in epoch seconds; NaN for lots without a machine).
+    n, p, t = np.nonzero(qty > 0)
+    m = machine[n, p, t]
+    order = np.lexsort((priority[n, p, t], t, m, n))
+    n, p, t, m = n[order], p[order], t[order], m[order]
+    duration = np.where(m != MISSING, (model.setup_min[p] + qty[n, p, t] * model.unit_min[p]) * 60.0, 0.0)
+    group_start = np.r_[True, (n[1:] != n[:-1]) | (m[1:] != m[:-1]) | (t[1:] != t[:-1])]
+    ends = np.cumsum(duration)
+    offset = ends - duration - np.maximum.accumulate(np.where(group_start, ends - duration, 0.0))
+    start = model.bucket_start[t] + offset
+    start[m == MISSING] = np.nan
+    return n, p, t, start
+
+
+def count_changeovers(
+    qty: np.ndarray, machine: np.ndarray, mold: np.ndarray, priority: np.ndarray, n_machines: int
+) -> np.ndarray:
+    # Lots on a machine within a bucket run in ascending priority (a key in
+    # [0, 1)); each switch between two different molds counts as one changeover.
+    N, _, T = qty.shape
+    active = (qty > 0) & (machine != MISSING) & (mold != MISSING)
+    n, _, t = np.nonzero(active)
+    if not n.size:
+        return np.zeros(N)
+    group = (n.astype(np.int64) * n_machines + machine[active]) * T + t
+    k = mold[active].astype(np.int64)
+    if N * n_machines * T < _GROUP_LIMIT and int(k.max()) < _FIELD_LIMIT:
+        # Pack (group, priority, mold) into one int64 so a plain value sort replaces lexsort.
+        rank = np.minimum((priority[active] * _FIELD_LIMIT).astype(np.int64), _FIELD_LIMIT - 1)
+        packed = np.sort((group << 40) | (rank << 20) | k)
+        group, k = packed >> 40, packed & (_FIELD_LIMIT - 1)
+    else:
+        order = np.lexsort((priority[active], group))
+        group, k = group[order], k[order]
+    switches = (group[1:] == group[:-1]) & (k[1:] != k[:-1])
+    return np.bincount(group[1:][switches] // (n_machines * T), minlength=N).astype(np.float64)
+
+
+def evaluate_population(
+    model: PlanningModel,
+    qty: np.ndarray,
+    option: np.ndarray,
+    priority: np.ndarray,
+    weights: ObjectiveWeights,
+    constraints: Optional["CompiledConstraints"] = None,
+) -> Dict[str, np.ndarray]:
+    # qty/option/priority are (N, P, T); every returned array is (N,).
+    production = np.maximum(qty, 0.0)
+    machine, mold = resolve_options(model, option)
+    position = inventory_positions(model.initial_stock, production, model.demand)
+    load = machine_load(model, production, machine)
+
+    raw = {
+        "backlog": np.maximum(-position, 0.0).sum(axis=(1, 2)),
+        "holding": np.maximum(position, 0.0).sum(axis=(1, 2)),
+        "setup": (production > 0).sum(axis=(1, 2)).astype(np.float64),
+        "overload": np.maximum(load - model.capacity, 0.0).sum(axis=(1, 2)),
+        "changeover": count_changeovers(production, machine, mold, priority, model.n_machines),
+    }
+    result = {name: raw[name] * getattr(weights, name) for name in COMPONENTS}
+    result["objective"] = sum(result[name] for name in COMPONENTS)
+    result.update({f"{name}_raw": raw[name] for name in COMPONENTS})
+    if constraints is not None and constraints.kernels:
+        penalties = constraints.evaluate_population(model, production, machine, mold, priority, position, load)
+        result["objective"] = result["objective"] + penalties["constraints"]
+        result.update(penalties)
+    return result
+
+
+def breakdown_at(result: Dict[str, np.ndarray], row: int) -> Dict[str, float]:
+    return {name: float(values[row]) for name, values in result.items()}
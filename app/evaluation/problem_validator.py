@@ -2,85 +2,176 @@
 # EN: Runs reference and consistency checks.
 from __future__ import annotations
 
-from typing import List
-
-from app.frame.models.problem import PlanItem, ProblemFrame
-
-
-def validate_references(frame: ProblemFrame) -> List[str]:
-    errors: List[str] = []
-
-    process_codes = {p.code for p in frame.problemData.processes}
-    product_codes = {p.code for p in frame.problemData.products}
-    time_bucket_ids = {tb.id for tb in frame.problemData.time_buckets}
-    machine_ids = {str(m.id) for m in frame.problemData.resources.machine}
-    mold_codes = {mold.code for mold in frame.problemData.resources.mold}
-
-    for order_group in frame.problemData.orders:
-        if order_group.product_code not in product_codes:
-            errors.append(f"orders reference unknown product {order_group.product_code}")
-        for order in order_group.orders:
-            if order.week not in time_bucket_ids:
-                errors.append(f"orders reference unknown time bucket {order.week}")
-
-    for stock in frame.problemData.stocks:
-        if stock.product_code not in product_codes:
-            errors.append(f"stocks reference unknown product {stock.product_code}")
-
-    for product in frame.problemData.products:
-        for step in product.process_data:
-            if step.process_code not in process_codes:
-                errors.append(f"product {product.code} step {step.step_no} refers to unknown process {step.process_code}")
-
-    for machine in frame.problemData.resources.machine:
-        if machine.process_code not in process_codes:
-            errors.append(f"machine {machine.id} refers to unknown process {machine.process_code}")
-
-    for mold in frame.problemData.resources.mold:
-        if mold.process_code not in process_codes:
-            errors.append(f"mold {mold.code} refers to unknown process {mold.process_code}")
-
-    allowed_machine_mold = {
-        (str(pair.machine_id), pair.mold_code, pair.process_code)
-        for pair in frame.problemData.compatibility.machine_mold_pairs
-    }
-    allowed_product_mold = {
-        (pm.product_code, pm.process_code, mold)
-        for pm in frame.problemData.compatibility.product_molds
-        for mold in pm.allowed_molds
-    }
-
-    def _check_plan_item(item: PlanItem) -> None:
-        for res in item.resources:
-            if res.type == "machine" and str(res.id) not in machine_ids:
-                errors.append(f"plan {item.lot_id or 'n/a'} refers to unknown machine {res.id}")
-            if res.type == "mold" and res.id not in mold_codes:
-                errors.append(f"plan {item.lot_id or 'n/a'} refers to unknown mold {res.id}")
-            if res.type == "mold":
-                machine_id = str(next((r.id for r in item.resources if r.type == "machine"), ""))
-                triple = (machine_id, res.id, item.process_code)
-                if allowed_machine_mold and triple not in allowed_machine_mold:
-                    errors.append(f"plan {item.lot_id or 'n/a'} uses incompatible machine/mold/process {triple}")
-                if allowed_product_mold and (item.product_code, item.process_code, res.id) not in allowed_product_mold:
-                    errors.append(
-                        f"plan {item.lot_id or 'n/a'} uses mold {res.id} not allowed for product {item.product_code}"
-                    )
-        if item.week and item.week not in time_bucket_ids:
-            errors.append(f"plan {item.lot_id or 'n/a'} references unknown time bucket {item.week}")
-        if item.product_code not in product_codes:
-            errors.append(f"plan {item.lot_id or 'n/a'} references unknown product {item.product_code}")
-        if item.process_code not in process_codes:
-            errors.append(f"plan {item.lot_id or 'n/a'} references unknown process {item.process_code}")
-
-    for plan_item in frame.state.lots:
-        _check_plan_item(plan_item)
-
-    for inventory in frame.state.inventory:
-        if inventory.product_code not in product_codes:
-            errors.append(f"inventory row references unknown product {inventory.product_code}")
-        if inventory.week and inventory.week not in time_bucket_ids:
-            errors.append(f"inventory row references unknown time bucket {inventory.week}")
-        if inventory.time_bucket_id and inventory.time_bucket_id not in time_bucket_ids:
-            errors.append(f"inventory row references unknown time bucket {inventory.time_bucket_id}")
-
-    return errors
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.frame.compiled.frame_index import MISSING, RES_MACHINE, RES_MOLD, FrameIndex, Interner, build_frame_index
+from app.frame.models.problem import ProblemFrame
+
+DEFAULT_MAX_ERRORS = 100
+
+_MESSAGES = {
+    ("orders", "UNKNOWN_PRODUCT"): "orders reference unknown product {ref}",
+    ("orders", "UNKNOWN_TIME_BUCKET"): "orders reference unknown time bucket {ref}",
+    ("stocks", "UNKNOWN_PRODUCT"): "stocks reference unknown product {ref}",
+    ("product_step", "UNKNOWN_PROCESS"): "product {id} step {step_no} refers to unknown process {ref}",
+    ("machine", "UNKNOWN_PROCESS"): "machine {id} refers to unknown process {ref}",
+    ("mold", "UNKNOWN_PROCESS"): "mold {id} refers to unknown process {ref}",
+    ("plan", "UNKNOWN_MACHINE"): "plan {id} refers to unknown machine {ref}",
+    ("plan", "UNKNOWN_MOLD"): "plan {id} refers to unknown mold {ref}",
+    ("plan", "INCOMPATIBLE_MACHINE_MOLD"): "plan {id} uses incompatible machine/mold/process {ref}",
+    ("plan", "MOLD_NOT_ALLOWED_FOR_PRODUCT"): "plan {id} uses mold {ref} not allowed for product {product}",
+    ("plan", "UNKNOWN_TIME_BUCKET"): "plan {id} references unknown time bucket {ref}",
+    ("plan", "UNKNOWN_PRODUCT"): "plan {id} references unknown product {ref}",
+    ("plan", "UNKNOWN_PROCESS"): "plan {id} references unknown process {ref}",
+    ("inventory", "UNKNOWN_PRODUCT"): "inventory row references unknown product {ref}",
+    ("inventory", "UNKNOWN_TIME_BUCKET"): "inventory row references unknown time bucket {ref}",
+}
+
+
+@dataclass
+class ValidationReport:
+    errors: List[Dict[str, object]] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)
+    max_errors: Optional[int] = DEFAULT_MAX_ERRORS
+
+    @property
+    def valid(self) -> bool:
+        return not self.counts
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.errors)
+
+    def messages(self) -> List[str]:
+        return [format_issue(issue) for issue in self.errors]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "valid": self.valid,
+            "errors": self.errors,
+            "error_counts": self.counts,
+            "total_errors": self.total,
+            "truncated": self.truncated,
+        }
+
+
+def format_issue(issue: Dict[str, object]) -> str:
+    return _MESSAGES[(issue["entity"], issue["code"])].format(**issue)
+
+
+class _Collector:
+    def __init__(self, report: ValidationReport) -> None:
+        self.report = report
+
+    def add(self, entity: str, code: str, mask: np.ndarray, build) -> None:
+        rows = np.flatnonzero(mask)
+        if not rows.size:
+            return
+        key = f"{entity}.{code}"
+        self.report.counts[key] = self.report.counts.get(key, 0) + int(rows.size)
+        cap = self.report.max_errors
+        take = rows if cap is None else rows[: max(cap - len(self.report.errors), 0)]
+        for row in take.tolist():
+            self.report.errors.append({"code": code, "entity": entity, **build(row)})
+
+
+def _unknown(interner: Interner, ids: np.ndarray) -> np.ndarray:
+    return (ids != MISSING) & ~interner.is_known(ids)
+
+
+def _check_plan(out: _Collector, index: FrameIndex) -> None:
+    products, processes, buckets = index.products, index.processes, index.time_buckets
+    machines, molds = index.machines, index.molds
+
+    def lot(row: int) -> str:
+        return index.lot_ids[row] or "n/a"
+
+    res_lot, res_ref = index.res_lot, index.res_ref
+    is_machine = index.res_kind == RES_MACHINE
+    is_mold = index.res_kind == RES_MOLD
+    out.add("plan", "UNKNOWN_MACHINE", is_machine & _unknown(machines, res_ref),
+            lambda r: {"id": lot(res_lot[r]), "ref": machines.codes[res_ref[r]]})
+    out.add("plan", "UNKNOWN_MOLD", is_mold & _unknown(molds, res_ref),
+            lambda r: {"id": lot(res_lot[r]), "ref": molds.codes[res_ref[r]]})
+
+    res_machine = index.lot_machine[res_lot]
+    res_process = index.lot_process[res_lot]
+    compat = index.compat
+    if compat.restricts_pairs:
+        out.add("plan", "INCOMPATIBLE_MACHINE_MOLD", is_mold & ~compat.pair_allowed(res_machine, res_ref, res_process),
+                lambda r: {
+                    "id": lot(res_lot[r]),
+                    "ref": (machines.code(res_machine[r]) or "", molds.codes[res_ref[r]], processes.codes[res_process[r]]),
+                })
+    if compat.restricts_products:
+        res_product = index.lot_product[res_lot]
+        out.add("plan", "MOLD_NOT_ALLOWED_FOR_PRODUCT", is_mold & ~compat.mold_allowed(res_product, res_process, res_ref),
+                lambda r: {
+                    "id": lot(res_lot[r]),
+                    "ref": molds.codes[res_ref[r]],
+                    "product": products.codes[res_product[r]],
+                })
+
+    out.add("plan", "UNKNOWN_TIME_BUCKET", _unknown(buckets, index.lot_week),
+            lambda r: {"id": lot(r), "ref": buckets.codes[index.lot_week[r]]})
+    out.add("plan", "UNKNOWN_PRODUCT", _unknown(products, index.lot_product),
+            lambda r: {"id": lot(r), "ref": products.codes[index.lot_product[r]]})
+    out.add("plan", "UNKNOWN_PROCESS", _unknown(processes, index.lot_process),
+            lambda r: {"id": lot(r), "ref": processes.codes[index.lot_process[r]]})
+
+
+def validate_batch(
+    frame: ProblemFrame,
+    index: Optional[FrameIndex] = None,
+    max_errors: Optional[int] = DEFAULT_MAX_ERRORS,
+) -> ValidationReport:
+    index = index or build_frame_index(frame)
+    report = ValidationReport(max_errors=max_errors)
+    out = _Collector(report)
+    products, processes, buckets = index.products, index.processes, index.time_buckets
+    machines, molds = index.machines, index.molds
+
+    out.add("orders", "UNKNOWN_PRODUCT", _unknown(products, index.group_product),
+            lambda r: {"id": r, "ref": products.codes[index.group_product[r]]})
+    out.add("orders", "UNKNOWN_TIME_BUCKET", _unknown(buckets, index.order_week),
+            lambda r: {"id": products.codes[index.order_product[r]], "ref": buckets.codes[index.order_week[r]]})
+    out.add("stocks", "UNKNOWN_PRODUCT", _unknown(products, index.stock_product),
+            lambda r: {"id": r, "ref": products.codes[index.stock_product[r]]})
+    out.add("product_step", "UNKNOWN_PROCESS", _unknown(processes, index.step_process),
+            lambda r: {
+                "id": products.codes[index.step_product[r]],
+                "step_no": int(index.step_no[r]),
+                "ref": processes.codes[index.step_process[r]],
+            })
+    out.add("machine", "UNKNOWN_PROCESS", _unknown(processes, index.machine_process),
+            lambda r: {"id": machines.codes[r], "ref": processes.codes[index.machine_process[r]]})
+    out.add("mold", "UNKNOWN_PROCESS", _unknown(processes, index.mold_process),
+            lambda r: {"id": molds.codes[r], "ref": processes.codes[index.mold_process[r]]})
+
+    _check_plan(out, index)
+
+    out.add("inventory", "UNKNOWN_PRODUCT", _unknown(products, index.inv_product),
+            lambda r: {"id": r, "ref": products.codes[index.inv_product[r]]})
+    for column in (index.inv_week, index.inv_bucket):
+        out.add("inventory", "UNKNOWN_TIME_BUCKET", _unknown(buckets, column),
+                lambda r, column=column: {"id": r, "ref": buckets.codes[column[r]]})
+
+    return report
+
+
+def validate_plan(index: FrameIndex, max_errors: Optional[int] = DEFAULT_MAX_ERRORS) -> ValidationReport:
+    # Plan checks only, e.g. on an index holding just the lots of a state patch.
+    report = ValidationReport(max_errors=max_errors)
+    _check_plan(_Collector(report), index)
+    return report
+
+
+def validate_references(frame: ProblemFrame, index: Optional[FrameIndex] = None) -> List[str]:
+    return validate_batch(frame, index, max_errors=None).messages()
@@ -0,0 +1,2 @@
+# TR: Derlenmis (tamsayi kodlu) cerceve indeksleri paket girisi.
+# EN: Compiled (integer-interned) frame index package entry.
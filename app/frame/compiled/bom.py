@@ -0,0 +1,253 @@
+# TR: Urun rotalarini (process_data) seyrek bir malzeme ihtiyac matrisine derler; MRP patlatma ve netleme.
+# EN: Compiles product routings (process_data) into a sparse material requirements matrix; MRP explosion and netting.
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.frame.compiled.frame_index import FrameIndex, Interner
+from app.frame.models.plan_table import csr_take
+from app.frame.models.problem import ProblemFrame, ProcessStep
+
+MAT_PRODUCT = 0
+MAT_INTERMEDIATE = 1
+MAT_PURCHASED = 2
+KIND_NAMES = ("product", "intermediate", "purchased")
+
+DEFAULT_BUCKET_DAYS = 7.0
+WAIT_DAYS = {
+    "MIN": 1 / 1440, "MINUTE": 1 / 1440, "DAKIKA": 1 / 1440, "DK": 1 / 1440,
+    "HOUR": 1 / 24, "SAAT": 1 / 24,
+    "DAY": 1.0, "GUN": 1.0,
+    "WEEK": 7.0, "HAFTA": 7.0,
+}
+
+
+def wait_days(value: float, unit: str) -> float:
+    key = (unit or "DAY").strip().upper().replace("\u00dc", "U")
+    if key not in WAIT_DAYS:
+        raise ValueError(f"Unknown wait_unit '{unit}'")
+    return float(value or 0.0) * WAIT_DAYS[key]
+
+
+@dataclass
+class Routing:
+    # Material ids: products first (same ids as FrameIndex.products; a
+    # product's last step outputs the product itself), then intermediate step
+    # outputs and purchased inputs in order of appearance.
+    materials: Interner
+    kind: np.ndarray            # (Mat,) MAT_* per material
+    level: np.ndarray           # (Mat,) low-level code: longest routing path from a product
+    stock: np.ndarray           # (Mat,) on-hand quantity from problemData.stocks
+    step_material: np.ndarray   # (S,) material output by each FrameIndex step row
+    # Direct edges: one unit of parent needs coef units of child, lead buckets earlier.
+    edge_parent: np.ndarray
+    edge_child: np.ndarray
+    edge_lead: np.ndarray
+    edge_coef: np.ndarray
+    # Total requirements per unit of product output, sorted by material; a
+    # column is lead * n_products + product (see explode).
+    req_material: np.ndarray
+    req_column: np.ndarray
+    req_coef: np.ndarray
+    n_leads: int
+
+    @property
+    def n_products(self) -> int:
+        return self.materials.known
+
+    @property
+    def n_materials(self) -> int:
+        return len(self.materials)
+
+
+def _bucket_days(index: FrameIndex) -> float:
+    length = (index.bucket_end - index.bucket_start) / 86400.0
+    length = length[np.isfinite(length) & (length > 0)]
+    return float(np.median(length)) if length.size else DEFAULT_BUCKET_DAYS
+
+
+def _levels(n: int, parent: np.ndarray, child: np.ndarray) -> np.ndarray:
+    # Longest path from any root; more than n relaxations means a cycle.
+    level = np.zeros(n, dtype=np.int32)
+    for _ in range(n + 1):
+        before = level.copy()
+        np.maximum.at(level, child, level[parent] + 1)
+        if np.array_equal(level, before):
+            return level
+    raise ValueError("Routing contains a material cycle")
+
+
+def _aggregate(material, root, lead, coef, n_roots: int, n_leads: int):
+    key = (material.astype(np.int64) * n_roots + root) * n_leads + lead
+    unique, inverse = np.unique(key, return_inverse=True)
+    total = np.bincount(inverse, weights=coef, minlength=unique.size)
+    return unique // (n_roots * n_leads), (unique // n_leads) % n_roots, unique % n_leads, total
+
+
+def _total_requirements(
+    n_materials: int, n_products: int, parent: np.ndarray, child: np.ndarray, lead: np.ndarray, coef: np.ndarray,
+    depth: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # Every routing path from a product, summed per (material, product, lead);
+    # one pass per level, each expanding the whole frontier through the edges.
+    order = np.argsort(parent, kind="stable")
+    parent, child, lead, coef = parent[order], child[order], lead[order], coef[order]
+    offsets = np.searchsorted(parent, np.arange(n_materials + 1)).astype(np.int64)
+    n_leads = int(depth * (lead.max(initial=0)) + 1)
+    frontier = (np.arange(n_products), np.arange(n_products), np.zeros(n_products, dtype=np.int64), np.ones(n_products))
+    parts = [frontier]
+    for _ in range(depth):
+        material, root, at, amount = frontier
+        positions, new_offsets = csr_take(offsets, material)
+        if not positions.size:
+            break
+        rows = np.repeat(np.arange(material.size), np.diff(new_offsets))
+        frontier = _aggregate(
+            child[positions], root[rows], at[rows] + lead[positions], amount[rows] * coef[positions], n_products, n_leads
+        )
+        parts.append(frontier)
+    material, root, at, amount = _aggregate(*(np.concatenate(cols) for cols in zip(*parts)), n_products, n_leads)
+    n_leads = int(at.max(initial=0)) + 1
+    return material, at * n_products + root, amount, n_leads
+
+
+def build_routing(frame: ProblemFrame, index: FrameIndex) -> Routing:
+    # Per step: run = output / yield_factor; each declared input needs
+    # qty_per_output_unit * (1 + scrap_factor) per run unit. A step that does
+    # not list the previous step's output consumes it one to one. Inputs are
+    # needed wait_time (rounded up to buckets) before the step's output.
+    data = frame.problemData
+    P = index.products.known
+    materials = Interner(index.products.codes[:P])
+    bucket = _bucket_days(index)
+    # (product, [(FrameIndex step row, step)] in step_no order); step rows
+    # follow build_frame_index's flattening.
+    routings: List[Tuple[int, List[Tuple[int, ProcessStep]]]] = []
+    row = 0
+    for product in data.products:
+        steps = sorted(range(len(product.process_data)), key=lambda i: product.process_data[i].step_no)
+        routings.append((index.products.get(product.code), [(row + i, product.process_data[i]) for i in steps]))
+        row += len(product.process_data)
+
+    # Outputs first, so that inputs referring to another routing's output
+    # resolve to that material rather than a purchased one.
+    step_material = np.zeros(row, dtype=np.int32)
+    for pid, steps in routings:
+        for pos, (step_row, step) in enumerate(steps):
+            if pos == len(steps) - 1:
+                materials.ids.setdefault(step.output_material, pid)
+                step_material[step_row] = pid
+            else:
+                step_material[step_row] = materials.intern(step.output_material)
+    produced = np.unique(step_material)
+
+    edges: Dict[Tuple[int, int, int], float] = {}
+    for _, steps in routings:
+        previous = None
+        for step_row, step in steps:
+            out = int(step_material[step_row])
+            run = 1.0 / step.yield_factor if step.yield_factor > 0 else 1.0
+            lead = math.ceil(wait_days(step.wait_time, step.wait_unit) / bucket - 1e-9)
+            inputs = [(materials.intern(i.material_code), i.qty_per_output_unit * (1.0 + i.scrap_factor)) for i in step.inputs]
+            if previous is not None and previous not in {m for m, _ in inputs}:
+                inputs.append((previous, 1.0))
+            for material, qty in inputs:
+                if material != out:
+                    key = (out, material, lead)
+                    edges[key] = edges.get(key, 0.0) + qty * run
+            previous = out
+
+    n = len(materials)
+    keys = np.array(list(edges), dtype=np.int64).reshape(-1, 3)
+    parent, child, lead = keys[:, 0], keys[:, 1], keys[:, 2]
+    coef = np.fromiter(edges.values(), dtype=np.float64, count=len(edges))
+    level = _levels(n, parent, child)
+    kind = np.full(n, MAT_PURCHASED, dtype=np.int8)
+    kind[produced] = MAT_INTERMEDIATE
+    kind[:P] = MAT_PRODUCT
+
+    stock = np.zeros(n)
+    codes = [index.products.code(p) for p in index.stock_product.tolist()]
+    ids = np.fromiter((materials.get(code) for code in codes), dtype=np.int64, count=len(codes))
+    has = ids >= 0
+    np.add.at(stock, ids[has], index.stock_qty[has])
+
+    req_material, req_column, req_coef, n_leads = _total_requirements(
+        n, P, parent, child, lead, coef, int(level.max(initial=0))
+    )
+    return Routing(
+        materials=materials,
+        kind=kind,
+        level=level,
+        stock=stock,
+        step_material=step_material,
+        edge_parent=parent,
+        edge_child=child,
+        edge_lead=lead,
+        edge_coef=coef,
+        req_material=req_material,
+        req_column=req_column,
+        req_coef=req_coef,
+        n_leads=n_leads,
+    )
+
+
+def shift_earlier(qty: np.ndarray, lead: int) -> np.ndarray:
+    # Requirement in bucket t for output in t + lead; what falls before the
+    # horizon is due in bucket 0.
+    if lead <= 0:
+        return qty.copy()
+    out = np.zeros_like(qty)
+    T = qty.shape[-1]
+    out[..., 0] = qty[..., : lead + 1].sum(axis=-1)
+    out[..., 1: max(T - lead, 1)] = qty[..., lead + 1:]
+    return out
+
+
+def explode(routing: Routing, output: np.ndarray) -> np.ndarray:
+    # Gross quantity of every material per bucket for product output
+    # (..., P, T), leading axes (candidate plans) included: one sparse
+    # product of the total requirements matrix with the lead-shifted output.
+    P = routing.n_products
+    shifted = np.stack([shift_earlier(output, k) for k in range(routing.n_leads)], axis=-3)
+    flat = shifted.reshape(output.shape[:-2] + (routing.n_leads * P, output.shape[-1]))
+    terms = flat[..., routing.req_column, :] * routing.req_coef[:, None]
+    gross = np.zeros(output.shape[:-2] + (routing.n_materials, output.shape[-1]))
+    if routing.req_material.size:
+        starts = np.flatnonzero(np.r_[True, routing.req_material[1:] != routing.req_material[:-1]])
+        gross[..., routing.req_material[starts], :] = np.add.reduceat(terms, starts, axis=-2)
+    return gross
+
+
+def net_against_stock(gross: np.ndarray, stock: np.ndarray) -> np.ndarray:
+    # Per bucket requirement left after on-hand stock is used up in time order.
+    cum = np.cumsum(gross, axis=-1)
+    return np.diff(cum - np.minimum(cum, stock[..., None]), axis=-1, prepend=0.0)
+
+
+def material_requirements(routing: Routing, top: np.ndarray, net_products: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    # Gross-to-net MRP for product requirements top (P, T): level by level,
+    # each material's gross is netted against its stock and only the net is
+    # exploded into the direct inputs. net_products=False takes top as planned
+    # output (e.g. state lots) that is produced whatever the product stock.
+    n, T = routing.n_materials, top.shape[-1]
+    gross = np.zeros((n, T))
+    net = np.zeros((n, T))
+    gross[: routing.n_products] = top
+    by_parent = routing.level[routing.edge_parent]
+    for level in range(int(routing.level.max(initial=0)) + 1):
+        rows = np.flatnonzero(routing.level == level)
+        net[rows] = net_against_stock(gross[rows], routing.stock[rows])
+        if not net_products:
+            products = rows[rows < routing.n_products]
+            net[products] = gross[products]
+        on = by_parent == level
+        for lead in np.unique(routing.edge_lead[on]).tolist():
+            sel = on & (routing.edge_lead == lead)
+            demand = shift_earlier(net[routing.edge_parent[sel]], lead) * routing.edge_coef[sel, None]
+            np.add.at(gross, routing.edge_child[sel], demand)
+    return gross, net
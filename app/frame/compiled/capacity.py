@@ -0,0 +1,198 @@
+# TR: Vardiya sablonlari ve is takviminden makine bazli kapasite zaman cizelgesi onhesabi.
+# EN: Per-machine capacity timeline precomputed from shift templates and the work calendar.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.frame.compiled.frame_index import MISSING, FrameIndex, Interner, _day_epoch
+from app.frame.models.problem import ProblemFrame, ShiftTemplate
+
+DAY_SECONDS = 86400.0
+DAY_MINUTES = 1440.0
+DEFAULT_WEEK_MINUTES = 7 * DAY_MINUTES
+
+
+def parse_clock(value: str) -> int:
+    # "HH:MM" -> minutes after midnight; "24:00" is accepted as end of day.
+    try:
+        hours, minutes = value.strip().split(":")
+        total = int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid shift time '{value}', expected HH:MM") from None
+    if not 0 <= total <= DAY_MINUTES or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Invalid shift time '{value}', expected HH:MM")
+    return total
+
+
+def segment_window(start: str, end: str) -> Tuple[int, int]:
+    # Minutes relative to the day start; segments ending at or before their
+    # start run past midnight.
+    lo, hi = parse_clock(start), parse_clock(end)
+    if hi <= lo:
+        hi += int(DAY_MINUTES)
+    return lo, hi
+
+
+def bucket_days(index: FrameIndex) -> List[Tuple[int, date]]:
+    # (bucket, day) pairs covering each bucket. A bucket without end_date runs
+    # until the next bucket starts, the last one for seven days.
+    start, end = index.bucket_start, index.bucket_end.copy()
+    following = np.r_[start[1:], np.nan]
+    end = np.where(np.isnan(end), np.where(np.isnan(following), start + 7 * DAY_SECONDS, following), end)
+    days = []
+    for t in range(start.size):
+        if np.isnan(start[t]):
+            continue
+        first = date(1970, 1, 1) + timedelta(days=int(start[t] // DAY_SECONDS))
+        count = max(int(np.ceil((end[t] - start[t]) / DAY_SECONDS)), 0)
+        days.extend((t, first + timedelta(days=i)) for i in range(count))
+    return days
+
+
+@dataclass
+class CapacityTimeline:
+    shifts: Interner            # shift segment codes
+    templates: Interner         # shift template codes
+    constraints: Interner       # constraint codes attached to segments
+
+    # Expanded shift segments, sorted by start (epoch seconds).
+    seg_start: np.ndarray
+    seg_end: np.ndarray
+    seg_shift: np.ndarray
+    seg_template: np.ndarray
+    seg_bucket: np.ndarray
+    seg_constraints: np.ndarray     # (S, C) bool
+
+    machine_shifts: np.ndarray      # (M, K) bool, shifts a machine may work
+    shift_minutes: np.ndarray       # (M, T, K) available minutes per machine, bucket and shift
+    open_minutes: np.ndarray        # (T,) minutes of days without any calendar or base template
+    capacity: np.ndarray            # (M, T) available minutes per machine and bucket
+
+    @property
+    def n_segments(self) -> int:
+        return int(self.seg_start.size)
+
+    def locate(self, timestamps: np.ndarray) -> np.ndarray:
+        # Segment covering each timestamp (epoch seconds), MISSING if none: O(log S).
+        ts = np.asarray(timestamps, dtype=np.float64)
+        pos = np.searchsorted(self.seg_start, ts, side="right") - 1
+        safe = np.maximum(pos, 0)
+        inside = (pos >= 0) & (ts < self.seg_end[safe]) if self.n_segments else np.zeros(ts.shape, dtype=bool)
+        return np.where(inside, pos, MISSING).astype(np.int32)
+
+    def covered_by(self, timestamps: np.ndarray, constraint: str) -> np.ndarray:
+        # True where the segment covering a timestamp carries the given constraint.
+        col = self.constraints.get(constraint)
+        seg = self.locate(timestamps)
+        if col == MISSING:
+            return np.zeros(seg.shape, dtype=bool)
+        return (seg != MISSING) & self.seg_constraints[np.maximum(seg, 0), col]
+
+    def machine_available(self, machine: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        # True where the machine works the shift covering the timestamp.
+        seg = self.locate(timestamps)
+        shift = self.seg_shift[np.maximum(seg, 0)] if self.n_segments else np.zeros(seg.shape, dtype=np.int32)
+        return (seg != MISSING) & self.machine_shifts[machine, shift]
+
+
+def _template_segments(template: ShiftTemplate) -> List[Tuple[str, int, int, List[str]]]:
+    return [(seg.code, *segment_window(seg.start, seg.end), seg.constraints) for seg in template.segments]
+
+
+def build_capacity_timeline(frame: ProblemFrame, index: FrameIndex) -> CapacityTimeline:
+    data = frame.problemData
+    M, T = index.n_machines, index.n_weeks
+    templates = Interner(t.code for t in data.shift_templates)
+    shifts = Interner(seg.code for t in data.shift_templates for seg in t.segments)
+    constraints = Interner(code for t in data.shift_templates for seg in t.segments for code in seg.constraints)
+    layouts: Dict[str, List[Tuple[str, int, int, List[str]]]] = {}
+    for template in reversed(data.shift_templates):
+        layouts[template.code] = _template_segments(template)
+
+    calendar: Dict[date, Tuple[str, bool]] = {}
+    for entry in data.work_calendar:
+        calendar.setdefault(entry.date, (entry.shift_templates_code, entry.holiday))
+    base = data.problem_meta.base_shift_templates_code
+
+    rows: List[Tuple[float, float, int, int, int, Sequence[str]]] = []
+    open_minutes = np.zeros(T)
+    for t, day in bucket_days(index):
+        code, holiday = calendar.get(day, (base, False))
+        if holiday:
+            continue
+        if code is None or code not in layouts:
+            open_minutes[t] += DAY_MINUTES
+            continue
+        day_start = _day_epoch(day)
+        for shift, lo, hi, tags in layouts[code]:
+            rows.append((day_start + lo * 60.0, day_start + hi * 60.0, shifts.get(shift), templates.get(code), t, tags))
+    rows.sort(key=lambda row: row[0])
+
+    S, K, C = len(rows), len(shifts), len(constraints)
+    seg_start = np.fromiter((r[0] for r in rows), dtype=np.float64, count=S)
+    seg_end = np.fromiter((r[1] for r in rows), dtype=np.float64, count=S)
+    seg_shift = np.fromiter((r[2] for r in rows), dtype=np.int32, count=S)
+    seg_template = np.fromiter((r[3] for r in rows), dtype=np.int32, count=S)
+    seg_bucket = np.fromiter((r[4] for r in rows), dtype=np.int32, count=S)
+    seg_constraints = np.zeros((S, C), dtype=bool)
+    for s, row in enumerate(rows):
+        seg_constraints[s, [constraints.get(code) for code in row[5]]] = True
+
+    # Segment minutes per bucket and shift; the part running past a bucket's
+    # end (e.g. a night shift on its last day) counts towards the next bucket.
+    shift_totals = np.zeros((T, K))
+    if S:
+        following = np.r_[index.bucket_start[1:], np.inf]
+        ends = np.where(np.isnan(following), np.inf, following)[seg_bucket]
+        inside = (np.minimum(seg_end, ends) - seg_start) / 60.0
+        spill = np.maximum(seg_end - ends, 0.0) / 60.0
+        np.add.at(shift_totals, (seg_bucket, seg_shift), inside)
+        nxt = seg_bucket + 1
+        keep = (spill > 0) & (nxt < T)
+        np.add.at(shift_totals, (nxt[keep], seg_shift[keep]), spill[keep])
+
+    machine_shifts = np.ones((M, K), dtype=bool)
+    for machine in reversed(data.resources.machine):
+        row = index.machines.get(machine.id)
+        if machine.shifts is None or not 0 <= row < M:
+            continue
+        allowed = set(machine.shifts)
+        machine_shifts[row] = False
+        for template in data.shift_templates:
+            for seg in template.segments:
+                if seg.code in allowed or template.code in allowed:
+                    machine_shifts[row, shifts.get(seg.code)] = True
+
+    shift_minutes = machine_shifts[:, None, :] * shift_totals[None, :, :]
+    capacity = shift_minutes.sum(axis=2) + open_minutes[None, :]
+    # Buckets without dates keep the flat weekly default; explicit
+    # weekly_capacity always wins.
+    capacity[:, np.isnan(index.bucket_start)] = DEFAULT_WEEK_MINUTES
+    explicit = ~np.isnan(index.machine_capacity)
+    capacity[explicit] = index.machine_capacity[explicit]
+
+    return CapacityTimeline(
+        shifts=shifts,
+        templates=templates,
+        constraints=constraints,
+        seg_start=seg_start,
+        seg_end=seg_end,
+        seg_shift=seg_shift,
+        seg_template=seg_template,
+        seg_bucket=seg_bucket,
+        seg_constraints=seg_constraints,
+        machine_shifts=machine_shifts,
+        shift_minutes=shift_minutes,
+        open_minutes=open_minutes,
+        capacity=capacity,
+    )
+
+
+def machine_capacity(index: FrameIndex, timeline: Optional[CapacityTimeline] = None) -> np.ndarray:
+    if timeline is not None:
+        return timeline.capacity
+    return np.where(np.isnan(index.machine_capacity), DEFAULT_WEEK_MINUTES, index.machine_capacity)
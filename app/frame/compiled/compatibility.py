@@ -0,0 +1,142 @@
+# TR: Makine x kalip x urun uyumlulugunu interned id'ler uzerinde bit kumesi matrislerine derler.
+# EN: Compiles machine x mold x product compatibility into bitset matrices over interned ids.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+
+def _width(n: int) -> int:
+    return max((n + 7) // 8, 1)
+
+
+def _in_range(ids: np.ndarray, n: int) -> np.ndarray:
+    return (ids >= 0) & (ids < n)
+
+
+def _bitsets(group: np.ndarray, member: np.ndarray, n_groups: int, n_members: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Row table (n_groups,) into a (rows + 1, width) uint8 bitset matrix, bit j
+    # of a row set when member j belongs to the group (little-endian within a
+    # byte). Groups without members point at -1: the trailing all-zero row.
+    keys, inverse = np.unique(group, return_inverse=True)
+    bits = np.zeros((keys.size + 1, _width(n_members)), dtype=np.uint8)
+    np.bitwise_or.at(bits, (inverse, member >> 3), np.left_shift(1, member & 7).astype(np.uint8))
+    rows = np.full(n_groups, -1, dtype=np.int32)
+    rows[keys] = np.arange(keys.size, dtype=np.int32)
+    return rows, bits
+
+
+def members(bits: np.ndarray, n: int) -> np.ndarray:
+    # Ids set in one bitset row.
+    return np.flatnonzero(np.unpackbits(bits, bitorder="little")[:n])
+
+
+def _test(bits: np.ndarray, row: np.ndarray, member: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    safe = np.where(valid, member, 0)
+    hit = (bits[np.where(valid, row, -1), safe >> 3] >> (safe & 7)) & 1
+    return valid & (row >= 0) & (hit == 1)
+
+
+@dataclass
+class CompatibilityIndex:
+    # Ids are FrameIndex interner ids; only declared (known) codes get bits.
+    # Each relation is a row table over its key plus a shared bitset matrix,
+    # so a lookup is one index and a mask test one AND. A relation with no
+    # resolved declarations does not restrict anything (restricts_* False).
+    n_products: int
+    n_processes: int
+    n_machines: int
+    n_molds: int
+    restricts_pairs: bool
+    restricts_products: bool
+    mold_row: np.ndarray        # (X * K,) row in mold_machines per (process, mold)
+    mold_machines: np.ndarray   # machines compatible with a mold on a process
+    machine_row: np.ndarray     # (X * M,) row in machine_molds per (process, machine)
+    machine_molds: np.ndarray   # molds compatible with a machine on a process
+    product_row: np.ndarray     # (P * X,) row in product_molds per (product, process)
+    product_molds: np.ndarray   # molds allowed for a product on a process
+
+    # -- bitset rows -----------------------------------------------------
+
+    def machines_for_mold(self, mold: int, process: int) -> np.ndarray:
+        if not (0 <= mold < self.n_molds and 0 <= process < self.n_processes):
+            return self.mold_machines[-1]
+        return self.mold_machines[self.mold_row[process * self.n_molds + mold]]
+
+    def molds_for_machine(self, machine: int, process: int) -> np.ndarray:
+        if not (0 <= machine < self.n_machines and 0 <= process < self.n_processes):
+            return self.machine_molds[-1]
+        return self.machine_molds[self.machine_row[process * self.n_machines + machine]]
+
+    def molds_for_product(self, product: int, process: int) -> np.ndarray:
+        if not (0 <= product < self.n_products and 0 <= process < self.n_processes):
+            return self.product_molds[-1]
+        return self.product_molds[self.product_row[product * self.n_processes + process]]
+
+    def product_processes(self, product: int) -> np.ndarray:
+        # Processes on which the product has at least one allowed mold.
+        if not 0 <= product < self.n_products:
+            return np.zeros(0, dtype=np.int64)
+        start = product * self.n_processes
+        return np.flatnonzero(self.product_row[start: start + self.n_processes] >= 0)
+
+    # -- vectorized tests ------------------------------------------------
+
+    def pair_allowed(self, machine: np.ndarray, mold: np.ndarray, process: np.ndarray) -> np.ndarray:
+        machine, mold, process = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (machine, mold, process)))
+        if not self.restricts_pairs:
+            return np.ones(machine.shape, dtype=bool)
+        key_ok = _in_range(mold, self.n_molds) & _in_range(process, self.n_processes)
+        row = np.where(key_ok, self.mold_row[np.where(key_ok, process * self.n_molds + mold, 0)], -1)
+        return _test(self.mold_machines, row, machine, key_ok & _in_range(machine, self.n_machines))
+
+    def mold_allowed(self, product: np.ndarray, process: np.ndarray, mold: np.ndarray) -> np.ndarray:
+        product, process, mold = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in (product, process, mold)))
+        if not self.restricts_products:
+            return np.ones(product.shape, dtype=bool)
+        key_ok = _in_range(product, self.n_products) & _in_range(process, self.n_processes)
+        row = np.where(key_ok, self.product_row[np.where(key_ok, product * self.n_processes + process, 0)], -1)
+        return _test(self.product_molds, row, mold, key_ok & _in_range(mold, self.n_molds))
+
+
+def build_compatibility(
+    n_products: int,
+    n_processes: int,
+    n_machines: int,
+    n_molds: int,
+    pair_machine: np.ndarray,
+    pair_mold: np.ndarray,
+    pair_process: np.ndarray,
+    pm_product: np.ndarray,
+    pm_process: np.ndarray,
+    pm_mold: np.ndarray,
+) -> CompatibilityIndex:
+    # Triples may carry MISSING or referenced-only ids; those set no bits and
+    # do not turn a relation into a restriction on their own.
+    X, K, M, P = n_processes, n_molds, n_machines, n_products
+    pair_machine, pair_mold, pair_process = (np.asarray(a, dtype=np.int64) for a in (pair_machine, pair_mold, pair_process))
+    pm_product, pm_process, pm_mold = (np.asarray(a, dtype=np.int64) for a in (pm_product, pm_process, pm_mold))
+    ok = _in_range(pair_machine, M) & _in_range(pair_mold, K) & _in_range(pair_process, X)
+    restricts_pairs = bool(ok.any())
+    machine, mold, process = pair_machine[ok], pair_mold[ok], pair_process[ok]
+    mold_row, mold_machines = _bitsets(process * K + mold, machine, X * K, M)
+    machine_row, machine_molds = _bitsets(process * M + machine, mold, X * M, K)
+    ok = _in_range(pm_product, P) & _in_range(pm_process, X) & _in_range(pm_mold, K)
+    restricts_products = bool(ok.any())
+    product_row, product_molds = _bitsets(pm_product[ok] * X + pm_process[ok], pm_mold[ok], P * X, K)
+    return CompatibilityIndex(
+        n_products=P,
+        n_processes=X,
+        n_machines=M,
+        n_molds=K,
+        restricts_pairs=restricts_pairs,
+        restricts_products=restricts_products,
+        mold_row=mold_row,
+        mold_machines=mold_machines,
+        machine_row=machine_row,
+        machine_molds=machine_molds,
+        product_row=product_row,
+        product_molds=product_molds,
+    )
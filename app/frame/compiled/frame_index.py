@@ -0,0 +1,428 @@
+# TR: ProblemFrame kodlarini yogun tamsayi id'lere cevirir ve NumPy dizileri olarak derler.
+# EN: Interns ProblemFrame codes to dense integer ids and compiles them into NumPy arrays.
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, time, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.frame.compiled.compatibility import CompatibilityIndex, build_compatibility
+from app.frame.models.plan_table import PlanTable, csr_take
+from app.frame.models.problem import ProblemData, ProblemFrame
+
+MISSING = -1
+
+RES_MACHINE = 0
+RES_MOLD = 1
+RES_OTHER = 2
+
+
+class Interner:
+    # Codes declared in master data get ids [0, known); codes that are only
+    # referenced (orders, plan, compatibility) are appended after them so
+    # that "unknown" checks become a single integer comparison.
+    def __init__(self, codes: Iterable[object] = ()) -> None:
+        self.codes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for code in codes:
+            self.intern(code)
+        self.known = len(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def intern(self, code: object) -> int:
+        key = str(code)
+        idx = self.ids.get(key)
+        if idx is None:
+            idx = len(self.codes)
+            self.ids[key] = idx
+            self.codes.append(key)
+        return idx
+
+    def get(self, code: object) -> int:
+        if code is None:
+            return MISSING
+        return self.ids.get(str(code), MISSING)
+
+    def intern_many(self, codes: Iterable[object]) -> np.ndarray:
+        intern = self.intern
+        return np.fromiter((MISSING if c is None else intern(c) for c in codes), dtype=np.int32)
+
+    def is_known(self, ids: np.ndarray) -> np.ndarray:
+        return (ids >= 0) & (ids < self.known)
+
+    def code(self, idx: int) -> Optional[str]:
+        return self.codes[idx] if 0 <= idx < len(self.codes) else None
+
+    def copy(self) -> "Interner":
+        out = Interner()
+        out.codes, out.ids, out.known = list(self.codes), dict(self.ids), self.known
+        return out
+
+
+def _day_epoch(value: Optional[date]) -> float:
+    if value is None:
+        return np.nan
+    return datetime.combine(value, time.min, tzinfo=timezone.utc).timestamp()
+
+
+def _pooled(interner: Interner, values: Iterable[object], column: np.ndarray) -> np.ndarray:
+    # Interns a PlanTable code pool and maps a pool-id column onto the interner.
+    mapping = np.append(interner.intern_many(values), MISSING).astype(np.int32)
+    return mapping[column]
+
+
+@dataclass
+class FrameIndex:
+    products: Interner
+    processes: Interner
+    time_buckets: Interner
+    machines: Interner
+    molds: Interner
+    warehouses: Interner
+
+    # Time bucket bounds as epoch seconds (start of start_date / end of end_date, NaN when unknown).
+    bucket_start: np.ndarray
+    bucket_end: np.ndarray
+
+    # Orders / stocks (one row per order group, order line or stock line).
+    group_product: np.ndarray
+    order_group: np.ndarray
+    order_product: np.ndarray
+    order_week: np.ndarray
+    order_qty: np.ndarray
+    stock_product: np.ndarray
+    stock_warehouse: np.ndarray
+    stock_qty: np.ndarray
+
+    # Process steps, flattened over products.
+    step_product: np.ndarray
+    step_no: np.ndarray
+    step_process: np.ndarray
+    step_base_qty: np.ndarray
+    step_yield: np.ndarray
+    step_setup_min: np.ndarray
+    step_cycle_sec: np.ndarray
+
+    # Resources (indexed by interned id) and capacity (machine x time bucket, NaN when not given).
+    machine_process: np.ndarray
+    mold_process: np.ndarray
+    machine_capacity: np.ndarray
+
+    # Compatibility tables.
+    pair_machine: np.ndarray
+    pair_mold: np.ndarray
+    pair_process: np.ndarray
+    pm_product: np.ndarray
+    pm_process: np.ndarray
+    pm_mold: np.ndarray
+    # Both tables merged with Mold.compatible_machines(_id) / supported_products.
+    compat: CompatibilityIndex
+
+    # Plan lots and their resources (res_* rows point back to lot rows).
+    lot_ids: List[Optional[str]]
+    lot_product: np.ndarray
+    lot_process: np.ndarray
+    lot_week: np.ndarray
+    lot_qty: np.ndarray
+    lot_machine: np.ndarray
+    lot_mold: np.ndarray
+    lot_setup_start: np.ndarray
+    lot_setup_end: np.ndarray
+    lot_process_start: np.ndarray
+    lot_process_end: np.ndarray
+    res_lot: np.ndarray
+    res_kind: np.ndarray
+    res_ref: np.ndarray
+
+    # Reported inventory rows.
+    inv_product: np.ndarray
+    inv_week: np.ndarray
+    inv_bucket: np.ndarray
+    inv_opening: np.ndarray
+    inv_production: np.ndarray
+    inv_demand: np.ndarray
+    inv_closing: np.ndarray
+
+    demand: np.ndarray = field(repr=False)
+    initial_stock: np.ndarray = field(repr=False)
+
+    @property
+    def n_products(self) -> int:
+        return self.products.known
+
+    @property
+    def n_weeks(self) -> int:
+        return self.time_buckets.known
+
+    @property
+    def n_machines(self) -> int:
+        return self.machines.known
+
+    @property
+    def n_molds(self) -> int:
+        return self.molds.known
+
+    @property
+    def n_lots(self) -> int:
+        return len(self.lot_ids)
+
+
+LOT_COLUMNS = (
+    "lot_product", "lot_process", "lot_week", "lot_qty", "lot_machine", "lot_mold",
+    "lot_setup_start", "lot_setup_end", "lot_process_start", "lot_process_end",
+)
+
+
+def compile_lots(
+    lots: PlanTable,
+    products: Interner,
+    processes: Interner,
+    time_buckets: Interner,
+    machines: Interner,
+    molds: Interner,
+) -> Dict[str, object]:
+    # The plan is already columnar: only its small code pools are interned,
+    # then mapped onto the lot columns. Returns the FrameIndex lot_* / res_* fields.
+    lot_ids = list(lots.lot_id)
+    lot_product = _pooled(products, lots.products.values, lots.product)
+    lot_process = _pooled(processes, lots.processes.values, lots.process)
+    lot_week = _pooled(time_buckets, [week or None for week in lots.weeks.values], lots.week)
+    lot_qty = lots.qty.astype(np.float64)
+    lot_setup_start, lot_setup_end, lot_process_start, lot_process_end = lots.times.astype(np.float64)
+
+    res_lot = lots.resource_rows()
+    type_kind = np.array(
+        [RES_MACHINE if t == "machine" else RES_MOLD if t == "mold" else RES_OTHER for t in lots.resource_types.values]
+        + [RES_OTHER],
+        dtype=np.int8,
+    )
+    res_kind = type_kind[lots.res_type]
+    # A resource id may be a machine or a mold depending on its type, so refs
+    # are interned per distinct (type, id) pair.
+    pairs = {}
+    for t, code in zip(lots.res_type.tolist(), lots.res_id.tolist()):
+        if (t, code) not in pairs:
+            kind = type_kind[t]
+            value = lots.resource_ids.values[code]
+            pairs[(t, code)] = (
+                machines.intern(value) if kind == RES_MACHINE else molds.intern(value) if kind == RES_MOLD else MISSING
+            )
+    res_ref = np.fromiter(
+        (pairs[key] for key in zip(lots.res_type.tolist(), lots.res_id.tolist())), dtype=np.int32, count=res_lot.size
+    )
+    # First machine / mold resource of each lot (resources are emitted in lot order).
+    lot_machine = np.full(len(lots), MISSING, dtype=np.int32)
+    lot_mold = np.full(len(lots), MISSING, dtype=np.int32)
+    for kind, target in ((RES_MACHINE, lot_machine), (RES_MOLD, lot_mold)):
+        rows = np.flatnonzero(res_kind == kind)
+        if rows.size:
+            first_lots, first_pos = np.unique(res_lot[rows], return_index=True)
+            target[first_lots] = res_ref[rows[first_pos]]
+
+    return {
+        "lot_ids": lot_ids,
+        "lot_product": lot_product,
+        "lot_process": lot_process,
+        "lot_week": lot_week,
+        "lot_qty": lot_qty,
+        "lot_machine": lot_machine,
+        "lot_mold": lot_mold,
+        "lot_setup_start": lot_setup_start,
+        "lot_setup_end": lot_setup_end,
+        "lot_process_start": lot_process_start,
+        "lot_process_end": lot_process_end,
+        "res_lot": res_lot,
+        "res_kind": res_kind,
+        "res_ref": res_ref,
+    }
+
+
+def splice_lots(index: FrameIndex, added: Dict[str, object], order: np.ndarray) -> FrameIndex:
+    # Index of the plan concat([index lots, added lots]).take(order) without
+    # recompiling the lots that were already in the index; added comes from
+    # compile_lots with the index's interners.
+    n_added = len(added["lot_ids"])
+    ids = index.lot_ids + added["lot_ids"]
+    columns = {name: np.concatenate([getattr(index, name), added[name]])[order] for name in LOT_COLUMNS}
+    counts = np.concatenate([
+        np.bincount(index.res_lot, minlength=index.n_lots),
+        np.bincount(added["res_lot"], minlength=n_added),
+    ])
+    positions, offsets = csr_take(np.concatenate([[0], np.cumsum(counts)]).astype(np.int64), order)
+    return replace(
+        index,
+        lot_ids=list(map(ids.__getitem__, order.tolist())),
+        **columns,
+        res_lot=np.repeat(np.arange(order.size, dtype=np.int32), np.diff(offsets)),
+        res_kind=np.concatenate([index.res_kind, added["res_kind"]])[positions],
+        res_ref=np.concatenate([index.res_ref, added["res_ref"]])[positions],
+    )
+
+
+def _compatibility(
+    data: ProblemData,
+    products: Interner,
+    processes: Interner,
+    machines: Interner,
+    molds: Interner,
+    *tables: np.ndarray,
+) -> CompatibilityIndex:
+    # Mold-level lists join the compatibility tables; codes are looked up,
+    # not interned, so they do not shift the ids of referenced-only codes.
+    # compatible_machines_id holds Machine.id values, which the machine
+    # interner is keyed by. supported_products_id is left out: products have
+    # no numeric id to map it onto.
+    pair_machine, pair_mold, pair_process, pm_product, pm_process, pm_mold = tables
+    mold_pairs = [
+        (machines.get(machine), molds.get(mold.code), processes.get(mold.process_code))
+        for mold in data.resources.mold
+        for machine in (mold.compatible_machines or []) + (mold.compatible_machines_id or [])
+    ]
+    mold_products = [
+        (products.get(product), processes.get(mold.process_code), molds.get(mold.code))
+        for mold in data.resources.mold
+        for product in mold.supported_products or []
+    ]
+    extra_pairs = np.array(mold_pairs, dtype=np.int64).reshape(-1, 3)
+    extra_products = np.array(mold_products, dtype=np.int64).reshape(-1, 3)
+    return build_compatibility(
+        products.known, processes.known, machines.known, molds.known,
+        np.concatenate([pair_machine, extra_pairs[:, 0]]),
+        np.concatenate([pair_mold, extra_pairs[:, 1]]),
+        np.concatenate([pair_process, extra_pairs[:, 2]]),
+        np.concatenate([pm_product, extra_products[:, 0]]),
+        np.concatenate([pm_process, extra_products[:, 1]]),
+        np.concatenate([pm_mold, extra_products[:, 2]]),
+    )
+
+
+def build_frame_index(frame: ProblemFrame) -> FrameIndex:
+    data = frame.problemData
+    state = frame.state
+
+    products = Interner(p.code for p in data.products)
+    processes = Interner(p.code for p in data.processes)
+    buckets = sorted(data.time_buckets, key=lambda tb: tb.index)
+    time_buckets = Interner(tb.id for tb in buckets)
+    machines = Interner(m.id for m in data.resources.machine)
+    molds = Interner(m.code for m in data.resources.mold)
+    warehouses = Interner(s.warehouse for s in data.stocks)
+    first_buckets = {}
+    for tb in buckets:
+        first_buckets.setdefault(tb.id, tb)
+    bucket_start = np.array([_day_epoch(tb.start_date) for tb in first_buckets.values()], dtype=np.float64)
+    bucket_end = np.array([_day_epoch(tb.end_date) + 86400.0 for tb in first_buckets.values()], dtype=np.float64)
+
+    group_product = products.intern_many(g.product_code for g in data.orders)
+    order_group = np.fromiter((row for row, g in enumerate(data.orders) for _ in g.orders), dtype=np.int32)
+    order_product = group_product[order_group]
+    order_week = time_buckets.intern_many(o.week for g in data.orders for o in g.orders)
+    order_qty = np.fromiter((o.qty for g in data.orders for o in g.orders), dtype=np.float64)
+
+    stock_product = products.intern_many(s.product_code for s in data.stocks)
+    stock_warehouse = warehouses.intern_many(s.warehouse for s in data.stocks)
+    stock_qty = np.fromiter((s.qty for s in data.stocks), dtype=np.float64)
+
+    steps = [(products.get(p.code), step) for p in data.products for step in p.process_data]
+    step_product = np.fromiter((pid for pid, _ in steps), dtype=np.int32)
+    step_process = processes.intern_many(step.process_code for _, step in steps)
+    step_no = np.fromiter((step.step_no for _, step in steps), dtype=np.int32)
+    step_base_qty = np.fromiter((step.base_qty for _, step in steps), dtype=np.float64)
+    step_yield = np.fromiter((step.yield_factor for _, step in steps), dtype=np.float64)
+    step_setup_min = np.fromiter((step.setup_time_min for _, step in steps), dtype=np.float64)
+    step_cycle_sec = np.fromiter((step.cycle_time_sec for _, step in steps), dtype=np.float64)
+
+    # Duplicate resource codes keep the first declaration, like the interner.
+    machine_process = np.full(machines.known, MISSING, dtype=np.int32)
+    for machine in reversed(data.resources.machine):
+        machine_process[machines.get(machine.id)] = processes.intern(machine.process_code)
+    mold_process = np.full(molds.known, MISSING, dtype=np.int32)
+    for mold in reversed(data.resources.mold):
+        mold_process[molds.get(mold.code)] = processes.intern(mold.process_code)
+    machine_capacity = np.full((machines.known, time_buckets.known), np.nan)
+    for machine in data.resources.machine:
+        row = machines.get(machine.id)
+        for week, minutes in (machine.weekly_capacity or {}).items():
+            col = time_buckets.get(week)
+            if 0 <= col < time_buckets.known:
+                machine_capacity[row, col] = minutes
+
+    pairs = data.compatibility.machine_mold_pairs
+    pair_machine = machines.intern_many(p.machine_id for p in pairs)
+    pair_mold = molds.intern_many(p.mold_code for p in pairs)
+    pair_process = processes.intern_many(p.process_code for p in pairs)
+    product_molds = [(pm, mold) for pm in data.compatibility.product_molds for mold in pm.allowed_molds]
+    pm_product = products.intern_many(pm.product_code for pm, _ in product_molds)
+    pm_process = processes.intern_many(pm.process_code for pm, _ in product_molds)
+    pm_mold = molds.intern_many(mold for _, mold in product_molds)
+    compat = _compatibility(data, products, processes, machines, molds, pair_machine, pair_mold, pair_process,
+                            pm_product, pm_process, pm_mold)
+
+    lots = compile_lots(state.lots, products, processes, time_buckets, machines, molds)
+
+    inventory = state.inventory
+    inv_product = products.intern_many(row.product_code for row in inventory)
+    inv_week = time_buckets.intern_many(row.week or None for row in inventory)
+    inv_bucket = time_buckets.intern_many(row.time_bucket_id or None for row in inventory)
+    inv_opening = np.fromiter((row.opening_stock for row in inventory), dtype=np.float64, count=len(inventory))
+    inv_production = np.fromiter((row.production_qty for row in inventory), dtype=np.float64, count=len(inventory))
+    inv_demand = np.fromiter((row.demand for row in inventory), dtype=np.float64, count=len(inventory))
+    inv_closing = np.fromiter((row.closing_stock for row in inventory), dtype=np.float64, count=len(inventory))
+
+    demand = np.zeros((products.known, time_buckets.known))
+    valid = products.is_known(order_product) & time_buckets.is_known(order_week)
+    np.add.at(demand, (order_product[valid], order_week[valid]), order_qty[valid])
+    valid_stock = products.is_known(stock_product)
+    initial_stock = np.bincount(
+        stock_product[valid_stock], weights=stock_qty[valid_stock], minlength=products.known
+    ).astype(np.float64)
+
+    return FrameIndex(
+        products=products,
+        processes=processes,
+        time_buckets=time_buckets,
+        machines=machines,
+        molds=molds,
+        warehouses=warehouses,
+        bucket_start=bucket_start,
+        bucket_end=bucket_end,
+        group_product=group_product,
+        order_group=order_group,
+        order_product=order_product,
+        order_week=order_week,
+        order_qty=order_qty,
+        stock_product=stock_product,
+        stock_warehouse=stock_warehouse,
+        stock_qty=stock_qty,
+        step_product=step_product,
+        step_no=step_no,
+        step_process=step_process,
+        step_base_qty=step_base_qty,
+        step_yield=step_yield,
+        step_setup_min=step_setup_min,
+        step_cycle_sec=step_cycle_sec,
+        machine_process=machine_process,
+        mold_process=mold_process,
+        machine_capacity=machine_capacity,
+        pair_machine=pair_machine,
+        pair_mold=pair_mold,
+        pair_process=pair_process,
+        pm_product=pm_product,
+        pm_process=pm_process,
+        pm_mold=pm_mold,
+        compat=compat,
+        **lots,
+        inv_product=inv_product,
+        inv_week=inv_week,
+        inv_bucket=inv_bucket,
+        inv_opening=inv_opening,
+        inv_production=inv_production,
+        inv_demand=inv_demand,
+        inv_closing=inv_closing,
+        demand=demand,
+        initial_stock=initial_stock,
+    )
@@ -0,0 +1,141 @@
+# TR: FrameIndex'ten optimizasyon icin urun x hafta planlama modelini derler.
+# EN: Compiles the product x week planning model used by the optimizers from a FrameIndex.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.frame.compiled.capacity import CapacityTimeline, machine_capacity
+from app.frame.compiled.compatibility import members
+from app.frame.compiled.frame_index import MISSING, FrameIndex
+
+
+@dataclass
+class PlanningModel:
+    demand: np.ndarray          # (P, T)
+    initial_stock: np.ndarray   # (P,)
+    process: np.ndarray         # (P,) planning process id per product, MISSING if none
+    setup_min: np.ndarray       # (P,) setup minutes per lot
+    unit_min: np.ndarray        # (P,) processing minutes per unit
+    opt_machine: np.ndarray     # (P, O) machine id per resource option, MISSING if none
+    opt_mold: np.ndarray        # (P, O) mold id per resource option, MISSING if none
+    n_options: np.ndarray       # (P,) number of valid options (>= 1)
+    capacity: np.ndarray        # (M, T) available minutes per machine and bucket
+    bucket_start: np.ndarray    # (T,) epoch seconds, NaN when unknown
+
+    @property
+    def n_products(self) -> int:
+        return int(self.demand.shape[0])
+
+    @property
+    def n_weeks(self) -> int:
+        return int(self.demand.shape[1])
+
+    @property
+    def n_machines(self) -> int:
+        return int(self.capacity.shape[0])
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.n_products, self.n_weeks
+
+    def lot_for_lot(self) -> np.ndarray:
+        # Net requirement per bucket after consuming the opening stock.
+        cum_demand = np.cumsum(self.demand, axis=1)
+        covered = np.minimum(cum_demand, self.initial_stock[:, None])
+        net_cum = cum_demand - covered
+        return np.diff(net_cum, axis=1, prepend=0.0)
+
+    def capacity_lot_sizes(self) -> np.ndarray:
+        # Lot-for-lot scaled down per machine and bucket so that the load on
+        # each product's first option fits the available minutes.
+        base = self.lot_for_lot()
+        machine = self.opt_machine[:, 0]
+        has = machine != MISSING
+        minutes = np.where(base > 0, self.setup_min[:, None] + base * self.unit_min[:, None], 0.0)
+        load = np.zeros_like(self.capacity)
+        np.add.at(load, machine[has], minutes[has])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(load > self.capacity, self.capacity / load, 1.0)
+        return np.where(has[:, None], np.floor(base * scale[np.maximum(machine, 0)]), base)
+
+
+def _planning_step(index: FrameIndex) -> np.ndarray:
+    # Last step (highest step_no) of each product drives lot sizing.
+    step = np.full(index.n_products, MISSING, dtype=np.int64)
+    if not index.step_product.size:
+        return step
+    order = np.lexsort((index.step_no, index.step_product))
+    owners = index.step_product[order]
+    last = np.r_[owners[1:] != owners[:-1], True]
+    step[owners[last]] = order[last]
+    return step
+
+
+def build_planning_model(index: FrameIndex, timeline: Optional[CapacityTimeline] = None) -> PlanningModel:
+    P, T, M = index.n_products, index.n_weeks, index.n_machines
+    step = _planning_step(index)
+    has_step = step != MISSING
+    safe = np.where(has_step, step, 0)
+
+    process = np.full(P, MISSING, dtype=np.int32)
+    setup_min = np.zeros(P)
+    unit_min = np.zeros(P)
+    if index.step_product.size:
+        base_qty = np.where(index.step_base_qty[safe] > 0, index.step_base_qty[safe], 1.0)
+        process = np.where(has_step, index.step_process[safe], MISSING).astype(np.int32)
+        setup_min = np.where(has_step, index.step_setup_min[safe], 0.0)
+        unit_min = np.where(has_step, index.step_cycle_sec[safe] / 60.0 / base_qty, 0.0)
+
+    compat = index.compat
+    # Declared mold processes per product in product_molds order; processes
+    # only known from the mold-level lists follow in id order.
+    declared: List[List[int]] = [[] for _ in range(P)]
+    known = index.products.is_known(index.pm_product) & index.molds.is_known(index.pm_mold)
+    for p, proc in zip(index.pm_product[known].tolist(), index.pm_process[known].tolist()):
+        declared[p].append(proc)
+    options: List[List[Tuple[int, int]]] = []
+    for p in range(P):
+        # Mold-based processes declared for the product take precedence over the last step.
+        candidates = list(dict.fromkeys(declared[p] + compat.product_processes(p).tolist() + [int(process[p])]))
+        chosen: List[Tuple[int, int]] = []
+        for proc in candidates:
+            machines = np.flatnonzero(index.machine_process == proc)
+            if not machines.size:
+                continue
+            process[p] = proc
+            molds = members(compat.molds_for_product(p, proc), compat.n_molds)
+            molds = molds[index.mold_process[molds] == proc]
+            allowed = compat.pair_allowed(machines[:, None], molds[None, :], proc)
+            for machine, row in zip(machines.tolist(), allowed):
+                usable = molds[row].tolist()
+                if usable:
+                    chosen.extend((machine, m) for m in usable)
+                else:
+                    chosen.append((machine, MISSING))
+            break
+        options.append(chosen or [(MISSING, MISSING)])
+
+    width = max(len(opts) for opts in options) if options else 1
+    opt_machine = np.full((P, width), MISSING, dtype=np.int32)
+    opt_mold = np.full((P, width), MISSING, dtype=np.int32)
+    for p, opts in enumerate(options):
+        opt_machine[p, : len(opts)] = [m for m, _ in opts]
+        opt_mold[p, : len(opts)] = [k for _, k in opts]
+    n_options = np.array([len(opts) for opts in options], dtype=np.int32)
+
+    capacity = machine_capacity(index, timeline)
+    return PlanningModel(
+        demand=index.demand,
+        initial_stock=index.initial_stock,
+        process=process,
+        setup_min=setup_min,
+        unit_min=unit_min,
+        opt_machine=opt_machine,
+        opt_mold=opt_mold,
+        n_options=n_options,
+        capacity=capacity.reshape(M, T),
+        bucket_start=index.bucket_start,
+    )
@@ -0,0 +1,86 @@
+# TR: Cok sayida cerceveyi (JSON dizi veya NDJSON) surec havuzunda ayristirir, dogrular ve derler.
+# EN: Parses, validates and compiles many frames (JSON array or NDJSON) in a process pool.
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Iterable, List, Optional, Union
+
+from app.concurrency import pool_context
+from app.evaluation.problem_validator import DEFAULT_MAX_ERRORS
+from app.frame.compiled.capacity import CapacityTimeline
+from app.frame.compiled.frame_index import FrameIndex
+from app.frame.ingest.problem_adapter import load_problem_frame
+from app.frame.models.problem import ProblemFrame
+from app.frame.services.frame_manager import compile_frame
+
+DEFAULT_BATCH_WORKERS = 4
+# Requests above this are clamped: more processes than cores only add overhead.
+MAX_BATCH_WORKERS = os.cpu_count() or 1
+MAX_BATCH_FRAMES = 2000
+# Below this many frames starting the pool costs more than it saves.
+MIN_PARALLEL_FRAMES = 8
+
+RawFrame = Union[bytes, str, dict]
+
+
+@dataclass
+class PreparedFrame:
+    frame: Optional[ProblemFrame] = None
+    index: Optional[FrameIndex] = None
+    timeline: Optional[CapacityTimeline] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def prepare_frame(raw: RawFrame, max_errors: int = DEFAULT_MAX_ERRORS) -> PreparedFrame:
+    # Runs in a worker: raw is one frame as JSON text or an already parsed dict.
+    try:
+        data = json.loads(raw) if isinstance(raw, (bytes, str)) else raw
+        if not isinstance(data, dict):
+            raise ValueError("Frame must be a JSON object")
+        frame = load_problem_frame(data)
+        index, timeline = compile_frame(frame, max_errors)
+    except ValueError as exc:
+        return PreparedFrame(error=str(exc))
+    return PreparedFrame(frame, index, timeline)
+
+
+def split_frames(body: bytes, ndjson: bool = False) -> List[RawFrame]:
+    # NDJSON lines stay unparsed so that workers do the JSON decoding too; a
+    # JSON array has to be parsed whole here (callers run this off the event loop).
+    if ndjson:
+        return [line for line in body.split(b"\n") if line.strip()]
+    frames = json.loads(body)
+    if not isinstance(frames, list):
+        raise ValueError("Expected a JSON array of frames")
+    return frames
+
+
+def prepare_frames(
+    raws: Iterable[RawFrame],
+    workers: int = DEFAULT_BATCH_WORKERS,
+    max_errors: int = DEFAULT_MAX_ERRORS,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> List[PreparedFrame]:
+    # Results keep the input order. Compiled frames come back pickled, which
+    # is far cheaper than validating them again.
+    raws = list(raws)
+    workers = max(min(workers, MAX_BATCH_WORKERS), 1)
+    if executor is None and (workers <= 1 or len(raws) < MIN_PARALLEL_FRAMES):
+        return [prepare_frame(raw, max_errors) for raw in raws]
+    own_pool = executor is None
+    pool = executor or ProcessPoolExecutor(max_workers=min(workers, len(raws)), mp_context=pool_context())
+    try:
+        chunksize = max(1, len(raws) // (workers * 4))
+        return list(pool.map(prepare_frame, raws, repeat(max_errors), chunksize=chunksize))
+    finally:
+        if own_pool:
+            pool.shutdown()
+
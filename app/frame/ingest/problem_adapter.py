@@ -8,7 +8,8 @@ from typing import Any, Dict, Union
 
 from pydantic import ValidationError
 
-from app.frame.models.problem import ProblemFrame
+from app.frame.models.problem import ProblemFrame, ScenarioConfig
+from app.telemetry import stage
 
 
 def _normalize_constraints(raw_scenario: Dict[str, Any]) -> Dict[str, Any]:
@@ -36,6 +37,14 @@ def _normalize_constraints(raw_scenario: Dict[str, Any]) -> Dict[str, Any]:
     return raw_scenario
 
 
+def load_scenario_config(raw: Dict[str, Any]) -> ScenarioConfig:
+    # A standalone ScenarioConfig in the same shapes load_problem_frame accepts.
+    try:
+        return ScenarioConfig.model_validate(_normalize_constraints(dict(raw)))
+    except ValidationError as exc:
+        raise ValueError(str(exc)) from exc
+
+
 def load_problem_frame(data_or_path: Union[str, Path, Dict[str, Any]]) -> ProblemFrame:
     if isinstance(data_or_path, (str, Path)):
         raw = json.loads(Path(data_or_path).read_text(encoding="utf-8"))
@@ -44,23 +53,25 @@ def load_problem_frame(data_or_path: Union[str, Path, Dict[str, Any]]) -> Proble
     else:
         raise ValueError("Unsupported input type for problem frame loader.")
 
-    raw["scenarioConfig"] = _normalize_constraints(raw.get("scenarioConfig", {}))
-    state = raw.get("state", {})
-    if isinstance(state, dict):
-        lots = state.get("lots")
-        plan = state.get("plan")
-        if isinstance(lots, list) and lots:
-            sample = lots[0]
-            # Heuristic: inventory rows have opening_stock/closing_stock fields.
-            if isinstance(sample, dict) and "opening_stock" in sample:
-                state.setdefault("inventory", lots)
-                if isinstance(plan, list):
-                    state["lots"] = plan
-        if "lots" not in state and isinstance(plan, list):
-            state["lots"] = plan
-        raw["state"] = state
+    with stage("adapter.normalize"):
+        raw["scenarioConfig"] = _normalize_constraints(raw.get("scenarioConfig", {}))
+        state = raw.get("state", {})
+        if isinstance(state, dict):
+            lots = state.get("lots")
+            plan = state.get("plan")
+            if isinstance(lots, list) and lots:
+                sample = lots[0]
+                # Heuristic: inventory rows have opening_stock/closing_stock fields.
+                if isinstance(sample, dict) and "opening_stock" in sample:
+                    state.setdefault("inventory", lots)
+                    if isinstance(plan, list):
+                        state["lots"] = plan
+            if "lots" not in state and isinstance(plan, list):
+                state["lots"] = plan
+            raw["state"] = state
 
     try:
-        return ProblemFrame.model_validate(raw)
+        with stage("adapter.validate"):
+            return ProblemFrame.model_validate(raw)
     except ValidationError as exc:
         raise ValueError(str(exc)) from exc
@@ -0,0 +1,288 @@
+# TR: Buyuk dizileri (orders, stocks, state.plan/lots) parca parca JSON/NDJSON/CSV akisindan okuyup dogrular.
+# EN: Streams the large arrays (orders, stocks, state.plan/lots) from chunked JSON/NDJSON/CSV and validates them in chunks.
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.frame.ingest.problem_adapter import load_problem_frame
+from app.frame.models.plan_table import PlanItem, PlanTable
+from app.frame.models.problem import LotInventory, OrderGroup, OrderItem, ProblemFrame, StockItem
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_MAX_ERRORS = 100
+READ_CHARS = 1 << 20
+
+Source = Union[str, Path, TextIO]
+
+
+class OrderLine(BaseModel):
+    # One ERP order line; lines are grouped into OrderGroup by product_code.
+    product_code: str
+    week: str
+    qty: float
+
+
+class IngestError(ValueError):
+    def __init__(self, errors: List[Dict[str, Any]], truncated: bool = False) -> None:
+        self.errors = errors
+        self.truncated = truncated
+        first = errors[0] if errors else {}
+        super().__init__(
+            f"Ingest failed with {len(errors)}{'+' if truncated else ''} errors; "
+            f"first: {first.get('section')} row {first.get('row')}: {first.get('msg')}"
+        )
+
+
+# section -> (row model, fields holding codes worth interning)
+SECTIONS: Dict[str, Tuple[type, Tuple[str, ...]]] = {
+    "orders": (OrderLine, ("product_code", "week")),
+    "stocks": (StockItem, ("product_code", "warehouse")),
+    "state.plan": (PlanItem, ("product_code", "process_code", "week", "qty_type")),
+    "state.lots": (PlanItem, ("product_code", "process_code", "week", "qty_type")),
+    "state.inventory": (LotInventory, ("product_code", "time_bucket_id", "week")),
+}
+_ADAPTERS = {name: TypeAdapter(List[model]) for name, (model, _) in SECTIONS.items()}
+_ADAPTERS["orders.group"] = TypeAdapter(List[OrderGroup])
+_WS = re.compile(r"\s*")
+
+
+def iter_json_array(stream: TextIO, read_chars: int = READ_CHARS) -> Iterator[Any]:
+    # Yields the items of a top-level JSON array while reading the text in
+    # pieces, so only one piece plus the current item is held in memory.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect = "["
+    while True:
+        pos = _WS.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            chunk = stream.read(read_chars)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        char = buffer[pos]
+        if expect == "[":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            pos, expect = pos + 1, "first"
+        elif char == "]" and expect in ("first", ","):
+            return
+        elif expect == ",":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+            pos, expect = pos + 1, "item"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                value, end = None, len(buffer)
+            if end == len(buffer) and not eof:
+                # The item may continue (or a number may grow) in the next piece.
+                chunk = stream.read(read_chars)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            yield value
+            pos, expect = end, ","
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[Any]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    # Empty cells become None; machine / mold columns become plan resources.
+    for row in csv.DictReader(stream):
+        record: Dict[str, Any] = {key: (value if value != "" else None) for key, value in row.items() if key}
+        resources = []
+        for kind in ("machine", "mold"):
+            code = record.pop(kind, None)
+            if code is not None:
+                resources.append({"type": kind, "id": code})
+        if resources:
+            record["resources"] = resources
+        yield record
+
+
+def iter_records(source: Source, fmt: Optional[str] = None) -> Iterator[Any]:
+    # fmt: "json" (top-level array), "ndjson" or "csv"; taken from the file
+    # suffix when not given.
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        fmt = fmt or {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(path.suffix.lower(), "json")
+        with path.open("r", encoding="utf-8", newline="" if fmt == "csv" else None) as stream:
+            yield from iter_records(stream, fmt)
+        return
+    fmt = fmt or "json"
+    if fmt == "csv":
+        yield from iter_csv(source)
+    elif fmt == "ndjson":
+        yield from iter_ndjson(source)
+    elif fmt == "json":
+        yield from iter_json_array(source)
+    else:
+        raise ValueError(f"Unsupported feed format '{fmt}'")
+
+
+class StreamingFrameBuilder:
+    # Takes the frame without (or with small) big arrays, then accepts the
+    # big arrays record by record. Records are validated and reference-checked
+    # per chunk, so errors surface while the feed is still being read; the
+    # first max_errors of them abort the ingest.
+    def __init__(
+        self,
+        skeleton: Union[Dict[str, Any], ProblemFrame],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_errors: int = DEFAULT_MAX_ERRORS,
+    ) -> None:
+        self.frame = skeleton if isinstance(skeleton, ProblemFrame) else load_problem_frame(skeleton)
+        self.chunk_size = max(int(chunk_size), 1)
+        self.max_errors = max_errors
+        self.errors: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {name: 0 for name in SECTIONS}
+        self._pending: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {name: [] for name in SECTIONS}
+        self._codes: Dict[str, str] = {}
+        data = self.frame.problemData
+        self._products = {p.code for p in data.products}
+        self._weeks = {b.id for b in data.time_buckets}
+        self._groups: Dict[str, OrderGroup] = {}
+        self._tables: Dict[str, List[PlanTable]] = {"state.plan": [], "state.lots": []}
+        for group in data.orders:
+            self._groups.setdefault(group.product_code, group)
+
+    def _intern(self, record: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+        # Order lines repeat the same few thousand codes millions of times.
+        codes = self._codes
+        for name in fields:
+            value = record.get(name)
+            if isinstance(value, str):
+                record[name] = codes.setdefault(value, value)
+        return record
+
+    def _error(self, section: str, row: int, code: str, msg: str, loc: Any = None) -> None:
+        self.errors.append({"section": section, "row": row, "code": code, "loc": loc, "msg": msg})
+        if len(self.errors) >= self.max_errors:
+            raise IngestError(self.errors, truncated=True)
+
+    def add(self, section: str, record: Any) -> None:
+        if section not in SECTIONS:
+            raise ValueError(f"Unknown ingest section '{section}', expected one of {sorted(SECTIONS)}")
+        row = self.rows[section]
+        self.rows[section] = row + 1
+        if not isinstance(record, dict):
+            self._error(section, row, "NOT_AN_OBJECT", "record must be a JSON object")
+            return
+        pending = self._pending[section]
+        pending.append((row, self._intern(record, SECTIONS[section][1])))
+        if len(pending) >= self.chunk_size:
+            self._flush(section)
+
+    def extend(self, section: str, records: Iterable[Any]) -> None:
+        for record in records:
+            self.add(section, record)
+
+    def feed(self, section: str, source: Source, fmt: Optional[str] = None) -> None:
+        self.extend(section, iter_records(source, fmt))
+
+    def _validate(self, section: str, pending: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Any]]:
+        # Order feeds carry either flat order lines or whole OrderGroups.
+        grouped = section == "orders" and "orders" in pending[0][1]
+        adapter = _ADAPTERS["orders.group" if grouped else section]
+        try:
+            items = adapter.validate_python([record for _, record in pending])
+        except ValidationError as exc:
+            bad = set()
+            for issue in exc.errors():
+                loc = issue["loc"]
+                bad.add(loc[0])
+                self._error(section, pending[loc[0]][0], "INVALID", issue["msg"], ".".join(map(str, loc[1:])))
+            pending = [entry for i, entry in enumerate(pending) if i not in bad]
+            items = adapter.validate_python([record for _, record in pending])
+        return [(row, item) for (row, _), item in zip(pending, items)]
+
+    def _flush(self, section: str) -> None:
+        pending = self._pending[section]
+        if not pending:
+            return
+        self._pending[section] = []
+        items = self._validate(section, pending)
+        state = self.frame.state
+        if section == "orders":
+            self._add_orders(items)
+            return
+        if section != "state.inventory":
+            self._check(section, items, week=section != "stocks")
+        if section in self._tables:
+            # Lots are kept columnar per chunk and joined once in build().
+            self._tables[section].append(PlanTable.from_items([item for _, item in items]))
+            return
+        target = self.frame.problemData.stocks if section == "stocks" else state.inventory
+        target.extend(item for _, item in items)
+
+    def _check(self, section: str, items: List[Tuple[int, Any]], week: bool) -> None:
+        for row, item in items:
+            if item.product_code not in self._products:
+                self._error(section, row, "UNKNOWN_PRODUCT", f"unknown product {item.product_code}")
+            if week and item.week is not None and item.week not in self._weeks:
+                self._error(section, row, "UNKNOWN_TIME_BUCKET", f"unknown time bucket {item.week}")
+
+    def _add_orders(self, items: List[Tuple[int, Any]]) -> None:
+        for row, item in items:
+            lines = item.orders if isinstance(item, OrderGroup) else [OrderItem(week=item.week, qty=item.qty)]
+            if item.product_code not in self._products:
+                self._error("orders", row, "UNKNOWN_PRODUCT", f"unknown product {item.product_code}")
+            for line in lines:
+                if line.week not in self._weeks:
+                    self._error("orders", row, "UNKNOWN_TIME_BUCKET", f"unknown time bucket {line.week}")
+            group = self._groups.get(item.product_code)
+            if group is None:
+                group = OrderGroup(product_code=item.product_code, orders=[])
+                self._groups[item.product_code] = group
+                self.frame.problemData.orders.append(group)
+            group.orders.extend(lines)
+
+    def build(self) -> ProblemFrame:
+        for section in SECTIONS:
+            self._flush(section)
+        if self.errors:
+            raise IngestError(self.errors)
+        state = self.frame.state
+        shared = state.lots is state.plan
+        state.plan = PlanTable.concat([state.plan, *self._tables["state.plan"]])
+        state.lots = state.plan if shared else PlanTable.concat([state.lots, *self._tables["state.lots"]])
+        if not state.lots and state.plan:
+            state.lots = state.plan
+        return self.frame
+
+
+def load_problem_frame_stream(
+    frame: Union[Source, Dict[str, Any]],
+    feeds: Optional[Dict[str, Union[Source, Tuple[Source, str]]]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_errors: int = DEFAULT_MAX_ERRORS,
+) -> ProblemFrame:
+    # frame: the problem frame JSON (path, stream or dict), typically with the
+    # big arrays left out. feeds: section -> side file or (stream, format),
+    # e.g. {"orders": "erp/orders.csv", "state.plan": "plan.ndjson"}.
+    if isinstance(frame, (str, Path)):
+        frame = json.loads(Path(frame).read_text(encoding="utf-8"))
+    elif isinstance(frame, io.IOBase):
+        frame = json.load(frame)
+    builder = StreamingFrameBuilder(frame, chunk_size=chunk_size, max_errors=max_errors)
+    for section, source in (feeds or {}).items():
+        if isinstance(source, tuple):
+            builder.feed(section, *source)
+        else:
+            builder.feed(section, source)
+    return builder.build()
@@ -0,0 +1,428 @@
+# TR: Plan lotlari icin sutun bazli PlanTable; PlanItem nesneleri yalnizca serilestirmede uretilir.
+# EN: Columnar PlanTable for plan lots; PlanItem objects are only produced at serialization time.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pydantic_core import core_schema
+
+MISSING = -1
+VALIDATE_CHUNK = 10000
+TIME_COLUMNS = ("setup_start_time", "setup_end_time", "process_start_time", "process_end_time")
+
+
+class PlanResource(BaseModel):
+    type: str
+    id: str | int
+
+
+class PlanItem(BaseModel):
+    lot_id: Optional[str] = None
+    product_code: str
+    process_code: str
+    week: Optional[str] = None
+    qty: float
+    qty_type: Optional[str] = None
+    setup_start_time: Optional[datetime] = None
+    setup_end_time: Optional[datetime] = None
+    process_start_time: Optional[datetime] = None
+    process_end_time: Optional[datetime] = None
+    resources: List[PlanResource] = Field(default_factory=list)
+
+
+class Pool:
+    # Distinct values in first-seen order; columns hold int32 positions.
+    # Keys include the type so that machine 12 and machine "12" round-trip.
+    def __init__(self, values: Iterable[Any] = ()) -> None:
+        self.values: List[Any] = []
+        self.ids: Dict[Tuple[type, Any], int] = {}
+        for value in values:
+            self.add(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, value: Any) -> int:
+        if value is None:
+            return MISSING
+        key = (type(value), value)
+        idx = self.ids.get(key)
+        if idx is None:
+            idx = len(self.values)
+            self.ids[key] = idx
+            self.values.append(value)
+        return idx
+
+    def column(self, values: Iterable[Any], count: int = -1) -> np.ndarray:
+        add = self.add
+        return np.fromiter((add(v) for v in values), dtype=np.int32, count=count)
+
+    def lookup(self, column: np.ndarray) -> List[Any]:
+        values = self.values
+        return [None if i == MISSING else values[i] for i in column.tolist()]
+
+
+def _epoch(value: Optional[datetime]) -> float:
+    # Naive timestamps are taken as UTC, like the rest of the planner.
+    if value is None:
+        return np.nan
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _tz_minutes(value: Optional[datetime]) -> float:
+    # UTC offset of an aware timestamp in minutes, NaN for naive or None.
+    offset = None if value is None else value.utcoffset()
+    return np.nan if offset is None else offset.total_seconds() / 60.0
+
+
+def _datetimes(column: np.ndarray, tz_minutes: np.ndarray) -> List[Optional[datetime]]:
+    # Timestamps come back in the offset they were given with; naive ones stay naive.
+    known = ~np.isnan(column)
+    micros = np.where(known, np.round(column * 1e6), 0).astype(np.int64).astype("datetime64[us]").tolist()
+    values = [value if ok else None for value, ok in zip(micros, known.tolist())]
+    for i in np.flatnonzero(known & ~np.isnan(tz_minutes)).tolist():
+        zone = timezone(timedelta(minutes=float(tz_minutes[i])))
+        values[i] = values[i].replace(tzinfo=timezone.utc).astimezone(zone)
+    return values
+
+
+def csr_take(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Entry positions of the given CSR rows (in the given order) and their new offsets.
+    rows = np.asarray(rows, dtype=np.int64)
+    counts = offsets[rows + 1] - offsets[rows]
+    new_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    positions = np.repeat(offsets[rows] - new_offsets[:-1], counts) + np.arange(new_offsets[-1], dtype=np.int64)
+    return positions, new_offsets
+
+
+@dataclass
+class TablePatch:
+    # The patched table is concat([old, upserts]).take(order).
+    order: np.ndarray       # rows of concat([old, upserts]), in new table order
+    removed: np.ndarray     # old rows that were replaced or deleted
+    added: np.ndarray       # new table rows holding the upserts
+    inserted: int
+    updated: int
+    deleted: int
+
+
+_ITEMS = TypeAdapter(List[PlanItem])
+
+
+class PlanTable:
+    # One row per lot. Codes are pool ids (MISSING for None), timestamps are
+    # epoch seconds (NaN for None) with their UTC offset in minutes alongside
+    # (NaN for naive timestamps), resources are stored CSR-style: the
+    # resources of row i are res_type/res_id[res_offsets[i]:res_offsets[i + 1]].
+    def __init__(self) -> None:
+        self.products, self.processes, self.weeks, self.qty_types = Pool(), Pool(), Pool(), Pool()
+        self.resource_types, self.resource_ids = Pool(), Pool()
+        self.lot_id: List[Optional[str]] = []
+        self.product = np.zeros(0, dtype=np.int32)
+        self.process = np.zeros(0, dtype=np.int32)
+        self.week = np.zeros(0, dtype=np.int32)
+        self.qty_type = np.zeros(0, dtype=np.int32)
+        self.qty = np.zeros(0)
+        self.times = np.zeros((len(TIME_COLUMNS), 0))
+        self.tz_minutes = np.zeros((len(TIME_COLUMNS), 0))
+        self.res_offsets = np.zeros(1, dtype=np.int64)
+        self.res_type = np.zeros(0, dtype=np.int32)
+        self.res_id = np.zeros(0, dtype=np.int32)
+
+    # -- construction ------------------------------------------------------
+
+    @classmethod
+    def from_items(cls, items: Sequence[PlanItem]) -> "PlanTable":
+        table = cls()
+        n = len(items)
+        table.lot_id = [item.lot_id for item in items]
+        table.product = table.products.column((item.product_code for item in items), n)
+        table.process = table.processes.column((item.process_code for item in items), n)
+        table.week = table.weeks.column((item.week for item in items), n)
+        table.qty_type = table.qty_types.column((item.qty_type for item in items), n)
+        table.qty = np.fromiter((item.qty for item in items), dtype=np.float64, count=n)
+        table.times = np.array(
+            [[_epoch(getattr(item, name)) for item in items] for name in TIME_COLUMNS], dtype=np.float64
+        ).reshape(len(TIME_COLUMNS), n)
+        table.tz_minutes = np.array(
+            [[_tz_minutes(getattr(item, name)) for item in items] for name in TIME_COLUMNS], dtype=np.float64
+        ).reshape(len(TIME_COLUMNS), n)
+        counts = np.fromiter((len(item.resources) for item in items), dtype=np.int64, count=n)
+        table.res_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        resources = [r for item in items for r in item.resources]
+        table.res_type = table.resource_types.column((r.type for r in resources), len(resources))
+        table.res_id = table.resource_ids.column((r.id for r in resources), len(resources))
+        return table
+
+    @classmethod
+    def from_columns(
+        cls,
+        lot_id: Sequence[Optional[str]],
+        product: Sequence[str],
+        process: Sequence[str],
+        week: Sequence[Optional[str]],
+        qty: np.ndarray,
+        times: np.ndarray,
+        machine: Sequence[Optional[Any]],
+        mold: Sequence[Optional[Any]],
+    ) -> "PlanTable":
+        # Builds a table straight from per-lot columns (no PlanItem objects);
+        # times is (4, n) UTC epoch seconds in TIME_COLUMNS order.
+        table = cls()
+        n = len(lot_id)
+        table.lot_id = list(lot_id)
+        table.product = table.products.column(product, n)
+        table.process = table.processes.column(process, n)
+        table.week = table.weeks.column(week, n)
+        table.qty_type = np.full(n, MISSING, dtype=np.int32)
+        table.qty = np.asarray(qty, dtype=np.float64)
+        table.times = np.asarray(times, dtype=np.float64).reshape(len(TIME_COLUMNS), n)
+        table.tz_minutes = np.full(table.times.shape, np.nan)
+        kinds = [(kind, table.resource_types.add(kind), column) for kind, column in (("machine", machine), ("mold", mold))]
+        ids = np.array([table.resource_ids.column(column, n) for _, _, column in kinds]).reshape(2, n)
+        present = ids != MISSING
+        table.res_offsets = np.concatenate([[0], np.cumsum(present.sum(axis=0))]).astype(np.int64)
+        # Row-major over lots so each lot's machine comes before its mold.
+        table.res_type = np.broadcast_to(np.array([k[1] for k in kinds], dtype=np.int32)[:, None], (2, n)).T[present.T]
+        table.res_id = ids.T[present.T].astype(np.int32)
+        return table
+
+    @classmethod
+    def from_records(cls, records: Sequence[Any], chunk_size: int = VALIDATE_CHUNK) -> "PlanTable":
+        # Rows are validated as PlanItem a chunk at a time, so only one chunk
+        # of pydantic objects is alive at once.
+        chunks = []
+        for start in range(0, len(records), chunk_size):
+            try:
+                items = _ITEMS.validate_python(list(records[start:start + chunk_size]))
+            except ValidationError as exc:
+                issues = [
+                    f"{'.'.join(map(str, (start + e['loc'][0], *e['loc'][1:])))}: {e['msg']}" for e in exc.errors()[:10]
+                ]
+                raise ValueError(f"Invalid plan items: {'; '.join(issues)}") from None
+            chunks.append(cls.from_items(items))
+        return cls.concat(chunks)
+
+    @classmethod
+    def concat(cls, tables: Sequence["PlanTable"]) -> "PlanTable":
+        if len(tables) == 1:
+            return tables[0]
+        out = cls()
+        if not tables:
+            return out
+
+        def remap(pool: Pool, target: Pool, column: np.ndarray) -> np.ndarray:
+            mapping = np.array([target.add(v) for v in pool.values] + [MISSING], dtype=np.int32)
+            return mapping[column]          # MISSING (-1) picks the trailing sentinel
+
+        out.lot_id = [lot for t in tables for lot in t.lot_id]
+        for name, pool in (("product", "products"), ("process", "processes"), ("week", "weeks"), ("qty_type", "qty_types")):
+            setattr(out, name, np.concatenate(
+                [remap(getattr(t, pool), getattr(out, pool), getattr(t, name)) for t in tables]
+            ).astype(np.int32))
+        out.qty = np.concatenate([t.qty for t in tables])
+        out.times = np.concatenate([t.times for t in tables], axis=1)
+        out.tz_minutes = np.concatenate([t.tz_minutes for t in tables], axis=1)
+        counts = np.concatenate([np.diff(t.res_offsets) for t in tables])
+        out.res_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        out.res_type = np.concatenate(
+            [remap(t.resource_types, out.resource_types, t.res_type) for t in tables]
+        ).astype(np.int32)
+        out.res_id = np.concatenate([remap(t.resource_ids, out.resource_ids, t.res_id) for t in tables]).astype(np.int32)
+        return out
+
+    def take(self, rows: Sequence[int]) -> "PlanTable":
+        # Row selection; the result shares this table's pools.
+        rows = np.asarray(rows, dtype=np.int64)
+        out = PlanTable()
+        out.products, out.processes, out.weeks, out.qty_types = self.products, self.processes, self.weeks, self.qty_types
+        out.resource_types, out.resource_ids = self.resource_types, self.resource_ids
+        out.lot_id = list(map(self.lot_id.__getitem__, rows.tolist()))
+        for name in ("product", "process", "week", "qty_type", "qty"):
+            setattr(out, name, getattr(self, name)[rows])
+        out.times = self.times[:, rows]
+        out.tz_minutes = self.tz_minutes[:, rows]
+        positions, out.res_offsets = csr_take(self.res_offsets, rows)
+        out.res_type = self.res_type[positions]
+        out.res_id = self.res_id[positions]
+        return out
+
+    def plan_patch(self, upsert_ids: Sequence[str], delete_ids: Sequence[str]) -> TablePatch:
+        # Upserts replace the row with the same lot_id in place or are appended;
+        # with duplicate lot ids the first row is the one addressed.
+        n = len(self)
+        rows: Dict[Optional[str], int] = dict(zip(reversed(self.lot_id), range(n - 1, -1, -1)))
+        source = np.arange(n, dtype=np.int64)
+        keep = np.ones(n, dtype=bool)
+        appended, updated = [], []
+        for j, lot_id in enumerate(upsert_ids):
+            row = rows.get(lot_id)
+            if row is None:
+                appended.append(n + j)
+            else:
+                source[row] = n + j
+                updated.append(row)
+        unknown = [lot_id for lot_id in delete_ids if lot_id not in rows]
+        if unknown:
+            raise ValueError(f"Unknown lot ids to delete: {unknown[:10]}")
+        deleted = [rows[lot_id] for lot_id in delete_ids]
+        keep[deleted] = False
+        order = np.concatenate([source[keep], np.array(appended, dtype=np.int64)])
+        return TablePatch(
+            order=order,
+            removed=np.array(sorted(updated + deleted), dtype=np.int64),
+            added=np.flatnonzero(order >= n),
+            inserted=len(appended),
+            updated=len(updated),
+            deleted=len(deleted),
+        )
+
+    # -- access ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.lot_id)
+
+    def __iter__(self) -> Iterator[PlanItem]:
+        for start in range(0, len(self), VALIDATE_CHUNK):
+            yield from self.to_items(start, start + VALIDATE_CHUNK)
+
+    def __getitem__(self, row: int) -> PlanItem:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("PlanTable row out of range")
+        return self.to_items(row, row + 1)[0]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PlanTable):
+            return NotImplemented
+        return len(self) == len(other) and self.to_records(mode="python") == other.to_records(mode="python")
+
+    def __repr__(self) -> str:
+        return f"PlanTable(rows={len(self)}, resources={self.res_id.size})"
+
+    @property
+    def n_resources(self) -> int:
+        return int(self.res_id.size)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.product, self.process, self.week, self.qty_type, self.qty, self.times, self.tz_minutes,
+                  self.res_offsets, self.res_type, self.res_id)
+        return sum(a.nbytes for a in arrays) + 8 * len(self.lot_id)
+
+    def resource_rows(self) -> np.ndarray:
+        # Lot row of every resource entry.
+        return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.res_offsets))
+
+    def first_resource(self, kind: str) -> np.ndarray:
+        # Resource pool id of the first resource of the given type per lot, MISSING if none.
+        out = np.full(len(self), MISSING, dtype=np.int32)
+        code = self.resource_types.ids.get((str, kind), MISSING)
+        rows = np.flatnonzero(self.res_type == code) if code != MISSING else np.zeros(0, dtype=np.intp)
+        if rows.size:
+            lots, first = np.unique(self.resource_rows()[rows], return_index=True)
+            out[lots] = self.res_id[rows[first]]
+        return out
+
+    @property
+    def machine(self) -> np.ndarray:
+        return self.first_resource("machine")
+
+    @property
+    def mold(self) -> np.ndarray:
+        return self.first_resource("mold")
+
+    def time(self, name: str) -> np.ndarray:
+        return self.times[TIME_COLUMNS.index(name)]
+
+    def select(
+        self, product: Optional[str] = None, week: Optional[str] = None, machine: Optional[str] = None
+    ) -> np.ndarray:
+        # Rows matching every given code (None matches anything); a lot matches
+        # a machine if any of its machine resources has that id.
+        keep = np.ones(len(self), dtype=bool)
+        for pool, column, code in ((self.products, self.product, product), (self.weeks, self.week, week)):
+            if code is not None:
+                keep &= column == pool.ids.get((str, code), MISSING - 1)
+        if machine is not None:
+            kind = self.resource_types.ids.get((str, "machine"), MISSING)
+            ids = [i for i, value in enumerate(self.resource_ids.values) if str(value) == machine]
+            hit = (self.res_type == kind) & np.isin(self.res_id, ids)
+            lots = np.zeros(len(self), dtype=bool)
+            lots[self.resource_rows()[hit]] = True
+            keep &= lots
+        return np.flatnonzero(keep)
+
+    # -- materialization -----------------------------------------------------
+
+    def to_records(self, start: int = 0, stop: Optional[int] = None, mode: str = "python") -> List[Dict[str, Any]]:
+        # PlanItem-shaped dicts; mode="json" renders timestamps as ISO strings.
+        rows = slice(start, len(self) if stop is None else min(stop, len(self)))
+        lot_ids = self.lot_id[rows]
+        columns = {
+            "product_code": self.products.lookup(self.product[rows]),
+            "process_code": self.processes.lookup(self.process[rows]),
+            "week": self.weeks.lookup(self.week[rows]),
+            "qty": self.qty[rows].tolist(),
+            "qty_type": self.qty_types.lookup(self.qty_type[rows]),
+        }
+        for i, name in enumerate(TIME_COLUMNS):
+            values = _datetimes(self.times[i, rows], self.tz_minutes[i, rows])
+            if mode == "json":
+                values = [None if v is None else v.isoformat() for v in values]
+            columns[name] = values
+        offsets = self.res_offsets[rows.start:rows.stop + 1].tolist() if len(lot_ids) else [0]
+        lo, hi = offsets[0], offsets[-1]
+        types = self.resource_types.lookup(self.res_type[lo:hi])
+        ids = self.resource_ids.lookup(self.res_id[lo:hi])
+        records = []
+        for k, lot_id in enumerate(lot_ids):
+            record = {"lot_id": lot_id}
+            for name, values in columns.items():
+                record[name] = values[k]
+            record["resources"] = [
+                {"type": types[j], "id": ids[j]} for j in range(offsets[k] - lo, offsets[k + 1] - lo)
+            ]
+            records.append(record)
+        return records
+
+    def to_items(self, start: int = 0, stop: Optional[int] = None) -> List[PlanItem]:
+        construct, resource = PlanItem.model_construct, PlanResource.model_construct
+        items = []
+        for record in self.to_records(start, stop):
+            record["resources"] = [resource(**r) for r in record["resources"]]
+            items.append(construct(**record))
+        return items
+
+    # -- pydantic integration ----------------------------------------------
+
+    @classmethod
+    def _validate(cls, value: Any) -> "PlanTable":
+        if isinstance(value, PlanTable):
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls.from_records(value)
+        raise ValueError("Expected a list of plan items")
+
+    @staticmethod
+    def _serialize(table: "PlanTable", info: core_schema.SerializationInfo) -> List[Dict[str, Any]]:
+        return table.to_records(mode="json" if info.mode_is_json() else "python")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: Any, handler: Any) -> Dict[str, Any]:
+        # Documented as what the API exchanges: a list of PlanItem.
+        return handler(core_schema.list_schema(PlanItem.__pydantic_core_schema__))
@@ -2,10 +2,13 @@
 # EN: Pydantic data models for ProblemData/ScenarioConfig/State.
 from __future__ import annotations
 
-from datetime import date, datetime
-from typing import Any, Dict, List, Optional
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_serializer, model_validator
+
+# PlanItem / PlanResource live with PlanTable and are re-exported for existing imports.
+from app.frame.models.plan_table import PlanItem, PlanResource, PlanTable  # noqa: F401
 
 
 class ProblemMeta(BaseModel):
@@ -186,25 +189,6 @@ class ScenarioConfig(BaseModel):
     constraints: List[ScenarioConstraint] = Field(default_factory=list)
 
 
-class PlanResource(BaseModel):
-    type: str
-    id: str | int
-
-
-class PlanItem(BaseModel):
-    lot_id: Optional[str] = None
-    product_code: str
-    process_code: str
-    week: Optional[str] = None
-    qty: float
-    qty_type: Optional[str] = None
-    setup_start_time: Optional[datetime] = None
-    setup_end_time: Optional[datetime] = None
-    process_start_time: Optional[datetime] = None
-    process_end_time: Optional[datetime] = None
-    resources: List[PlanResource] = Field(default_factory=list)
-
-
 class LotInventory(BaseModel):
     product_code: str
     time_bucket_id: str | None = None
@@ -225,9 +209,10 @@ class State(BaseModel):
     model_config = ConfigDict(populate_by_name=True, validate_by_name=True, validate_by_alias=True)
 
     meta: Optional[StateMeta] = None
-    lots: List[PlanItem] = Field(default_factory=list)
+    # Columnar; PlanItem objects only appear when a state is serialized.
+    lots: PlanTable = Field(default_factory=PlanTable)
     inventory: List[LotInventory] = Field(default_factory=list)
-    plan: List[PlanItem] = Field(default_factory=list)
+    plan: PlanTable = Field(default_factory=PlanTable)
 
     @model_validator(mode="after")
     def normalize_plan(self) -> "State":
@@ -240,3 +225,37 @@ class ProblemFrame(BaseModel):
     problemData: ProblemData
     scenarioConfig: ScenarioConfig
     state: State
+
+    # Set on frames loaded from our own repository: state is decoded on first access.
+    _state_loader: Optional[Callable[[], State]] = PrivateAttr(default=None)
+
+    @classmethod
+    def with_lazy_state(
+        cls, problem_data: ProblemData, scenario_config: ScenarioConfig, loader: Callable[[], State]
+    ) -> "ProblemFrame":
+        # Trusted, already validated parts only; nothing is revalidated here.
+        frame = cls.model_construct(problemData=problem_data, scenarioConfig=scenario_config)
+        frame._state_loader = loader
+        return frame
+
+    @property
+    def state_loaded(self) -> bool:
+        return "state" in self.__dict__
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "state":
+            private = self.__pydantic_private__ or {}
+            loader = private.get("_state_loader")
+            if loader is not None:
+                state = loader()
+                self.__dict__["state"] = state
+                self.__pydantic_fields_set__.add("state")
+                private["_state_loader"] = None
+                return state
+        return super().__getattr__(name)
+
+    @model_serializer(mode="wrap")
+    def _materialize(self, handler):
+        if not self.state_loaded:
+            self.state
+        return handler(self)
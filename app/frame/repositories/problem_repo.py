@@ -1,28 +1,239 @@
-# TR: ProblemFrame verisini diske kaydeder/okur.
-# EN: Persists ProblemFrame to disk and loads it.
+# TR: ProblemFrame verisini diske kaydeder/okur; ana veri icerik ozetiyle bir kez, state'ler surumlu olarak saklanir.
+# EN: Persists ProblemFrame to disk; master data is stored once by content hash, states as append-only versions.
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import uuid
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Type, TypeVar, Union
 
-from app.frame.models.problem import ProblemFrame
+from pydantic import BaseModel
+
+from app.frame.models.problem import ProblemData, ProblemFrame, ScenarioConfig, State
+from app.frame.repositories.state_codec import decode_state, encode_state
+from app.telemetry import stage
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def atomic_write(path: Path, content: Union[str, bytes], fsync: bool = False, exclusive: bool = False) -> None:
+    # Write to a temp file in the same directory and rename it into place, so
+    # readers (and a restart after a crash) never see a partial file.
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with tmp.open("wb") as handle:
+            handle.write(content.encode("utf-8") if isinstance(content, str) else content)
+            if fsync:
+                handle.flush()
+                os.fsync(handle.fileno())
+        if exclusive and path.exists():
+            raise FileExistsError(path)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
 
 
 class ProblemRepository:
-    def __init__(self, base_path: Path | str = "data") -> None:
+    # Layout under base_path:
+    #   blobs/{sha256}.json            problemData / scenarioConfig, shared by every frame using them
+    #   frames/{id}.json               manifest: blob hashes, head state version and version summaries
+    #   states/{id}/{version}.json     append-only state versions
+    # Frames written by the old layout ({id}.json) are still readable.
+    #
+    # With binary=True every state also gets a .bin twin (state_codec npz,
+    # never pickle). Those files are only ever written by this class, so
+    # trusted loads decode them without revalidation and leave the state to be
+    # decoded on first access; JSON stays the interchange format and fallback.
+    # Blobs are read with pydantic's JSON validator, which is as fast as
+    # unpickling the validated model was.
+    def __init__(
+        self, base_path: Path | str = "data", fsync: bool = False, binary: bool = True, trusted: bool = True
+    ) -> None:
         self.base_path = Path(base_path)
-        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.binary = binary
+        self.trusted = trusted
+        self.blob_path = self.base_path / "blobs"
+        self.frame_path = self.base_path / "frames"
+        self.state_path = self.base_path / "states"
+        for path in (self.blob_path, self.frame_path, self.state_path):
+            path.mkdir(parents=True, exist_ok=True)
+        # Known ids, so existence checks never touch or parse frame files.
+        self._ids: Set[str] = {path.stem for path in self.frame_path.glob("*.json")}
+        self._ids.update(path.stem for path in self.base_path.glob("*.json"))
+
+    # -- blobs -----------------------------------------------------------
+
+    def put_blob(self, model: BaseModel, memo: Optional[Dict[int, str]] = None) -> str:
+        # memo maps id(model) -> digest within one batch, so a model object
+        # shared by many frames is serialized and hashed once.
+        if memo is not None and id(model) in memo:
+            return memo[id(model)]
+        text = _dumps(model.model_dump(mode="json", by_alias=True))
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        path = self.blob_path / f"{digest}.json"
+        if not path.exists():
+            atomic_write(path, text, self.fsync)
+        if memo is not None:
+            memo[id(model)] = digest
+        return digest
+
+    def get_blob(self, digest: str) -> Dict[str, Any]:
+        return json.loads((self.blob_path / f"{digest}.json").read_text(encoding="utf-8"))
+
+    def read_blob(self, digest: str, cls: Type[ModelT]) -> ModelT:
+        return cls.model_validate_json((self.blob_path / f"{digest}.json").read_bytes())
+
+    # -- frames ----------------------------------------------------------
+
+    def _manifest_file(self, problem_id: str) -> Path:
+        return self.frame_path / f"{problem_id}.json"
+
+    def _manifest(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        path = self._manifest_file(problem_id)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
 
-    def save(self, problem_id: str, frame: ProblemFrame) -> Path:
-        path = self.base_path / f"{problem_id}.json"
-        payload = frame.model_dump(mode="json", by_alias=True)
-        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    def _write_manifest(self, problem_id: str, manifest: Dict[str, Any]) -> Path:
+        path = self._manifest_file(problem_id)
+        atomic_write(path, _dumps(manifest), self.fsync)
         return path
 
-    def load(self, problem_id: str) -> Optional[ProblemFrame]:
-        path = self.base_path / f"{problem_id}.json"
+    def versioned(self, problem_id: str) -> bool:
+        return self._manifest_file(problem_id).exists()
+
+    def exists(self, problem_id: str) -> bool:
+        return problem_id in self._ids
+
+    def ids(self) -> List[str]:
+        return sorted(self._ids)
+
+    def flush(self, problem_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        # Writes are synchronous; kept for parity with WriteBehindRepository.
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "sync", "queue_depth": 0, "fsync": self.fsync}
+
+    @stage("repo.save")
+    def save(self, problem_id: str, frame: ProblemFrame, memo: Optional[Dict[int, str]] = None) -> Path:
+        manifest = {
+            "problem_data": self.put_blob(frame.problemData, memo),
+            "scenario_config": self.put_blob(frame.scenarioConfig, memo),
+            "head": 0,
+        }
+        previous = self._manifest(problem_id)
+        if previous is not None:
+            manifest["head"] = previous["head"]
+            manifest["versions"] = previous.get("versions", [])
+        path = self._write_manifest(problem_id, manifest)
+        self._ids.add(problem_id)
+        self.save_state(problem_id, frame.state)
+        return path
+
+    def save_many(self, frames: Dict[str, ProblemFrame]) -> List[Path]:
+        memo: Dict[int, str] = {}
+        return [self.save(problem_id, frame, memo) for problem_id, frame in frames.items()]
+
+    @stage("repo.load")
+    def load(self, problem_id: str, trusted: Optional[bool] = None) -> Optional[ProblemFrame]:
+        trusted = self.trusted if trusted is None else trusted
+        manifest = self._manifest(problem_id)
+        if manifest is None:
+            legacy = self.base_path / f"{problem_id}.json"
+            if problem_id not in self._ids or not legacy.exists():
+                return None
+            return ProblemFrame.model_validate(json.loads(legacy.read_text(encoding="utf-8")))
+        problem_data = self.read_blob(manifest["problem_data"], ProblemData)
+        scenario_config = self.read_blob(manifest["scenario_config"], ScenarioConfig)
+        head = manifest["head"]
+        if not trusted:
+            state = self.load_state(problem_id, head, trusted=False) if head else State()
+            return ProblemFrame(problemData=problem_data, scenarioConfig=scenario_config, state=state)
+        return ProblemFrame.with_lazy_state(
+            problem_data, scenario_config, lambda: self.load_state(problem_id, head) if head else State()
+        )
+
+    # -- state versions --------------------------------------------------
+
+    def _state_file(self, problem_id: str, version: int) -> Path:
+        return self.state_path / problem_id / f"{version:08d}.json"
+
+    @stage("repo.save_state")
+    def save_state(self, problem_id: str, state: State) -> int:
+        manifest = self._manifest(problem_id)
+        if manifest is None:
+            raise KeyError(f"Problem {problem_id} not found")
+        version = manifest["head"] + 1
+        path = self._state_file(problem_id, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        summary = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "iteration": state.meta.iteration if state.meta is not None else None,
+            "lots": len(state.lots),
+        }
+        record = {
+            "version": version,
+            "created_at": summary["created_at"],
+            "problem_data": manifest["problem_data"],
+            "scenario_config": manifest["scenario_config"],
+            "state": state.model_dump(mode="json", by_alias=True),
+        }
+        # Versions are never rewritten; only the manifest head moves.
+        atomic_write(path, _dumps(record), self.fsync, exclusive=True)
+        if self.binary:
+            atomic_write(path.with_suffix(".bin"), encode_state(state), self.fsync)
+        manifest["head"] = version
+        manifest.setdefault("versions", []).append(summary)
+        self._write_manifest(problem_id, manifest)
+        return version
+
+    def _state_record(self, problem_id: str, version: int) -> Optional[Dict[str, Any]]:
+        path = self._state_file(problem_id, version)
         if not path.exists():
             return None
-        raw = json.loads(path.read_text(encoding="utf-8"))
-        return ProblemFrame.model_validate(raw)
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    @stage("repo.load_state")
+    def load_state(self, problem_id: str, version: int, trusted: Optional[bool] = None) -> Optional[State]:
+        binary = self._state_file(problem_id, version).with_suffix(".bin")
+        if (self.trusted if trusted is None else trusted) and binary.exists():
+            state = decode_state(binary.read_bytes())
+            if state is not None:
+                return state
+        record = self._state_record(problem_id, version)
+        return None if record is None else State.model_validate(record["state"])
+
+    def list_states(self, problem_id: str) -> Optional[List[Dict[str, Any]]]:
+        # Summaries come from the manifest; only versions written before it
+        # kept them are read from their state file.
+        manifest = self._manifest(problem_id)
+        if manifest is None:
+            return None
+        summaries = {summary["version"]: summary for summary in manifest.get("versions", [])}
+        versions = []
+        for version in range(1, manifest["head"] + 1):
+            summary = summaries.get(version)
+            if summary is None:
+                record = self._state_record(problem_id, version)
+                if record is None:
+                    continue
+                state = record["state"]
+                summary = {
+                    "version": version,
+                    "created_at": record["created_at"],
+                    "iteration": (state.get("meta") or {}).get("iteration"),
+                    "lots": len(state.get("lots") or []),
+                }
+            versions.append({**summary, "head": version == manifest["head"]})
+        return versions
@@ -0,0 +1,95 @@
+# TR: State icin kompakt ikili kodlama; lot tablolari sutunlari ile npz olarak saklanir, dogrulamasiz geri kurulur.
+# EN: Compact binary encoding of State; lot tables are stored as npz columns and rebuilt without validation.
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.frame.models.plan_table import TIME_COLUMNS, PlanItem, PlanResource, PlanTable, Pool
+from app.frame.models.problem import LotInventory, State, StateMeta
+
+# Bumped when the encoding below changes; model changes are picked up by
+# STATE_FORMAT on their own.
+LAYOUT = 4
+
+_INVENTORY_FIELDS = tuple(LotInventory.model_fields)
+_POOLS = ("products", "processes", "weeks", "qty_types", "resource_types", "resource_ids")
+_COLUMNS = ("product", "process", "week", "qty_type", "qty", "times", "tz_minutes", "res_offsets", "res_type", "res_id")
+
+
+def schema_key(*models: Type[BaseModel], layout: int = LAYOUT) -> str:
+    # Digest of every field name and annotation of the given models, so a
+    # file written for another model shape is never decoded.
+    shape = [[model.__name__, [[name, repr(f.annotation)] for name, f in model.model_fields.items()]] for model in models]
+    text = json.dumps([layout, list(TIME_COLUMNS), shape])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+STATE_FORMAT = schema_key(State, StateMeta, LotInventory, PlanItem, PlanResource)
+
+
+def _flat_rows(items: List[BaseModel], names: Tuple[str, ...]) -> List[list]:
+    return [[item.__dict__[name] for name in names] for item in items]
+
+
+def _flat_items(cls: Type[BaseModel], names: Tuple[str, ...], rows: List[list]) -> List[BaseModel]:
+    construct, fields = cls.model_construct, set(names)
+    return [construct(fields, **dict(zip(names, row))) for row in rows]
+
+
+def _split_table(name: str, table: PlanTable, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    for column in _COLUMNS:
+        arrays[f"{name}.{column}"] = getattr(table, column)
+    return {"lot_id": table.lot_id, "pools": {pool: getattr(table, pool).values for pool in _POOLS}}
+
+
+def _join_table(name: str, header: Dict[str, Any], arrays: Any) -> PlanTable:
+    table = PlanTable()
+    table.lot_id = header["lot_id"]
+    for pool in _POOLS:
+        setattr(table, pool, Pool(header["pools"][pool]))
+    for column in _COLUMNS:
+        setattr(table, column, arrays[f"{name}.{column}"])
+    return table
+
+
+def encode_state(state: State) -> bytes:
+    # npz: PlanTable columns as arrays, everything else as one JSON header;
+    # nothing in it is executable, and it loads with allow_pickle=False.
+    arrays: Dict[str, np.ndarray] = {}
+    header = {
+        "format": STATE_FORMAT,
+        "meta": None if state.meta is None else state.meta.model_dump(),
+        "lots": _split_table("lots", state.lots, arrays),
+        "plan": None if state.plan is state.lots else _split_table("plan", state.plan, arrays),
+        "inventory": _flat_rows(state.inventory, _INVENTORY_FIELDS),
+    }
+    arrays["header"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_state(data: bytes) -> Optional[State]:
+    # None when the bytes are not a state of the current format.
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            header = json.loads(arrays["header"].tobytes())
+            if header.get("format") != STATE_FORMAT:
+                return None
+            lots = _join_table("lots", header["lots"], arrays)
+            plan = lots if header["plan"] is None else _join_table("plan", header["plan"], arrays)
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile):
+        return None
+    return State.model_construct(
+        meta=None if header["meta"] is None else StateMeta.model_construct(**header["meta"]),
+        lots=lots,
+        plan=plan,
+        inventory=_flat_items(LotInventory, _INVENTORY_FIELDS, header["inventory"]),
+    )
@@ -0,0 +1,197 @@
+# TR: ProblemRepository icin arka planda yazan, ayni id'nin kayitlarini birlestiren kalicilik katmani.
+# EN: Write-behind persistence for ProblemRepository; repeated saves of one id are coalesced.
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.frame.models.problem import ProblemData, ProblemFrame, ScenarioConfig, State
+from app.frame.repositories.problem_repo import ProblemRepository
+
+DEFAULT_COALESCE_SEC = 0.05
+WRITE_ATTEMPTS = 3
+RETRY_BACKOFF_SEC = 0.05
+
+
+@dataclass
+class PendingWrite:
+    # master is set when problemData / scenarioConfig still have to be written.
+    master: Optional[Tuple[ProblemData, ScenarioConfig]]
+    state: State
+    saves: int = 1
+
+
+class WriteBehindRepository:
+    # Same interface as ProblemRepository. Saves return once they are queued;
+    # a single writer thread persists the latest pending frame/state of each
+    # id, so a burst of state updates turns into one version on disk. Reads
+    # of a pending id are served from the queue or flush that id first.
+    def __init__(self, repository: ProblemRepository, coalesce_sec: float = DEFAULT_COALESCE_SEC) -> None:
+        self.repository = repository
+        self.coalesce_sec = coalesce_sec
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._pending: Dict[str, PendingWrite] = {}
+        self._writing: Dict[str, PendingWrite] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="repo-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def base_path(self):
+        return self.repository.base_path
+
+    # -- writes ------------------------------------------------------------
+
+    def save(self, problem_id: str, frame: ProblemFrame) -> None:
+        self._enqueue(problem_id, (frame.problemData, frame.scenarioConfig), frame.state)
+
+    def save_many(self, frames: Dict[str, ProblemFrame]) -> None:
+        # Queued under one lock so the writer picks the batch up in one pass.
+        with self._cond:
+            for problem_id, frame in frames.items():
+                self._enqueue(problem_id, (frame.problemData, frame.scenarioConfig), frame.state)
+
+    def save_state(self, problem_id: str, state: State) -> None:
+        # The version number is only known once the write lands.
+        with self._cond:
+            known = problem_id in self._pending or problem_id in self._writing
+        if not known and not self.repository.versioned(problem_id):
+            raise KeyError(f"Problem {problem_id} not found")
+        self._enqueue(problem_id, None, state)
+
+    def _enqueue(self, problem_id: str, master: Optional[Tuple[ProblemData, ScenarioConfig]], state: State) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Repository writer is closed")
+            pending = self._pending.get(problem_id)
+            if pending is None:
+                self._pending[problem_id] = PendingWrite(master, state)
+            else:
+                pending.master = master or pending.master
+                pending.state = state
+                pending.saves += 1
+                self.coalesced += 1
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+            if self.coalesce_sec > 0 and not self._closed:
+                time.sleep(self.coalesce_sec)
+            with self._cond:
+                self._writing, self._pending = self._pending, {}
+            memo: Dict[int, str] = {}
+            for problem_id, pending in self._writing.items():
+                self._write(problem_id, pending, memo)
+            with self._cond:
+                self._writing = {}
+                self._cond.notify_all()
+
+    def _write(self, problem_id: str, pending: PendingWrite, memo: Optional[Dict[int, str]] = None) -> None:
+        # Retried with exponential backoff; a write that still fails is
+        # dropped, counted in stats() and reported by the next flush().
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                if pending.master is not None:
+                    data, config = pending.master
+                    frame = ProblemFrame.model_construct(problemData=data, scenarioConfig=config, state=pending.state)
+                    self.repository.save(problem_id, frame, memo)
+                else:
+                    self.repository.save_state(problem_id, pending.state)
+                self.writes += 1
+                return
+            except Exception as exc:  # keep the writer alive
+                error = exc
+            if attempt + 1 < WRITE_ATTEMPTS:
+                time.sleep(RETRY_BACKOFF_SEC * 2 ** attempt)
+        with self._cond:
+            self.errors += 1
+            self.last_error = f"{problem_id}: {error}"
+
+    # -- durability --------------------------------------------------------
+
+    def _busy(self, problem_id: Optional[str]) -> bool:
+        if problem_id is None:
+            return bool(self._pending or self._writing)
+        return problem_id in self._pending or problem_id in self._writing
+
+    def flush(self, problem_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        # Block until everything queued so far (or for one id) is on disk.
+        # False on timeout or when a write failed for good in the meantime.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            errors = self.errors
+            while self._busy(problem_id):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self.errors == errors
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        flushed = self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return flushed
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._pending) + len(self._writing)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "mode": "write_behind",
+                "queue_depth": len(self._pending) + len(self._writing),
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "fsync": self.repository.fsync,
+            }
+
+    # -- reads -------------------------------------------------------------
+
+    def _queued(self, problem_id: str) -> Optional[PendingWrite]:
+        with self._cond:
+            return self._pending.get(problem_id) or self._writing.get(problem_id)
+
+    def versioned(self, problem_id: str) -> bool:
+        pending = self._queued(problem_id)
+        return (pending is not None and pending.master is not None) or self.repository.versioned(problem_id)
+
+    def exists(self, problem_id: str) -> bool:
+        return self._queued(problem_id) is not None or self.repository.exists(problem_id)
+
+    def ids(self) -> List[str]:
+        with self._cond:
+            queued = set(self._pending) | set(self._writing)
+        return sorted(queued | set(self.repository.ids()))
+
+    def load(self, problem_id: str) -> Optional[ProblemFrame]:
+        pending = self._queued(problem_id)
+        if pending is not None and pending.master is not None:
+            data, config = pending.master
+            return ProblemFrame.model_construct(problemData=data, scenarioConfig=config, state=pending.state)
+        self.flush(problem_id)
+        return self.repository.load(problem_id)
+
+    def load_state(self, problem_id: str, version: int) -> Optional[State]:
+        self.flush(problem_id)
+        return self.repository.load_state(problem_id, version)
+
+    def list_states(self, problem_id: str) -> Optional[List[Dict[str, Any]]]:
+        self.flush(problem_id)
+        return self.repository.list_states(problem_id)
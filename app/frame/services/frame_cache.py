@@ -0,0 +1,171 @@
+# TR: FrameManager icin giris sayisi ve bayt butcesiyle sinirli LRU cerceve onbellegi.
+# EN: LRU frame cache for FrameManager, bounded by entry count and a byte budget.
+from __future__ import annotations
+
+import itertools
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, is_dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.evaluation.kpi import KpiReport
+from app.frame.compiled.bom import Routing
+from app.frame.compiled.capacity import CapacityTimeline
+from app.frame.compiled.frame_index import FrameIndex, Interner
+from app.frame.models.problem import ProblemFrame
+
+DEFAULT_FRAME_CACHE_ENTRIES = 64
+DEFAULT_FRAME_CACHE_BYTES = 512 * 1024 * 1024
+ROW_BYTES = 512     # rough footprint of one validated pydantic row
+CODE_BYTES = 64     # rough footprint of one interned code
+
+
+def compiled_bytes(compiled: object) -> int:
+    total = 0
+    for value in vars(compiled).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, Interner):
+            total += len(value) * CODE_BYTES
+        elif is_dataclass(value):
+            total += compiled_bytes(value)
+    return total
+
+
+def estimate_frame_bytes(frame: ProblemFrame) -> int:
+    # Row count times a fixed row size; walking the models for an exact size
+    # would cost about as much as validating them. A state that has not been
+    # decoded yet is not counted (and not decoded here).
+    data = frame.problemData
+    state_rows, state_bytes = 0, 0
+    if frame.state_loaded:
+        state = frame.state
+        state_rows = len(state.inventory)
+        tables = {id(table): table for table in (state.lots, state.plan)}
+        state_bytes = sum(table.nbytes for table in tables.values())
+    rows = (
+        len(data.time_buckets)
+        + sum(len(group.orders) for group in data.orders)
+        + len(data.stocks)
+        + sum(len(product.process_data) + 1 for product in data.products)
+        + len(data.processes)
+        + len(data.resources.machine)
+        + len(data.resources.mold)
+        + len(data.compatibility.machine_mold_pairs)
+        + len(data.compatibility.product_molds)
+        + sum(len(template.segments) + 1 for template in data.shift_templates)
+        + len(data.work_calendar)
+        + len(frame.scenarioConfig.constraints)
+        + state_rows
+    )
+    return rows * ROW_BYTES + state_bytes
+
+
+@dataclass
+class CachedFrame:
+    frame: ProblemFrame
+    index: Optional[FrameIndex] = None
+    timeline: Optional[CapacityTimeline] = None
+    kpis: Optional[KpiReport] = None
+    routing: Optional[Routing] = None
+    nbytes: int = 0
+    # Changes whenever the cached frame's content changes (see FrameCache.etag).
+    version: int = 0
+
+    def measure(self) -> int:
+        self.nbytes = estimate_frame_bytes(self.frame)
+        for compiled in (self.index, self.timeline, self.kpis, self.routing):
+            if compiled is not None:
+                self.nbytes += compiled_bytes(compiled)
+        return self.nbytes
+
+
+class FrameCache:
+    # Frames with their compiled index, timeline and KPIs. The most recently used
+    # entry is always kept, even if it alone exceeds the byte budget.
+    def __init__(
+        self, max_entries: int = DEFAULT_FRAME_CACHE_ENTRIES, max_bytes: int = DEFAULT_FRAME_CACHE_BYTES
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        # Versions are only unique within one cache, hence the epoch in etags.
+        self.epoch = uuid.uuid4().hex[:12]
+        self._versions = itertools.count(1)
+        self._entries: "OrderedDict[str, CachedFrame]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, problem_id: str) -> bool:
+        return problem_id in self._entries
+
+    def get(self, problem_id: str) -> Optional[CachedFrame]:
+        entry = self._entries.get(problem_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(problem_id)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        problem_id: str,
+        frame: ProblemFrame,
+        index: Optional[FrameIndex] = None,
+        timeline: Optional[CapacityTimeline] = None,
+    ) -> CachedFrame:
+        self.discard(problem_id)
+        entry = CachedFrame(frame, index, timeline, version=next(self._versions))
+        self._entries[problem_id] = entry
+        self.nbytes += entry.measure()
+        self._evict()
+        return entry
+
+    def update(self, problem_id: str, entry: CachedFrame, changed: bool = False) -> None:
+        # Re-measure after the entry's frame, index or timeline changed;
+        # changed=True means the frame itself changed, not just derived data.
+        if changed:
+            entry.version = next(self._versions)
+        if self._entries.get(problem_id) is not entry:
+            return
+        previous = entry.nbytes
+        self.nbytes += entry.measure() - previous
+        self._entries.move_to_end(problem_id)
+        self._evict()
+
+    def etag(self, entry: CachedFrame) -> str:
+        # Weak: the same version may be sent projected, paged or compressed.
+        return f'W/"{self.epoch}-{entry.version}"'
+
+    def discard(self, problem_id: str) -> None:
+        entry = self._entries.pop(problem_id, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+
+    def _evict(self) -> None:
+        # max_entries <= 0 disables caching altogether.
+        limit = max(self.max_entries, 0)
+        while len(self._entries) > limit or (len(self._entries) > 1 and self.nbytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
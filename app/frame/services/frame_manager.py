@@ -2,45 +2,211 @@
 # EN: Service for saving/getting ProblemFrame and updating state.
 from __future__ import annotations
 
+import threading
 import uuid
-from typing import Dict, Optional
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple, Union
 
+from app.evaluation.kpi import KpiReport, compute_kpis
+from app.frame.compiled.bom import Routing, build_routing
+from app.frame.compiled.capacity import CapacityTimeline, build_capacity_timeline
+from app.frame.compiled.frame_index import FrameIndex, build_frame_index
 from app.frame.models.problem import ProblemFrame, State
 from app.frame.repositories.problem_repo import ProblemRepository
-from app.evaluation.problem_validator import validate_references
+from app.frame.repositories.write_behind import WriteBehindRepository
+from app.frame.services.frame_cache import (
+    DEFAULT_FRAME_CACHE_BYTES,
+    DEFAULT_FRAME_CACHE_ENTRIES,
+    CachedFrame,
+    FrameCache,
+)
+from app.frame.services.state_patch import PatchResult, StatePatch, apply_state_patch
+from app.evaluation.problem_validator import DEFAULT_MAX_ERRORS, validate_batch
+from app.telemetry import stage
+
+
+def compile_frame(
+    frame: ProblemFrame, max_errors: int = DEFAULT_MAX_ERRORS
+) -> Tuple[FrameIndex, CapacityTimeline]:
+    # Everything a new frame needs before it can be stored; raises ValueError.
+    with stage("frame.index"):
+        index = build_frame_index(frame)
+    with stage("frame.validate"):
+        report = validate_batch(frame, index, max_errors=max_errors)
+    if not report.valid:
+        raise ValueError(f"Validation errors: {report.messages()} (counts: {report.counts})")
+    with stage("frame.timeline"):
+        return index, build_capacity_timeline(frame, index)
 
 
 class FrameManager:
-    def __init__(self, repository: Optional[ProblemRepository] = None) -> None:
+    def __init__(
+        self,
+        repository: Optional[Union[ProblemRepository, WriteBehindRepository]] = None,
+        max_errors: int = DEFAULT_MAX_ERRORS,
+        cache_entries: int = DEFAULT_FRAME_CACHE_ENTRIES,
+        cache_bytes: int = DEFAULT_FRAME_CACHE_BYTES,
+    ) -> None:
         self._repo = repository or ProblemRepository()
-        self._store: Dict[str, ProblemFrame] = {}
-
-    def save(self, frame: ProblemFrame, problem_id: Optional[str] = None) -> str:
-        errors = validate_references(frame)
-        if errors:
-            raise ValueError(f"Validation errors: {errors}")
+        self.max_errors = max_errors
+        # Frames with their compiled index, capacity timeline and KPIs. Index
+        # and KPIs are dropped on state updates and patched along with lot
+        # patches; the timeline and the routing only depend on problemData.
+        self._cache = FrameCache(cache_entries, cache_bytes)
+        # Optimization jobs commit states from background threads.
+        self._lock = threading.RLock()
 
+    def _new_id(self, frame: ProblemFrame, problem_id: Optional[str], taken: Collection[str] = ()) -> str:
         base_id = problem_id or frame.problemData.problem_meta.problem_code or uuid.uuid4().hex
-        problem_id = base_id
-        if problem_id in self._store or self._repo.load(problem_id) is not None:
-            problem_id = f"{base_id}_{uuid.uuid4().hex[:8]}"
-        self._store[problem_id] = frame
-        self._repo.save(problem_id, frame)
+        if base_id in self._cache or self._repo.exists(base_id) or base_id in taken:
+            return f"{base_id}_{uuid.uuid4().hex[:8]}"
+        return base_id
+
+    def save(self, frame: ProblemFrame, problem_id: Optional[str] = None) -> str:
+        index, timeline = compile_frame(frame, self.max_errors)
+        with self._lock:
+            problem_id = self._new_id(frame, problem_id)
+            self._repo.save(problem_id, frame)
+            self._cache.put(problem_id, frame, index, timeline)
         return problem_id
 
-    def get(self, problem_id: str) -> Optional[ProblemFrame]:
-        if problem_id in self._store:
-            return self._store[problem_id]
+    def save_many(self, compiled: Sequence[Tuple[ProblemFrame, FrameIndex, CapacityTimeline]]) -> List[str]:
+        # Frames already run through compile_frame (e.g. in worker processes);
+        # ids are assigned and the repository gets the whole batch at once.
+        with self._lock:
+            ids: List[str] = []
+            taken = set()
+            for frame, _, _ in compiled:
+                ids.append(self._new_id(frame, None, taken))
+                taken.add(ids[-1])
+            self._repo.save_many({problem_id: frame for problem_id, (frame, _, _) in zip(ids, compiled)})
+            for problem_id, (frame, index, timeline) in zip(ids, compiled):
+                self._cache.put(problem_id, frame, index, timeline)
+        return ids
+
+    def _entry(self, problem_id: str) -> Optional[CachedFrame]:
+        entry = self._cache.get(problem_id)
+        if entry is not None:
+            return entry
+        if not self._repo.exists(problem_id):
+            return None
         loaded = self._repo.load(problem_id)
-        if loaded:
-            self._store[problem_id] = loaded
-        return loaded
+        if loaded is None:
+            return None
+        return self._cache.put(problem_id, loaded)
+
+    def get(self, problem_id: str) -> Optional[ProblemFrame]:
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else entry.frame
+
+    def view(self, problem_id: str) -> Optional[Tuple[ProblemFrame, str]]:
+        # The frame with the etag of its current version.
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else (entry.frame, self._cache.etag(entry))
+
+    def _index(self, problem_id: str, entry: CachedFrame) -> FrameIndex:
+        if entry.index is None:
+            with stage("frame.index"):
+                entry.index = build_frame_index(entry.frame)
+            self._cache.update(problem_id, entry)
+        return entry.index
+
+    def _timeline(self, problem_id: str, entry: CachedFrame) -> CapacityTimeline:
+        if entry.timeline is None:
+            index = self._index(problem_id, entry)
+            with stage("frame.timeline"):
+                entry.timeline = build_capacity_timeline(entry.frame, index)
+            self._cache.update(problem_id, entry)
+        return entry.timeline
+
+    def _kpis(self, problem_id: str, entry: CachedFrame) -> KpiReport:
+        if entry.kpis is None:
+            timeline = self._timeline(problem_id, entry)
+            with stage("frame.kpis"):
+                entry.kpis = compute_kpis(self._index(problem_id, entry), timeline)
+            self._cache.update(problem_id, entry)
+        return entry.kpis
+
+    def _routing(self, problem_id: str, entry: CachedFrame) -> Routing:
+        if entry.routing is None:
+            index = self._index(problem_id, entry)
+            with stage("frame.routing"):
+                entry.routing = build_routing(entry.frame, index)
+            self._cache.update(problem_id, entry)
+        return entry.routing
+
+    def index(self, problem_id: str) -> Optional[FrameIndex]:
+        # Compiled once per cached frame; dropped whenever the frame state changes.
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else self._index(problem_id, entry)
+
+    def timeline(self, problem_id: str) -> Optional[CapacityTimeline]:
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else self._timeline(problem_id, entry)
+
+    def routing(self, problem_id: str) -> Optional[Routing]:
+        # Compiled once per cached frame; raises ValueError for cyclic routings.
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else self._routing(problem_id, entry)
+
+    def kpis(self, problem_id: str) -> Optional[KpiReport]:
+        with self._lock:
+            entry = self._entry(problem_id)
+            return None if entry is None else self._kpis(problem_id, entry)
 
     def update_state(self, problem_id: str, state: State) -> ProblemFrame:
-        frame = self.get(problem_id)
-        if frame is None:
-            raise KeyError(f"Problem {problem_id} not found")
-        frame.state = state
-        self._repo.save(problem_id, frame)
-        self._store[problem_id] = frame
-        return frame
+        with self._lock:
+            entry = self._entry(problem_id)
+            if entry is None:
+                raise KeyError(f"Problem {problem_id} not found")
+            frame = entry.frame
+            if not self._repo.versioned(problem_id):
+                # Frames from the old single-file layout move to the versioned one.
+                self._repo.save(problem_id, frame)
+            frame.state = state
+            entry.index = None
+            entry.kpis = None
+            self._repo.save_state(problem_id, state)
+            self._cache.update(problem_id, entry, changed=True)
+            return frame
+
+    def patch_state(self, problem_id: str, patch: StatePatch) -> PatchResult:
+        # Lot-level update: the cached index and KPIs are patched, not rebuilt.
+        with self._lock:
+            entry = self._entry(problem_id)
+            if entry is None:
+                raise KeyError(f"Problem {problem_id} not found")
+            kpis = self._kpis(problem_id, entry)
+            with stage("frame.patch"):
+                result = apply_state_patch(entry.frame.state, entry.index, kpis, patch, max_errors=self.max_errors)
+            frame = entry.frame
+            if not self._repo.versioned(problem_id):
+                self._repo.save(problem_id, frame)
+            frame.state = result.state
+            entry.index, entry.kpis = result.index, result.kpis
+            self._repo.save_state(problem_id, result.state)
+            self._cache.update(problem_id, entry, changed=True)
+            return result
+
+    def states(self, problem_id: str) -> Optional[List[Dict[str, object]]]:
+        with self._lock:
+            return self._repo.list_states(problem_id)
+
+    def state_version(self, problem_id: str, version: int) -> Optional[State]:
+        with self._lock:
+            return self._repo.load_state(problem_id, version)
+
+    def cache_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return self._cache.stats()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Not under the lock: the writer never needs it, requests keep going.
+        return self._repo.flush(timeout=timeout)
+
+    def persistence_stats(self) -> Dict[str, Any]:
+        return self._repo.stats()
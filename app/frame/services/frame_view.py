@@ -0,0 +1,79 @@
+# TR: GET icin cerceve gorunumleri: alan projeksiyonu ve filtreli lot sayfalama; FastAPI yanit modeli turu atlanir.
+# EN: Frame views for GET: field projection and filtered lot paging, without FastAPI's response-model round trip.
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.frame.models.plan_table import PlanTable
+from app.frame.models.problem import ProblemFrame
+
+DEFAULT_LOT_PAGE = 500
+MAX_LOT_PAGE = 10000
+
+
+def frame_json(frame: ProblemFrame) -> bytes:
+    return frame.model_dump_json(by_alias=True).encode("utf-8")
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, PlanTable):
+        return value.to_records(mode="json")
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    return value
+
+
+def _resolve(frame: ProblemFrame, path: str) -> Any:
+    value: Any = frame
+    for name in path.split("."):
+        if not isinstance(value, BaseModel) or name not in type(value).model_fields:
+            raise ValueError(f"Unknown field: {path}")
+        value = getattr(value, name)
+    return value
+
+
+def project_frame(frame: ProblemFrame, fields: List[str]) -> Dict[str, Any]:
+    # Dotted field paths (e.g. "state.meta", "problemData.products"); only the
+    # selected parts are serialized, and a lazily loaded state is not decoded
+    # unless a state field is asked for.
+    paths = sorted({path.strip() for path in fields if path.strip()})
+    if not paths:
+        raise ValueError("No fields selected")
+    out: Dict[str, Any] = {}
+    kept: List[str] = []
+    for path in paths:
+        if any(path.startswith(f"{prefix}.") for prefix in kept):
+            continue
+        value = _jsonable(_resolve(frame, path))
+        *parents, leaf = path.split(".")
+        target = out
+        for name in parents:
+            target = target.setdefault(name, {})
+        target[leaf] = value
+        kept.append(path)
+    return out
+
+
+def lot_page(
+    table: PlanTable,
+    cursor: int = 0,
+    limit: int = DEFAULT_LOT_PAGE,
+    product: Optional[str] = None,
+    week: Optional[str] = None,
+    machine: Optional[str] = None,
+) -> Dict[str, Any]:
+    # cursor is a table row: the page holds the first `limit` matching rows at
+    # or after it, and next_cursor continues after the last one (None at the end).
+    rows = table.select(product=product, week=week, machine=machine)
+    start = int(np.searchsorted(rows, cursor))
+    page = rows[start:start + limit]
+    more = start + limit < rows.size
+    return {
+        "total": int(rows.size),
+        "cursor": cursor,
+        "next_cursor": int(page[-1]) + 1 if more else None,
+        "lots": table.take(page).to_records(mode="json"),
+    }
@@ -0,0 +1,54 @@
+# TR: Siparislerden veya state lotlarindan malzeme ihtiyac (MRP) tablosunu uretir.
+# EN: Builds the material requirements (MRP) table from orders or from the state lots.
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.evaluation.kpi import production_matrix
+from app.frame.compiled.bom import KIND_NAMES, Routing, explode, material_requirements
+from app.frame.compiled.frame_index import FrameIndex
+
+SOURCES = ("demand", "plan")
+
+
+def step_quantities(routing: Routing, output: np.ndarray) -> np.ndarray:
+    # Gross output every process step must deliver per bucket, (..., S, T)
+    # for product output (..., P, T); leading axes are candidate plans.
+    return explode(routing, output)[..., routing.step_material, :]
+
+
+def requirements_report(
+    index: FrameIndex, routing: Routing, source: str = "demand", kind: Optional[str] = None
+) -> Dict[str, object]:
+    # demand: net order demand exploded level by level; plan: the state lots
+    # taken as given product output. Rows without any requirement are left out.
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}', expected one of {list(SOURCES)}")
+    if kind is not None and kind not in KIND_NAMES:
+        raise ValueError(f"Unknown kind '{kind}', expected one of {list(KIND_NAMES)}")
+    if source == "demand":
+        gross, net = material_requirements(routing, index.demand)
+    else:
+        gross, net = material_requirements(routing, production_matrix(index), net_products=False)
+    rows = np.flatnonzero(gross.any(axis=1))
+    if kind is not None:
+        rows = rows[routing.kind[rows] == KIND_NAMES.index(kind)]
+    materials: List[Dict[str, object]] = [
+        {
+            "material": routing.materials.codes[m],
+            "kind": KIND_NAMES[routing.kind[m]],
+            "level": int(routing.level[m]),
+            "stock": float(routing.stock[m]),
+            "gross": gross[m].tolist(),
+            "net": net[m].tolist(),
+            "total_net": float(net[m].sum()),
+        }
+        for m in rows.tolist()
+    ]
+    return {
+        "source": source,
+        "weeks": index.time_buckets.codes[: index.time_buckets.known],
+        "materials": materials,
+    }
@@ -0,0 +1,104 @@
+# TR: State icin lot_id bazli yama (ekle/guncelle/sil); yalnizca dokunulan lotlar dogrulanir, KPI'lar artimli guncellenir.
+# EN: Lot-level State patches keyed by lot_id; only touched lots are validated and KPIs are updated incrementally.
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from app.evaluation.kpi import KpiReport, check_inventory, inventory_cells, touched_products, update_kpis
+from app.evaluation.problem_validator import DEFAULT_MAX_ERRORS, validate_plan
+from app.frame.compiled.frame_index import FrameIndex, compile_lots, splice_lots
+from app.frame.models.plan_table import PlanTable, TablePatch
+from app.frame.models.problem import LotInventory, State
+
+# compile_lots argument order.
+_INTERNERS = ("products", "processes", "time_buckets", "machines", "molds")
+_INVENTORY_COLUMNS = (
+    ("opening_stock", "inv_opening", "opening"),
+    ("production_qty", "inv_production", "production"),
+    ("demand", "inv_demand", "demand"),
+    ("closing_stock", "inv_closing", "closing"),
+)
+
+
+class StatePatch(BaseModel):
+    # upsert: PlanItem records; an existing lot_id is replaced in place, a new one is appended.
+    upsert: List[Dict[str, Any]] = Field(default_factory=list)
+    delete: List[str] = Field(default_factory=list)
+
+
+@dataclass
+class PatchResult:
+    state: State
+    index: FrameIndex
+    kpis: KpiReport
+    table: TablePatch
+    products: np.ndarray        # touched product ids
+    inventory_rows: int         # reported inventory rows rewritten
+
+
+def apply_state_patch(
+    state: State,
+    index: FrameIndex,
+    kpis: KpiReport,
+    patch: StatePatch,
+    max_errors: Optional[int] = DEFAULT_MAX_ERRORS,
+) -> PatchResult:
+    # index / kpis belong to state and are not modified; the result carries
+    # the patched copies. Raises ValueError without applying anything.
+    added = PlanTable.from_records(patch.upsert)
+    if any(lot_id is None for lot_id in added.lot_id):
+        raise ValueError("Every upserted lot needs a lot_id")
+    repeated = [lot_id for lot_id, n in Counter(added.lot_id + patch.delete).items() if n > 1]
+    if repeated:
+        raise ValueError(f"Lot ids appear more than once in the patch: {repeated[:10]}")
+    table = state.lots.plan_patch(added.lot_id, patch.delete)
+
+    # New codes go into copies of the interners, so a rejected patch leaves
+    # the cached index untouched.
+    interners = {name: getattr(index, name).copy() for name in _INTERNERS}
+    columns = compile_lots(added, *interners.values())
+    report = validate_plan(replace(index, **interners, **columns), max_errors=max_errors)
+    if not report.valid:
+        raise ValueError(f"Validation errors: {report.messages()} (counts: {report.counts})")
+
+    lots = PlanTable.concat([state.lots, added]).take(table.order)
+    patched = splice_lots(replace(index, **interners), columns, table.order)
+    kpis = update_kpis(kpis, index, table.removed, patched, table.added)
+    products = touched_products(index, table.removed, patched, table.added)
+    inventory, patched, rewritten = _refresh_inventory(state.inventory, patched, kpis, products)
+    if rewritten:
+        kpis.mismatches, kpis.mismatch_count = check_inventory(
+            patched, (kpis.opening, kpis.production, kpis.demand, kpis.closing)
+        )
+    state = State.model_construct(
+        meta=state.meta,
+        lots=lots,
+        inventory=inventory,
+        plan=lots if state.plan is state.lots else state.plan,
+    )
+    return PatchResult(state, patched, kpis, table, products, rewritten)
+
+
+def _refresh_inventory(
+    inventory: List[LotInventory], index: FrameIndex, kpis: KpiReport, products: np.ndarray
+) -> Tuple[List[LotInventory], FrameIndex, int]:
+    # Reported rows of the touched products are rewritten from the new balance.
+    rows, p, t = inventory_cells(index)
+    hit = np.isin(p, products)
+    rows, p, t = rows[hit], p[hit], t[hit]
+    if not rows.size:
+        return inventory, index, 0
+    values = {name: getattr(kpis, source)[p, t] for name, _, source in _INVENTORY_COLUMNS}
+    inventory = list(inventory)
+    for k, row in enumerate(rows.tolist()):
+        inventory[row] = inventory[row].model_copy(update={name: float(column[k]) for name, column in values.items()})
+    arrays = {}
+    for name, field, _ in _INVENTORY_COLUMNS:
+        arrays[field] = getattr(index, field).copy()
+        arrays[field][rows] = values[name]
+    return inventory, replace(index, **arrays), int(rows.size)
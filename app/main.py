@@ -2,9 +2,24 @@
 # EN: FastAPI entrypoint.
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app.api.middleware import TimingMiddleware
+from app.api.routes import manager, router
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # Pending write-behind saves must reach the disk before the process exits.
+    manager.flush()
 
-from app.api.routes import router
 
-app = FastAPI(title="Heuristic Production Planning API", version="0.1.0")
+app = FastAPI(title="Heuristic Production Planning API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(TimingMiddleware)
+# Frames and lot pages are large and repetitive JSON; SSE streams are left alone.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.include_router(router)
@@ -0,0 +1,47 @@
+# TR: /optimize istegi icin yapilandirma modeli.
+# EN: Configuration model for the /optimize payload.
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.evaluation.fitness_cache import DEFAULT_CACHE_SIZE
+from app.evaluation.objective import ObjectiveWeights
+
+
+class OptimizeConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    engine: Literal["ga", "tabu", "dp"] = "ga"
+    seed: Optional[int] = None
+    time_limit_sec: float = Field(default=5.0, gt=0)
+    commit: bool = True
+    weights: ObjectiveWeights = Field(default_factory=ObjectiveWeights)
+    # Add the scenario's active constraints (ScenarioConfig.constraints) as penalties.
+    scenario_constraints: bool = True
+    # Memoized plan evaluations per search (0 disables the cache).
+    cache_size: int = Field(default=DEFAULT_CACHE_SIZE, ge=0)
+    # Start GA / tabu from the lot-sizing ("dp") plans instead of lot-for-lot.
+    warm_start: bool = True
+
+    # Genetic Algorithm
+    population_size: int = Field(default=40, ge=2)
+    generations: int = Field(default=200, ge=0)
+    elite: int = Field(default=2, ge=0)
+    tournament_size: int = Field(default=3, ge=1)
+    crossover_rate: float = Field(default=0.9, ge=0, le=1)
+    # Per-gene rate; defaults to about two mutations per individual.
+    mutation_rate: Optional[float] = Field(default=None, gt=0, le=1)
+
+    # Tabu Search
+    iterations: int = Field(default=2000, ge=0)
+    neighborhood_size: int = Field(default=40, ge=1)
+    tabu_tenure: int = Field(default=10, ge=0)
+
+    # Island model: independent populations / walkers in a process pool with
+    # elite migration every migration_interval generations (or iterations).
+    workers: int = Field(default=1, ge=1)
+    islands: Optional[int] = Field(default=None, ge=1)
+    migration_interval: int = Field(default=10, ge=1)
+    migrants: int = Field(default=2, ge=1)
@@ -0,0 +1,31 @@
+# TR: Arama motorlari icin ilerleme bildirimi ve is birlikci iptal kontrolu.
+# EN: Progress reporting and cooperative cancellation hook for the search engines.
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional
+
+from app.telemetry import IterationTimer
+
+ProgressCallback = Callable[[int, float], None]
+
+
+class SearchControl:
+    def __init__(self, on_progress: Optional[ProgressCallback] = None) -> None:
+        self._cancel = threading.Event()
+        self._on_progress = on_progress
+        # Set by optimize_frame once the engine is known.
+        self.timer: Optional[IterationTimer] = None
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, iteration: int, best_objective: float) -> None:
+        if self.timer is not None:
+            self.timer(iteration)
+        if self._on_progress is not None:
+            self._on_progress(iteration, best_objective)
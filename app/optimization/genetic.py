@@ -0,0 +1,196 @@
+# TR: NumPy dizileri uzerinde populasyon tutan Genetik Algoritma motoru.
+# EN: Genetic Algorithm engine keeping its population as NumPy arrays.
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.evaluation.constraints import CompiledConstraints
+from app.evaluation.fitness_cache import FitnessCache
+from app.evaluation.objective import breakdown_at
+from app.frame.compiled.planning_model import PlanningModel
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.solution import SearchResult, Solution
+
+Evaluator = Callable[[np.ndarray, np.ndarray, np.ndarray], Dict[str, np.ndarray]]
+
+
+def pull_earlier(flat_qty: np.ndarray, positions: np.ndarray, T: int) -> None:
+    # Moves the lots at flat positions one bucket earlier (the first bucket
+    # has nowhere to go). A pull whose target is itself pulled is dropped, so
+    # chains of adjacent picks never overwrite or lose quantity.
+    pull = np.unique(positions[positions % T != 0])
+    pull = pull[~np.isin(pull - 1, pull)]
+    flat_qty[pull - 1] += flat_qty[pull]
+    flat_qty[pull] = 0.0
+
+
+class GeneticAlgorithm:
+    def __init__(
+        self,
+        model: PlanningModel,
+        config: OptimizeConfig,
+        rng: np.random.Generator,
+        evaluate: Optional[Evaluator] = None,
+        cache: Optional[FitnessCache] = None,
+        constraints: Optional[CompiledConstraints] = None,
+    ) -> None:
+        self.model = model
+        self.config = config
+        self.rng = rng
+        self.cache = cache or FitnessCache(config.cache_size)
+        self._evaluate = evaluate or (
+            lambda q, o, p: self.cache.evaluate(model, q, o, p, config.weights, constraints)
+        )
+        self._base = np.rint(model.lot_for_lot())
+        self.generation = 0
+        self.evaluations = 0
+        self.history: list = []
+        self.qty = self.option = self.priority = self.scores = np.empty(0)
+
+    @property
+    def size(self) -> int:
+        return self.config.population_size
+
+    def _random_options(self, shape: Tuple[int, ...]) -> np.ndarray:
+        return (self.rng.random(shape) * self.model.n_options[:, None]).astype(np.int32)
+
+    def _score(self, qty: np.ndarray, option: np.ndarray, priority: np.ndarray) -> np.ndarray:
+        self.evaluations += qty.shape[0]
+        return self._evaluate(qty, option, priority)["objective"]
+
+    def initialize(self, seeds: Sequence[Solution] = ()) -> None:
+        N, (P, T) = self.size, self.model.shape
+        shape = (N, P, T)
+        qty = np.rint(self._base[None] * self.rng.uniform(0.5, 1.5, shape))
+        qty[self.rng.random(shape) < 0.1] = 0.0
+        qty[0] = self._base
+        option = self._random_options(shape)
+        if N > 1:
+            qty[1], option[1] = self.model.capacity_lot_sizes(), 0
+        priority = self.rng.random(shape)
+        for row, seed in enumerate(list(seeds)[:N]):
+            qty[row], option[row], priority[row] = seed.qty, seed.option, seed.priority
+        self._set(qty, option, priority, self._score(qty, option, priority))
+
+    def _set(self, qty: np.ndarray, option: np.ndarray, priority: np.ndarray, scores: np.ndarray) -> None:
+        self.qty, self.option, self.priority, self.scores = qty, option, priority, scores
+
+    def _tournament(self) -> np.ndarray:
+        N = self.size
+        entrants = self.rng.integers(0, N, (N, self.config.tournament_size))
+        return entrants[np.arange(N), np.argmin(self.scores[entrants], axis=1)]
+
+    def _pick(self, size: int, rate: float) -> np.ndarray:
+        # Sample gene positions instead of drawing one random number per gene.
+        return self.rng.integers(0, size, self.rng.binomial(size, min(rate, 1.0)))
+
+    def _mutate(self, qty: np.ndarray, option: np.ndarray, priority: np.ndarray) -> None:
+        rng, T = self.rng, qty.shape[-1]
+        rate = self.config.mutation_rate or min(0.2, 2.0 / max(qty[0].size, 1))
+        flat_qty, flat_option, flat_priority = qty.reshape(-1), option.reshape(-1), priority.reshape(-1)
+        base = np.broadcast_to(self._base, qty.shape).reshape(-1)
+        size = flat_qty.size
+
+        scale = self._pick(size, rate)
+        flat_qty[scale] *= rng.uniform(0.5, 1.5, scale.size)
+        flat_qty[self._pick(size, rate / 2)] = 0.0
+        reset = self._pick(size, rate / 2)
+        flat_qty[reset] = base[reset]
+        pull_earlier(flat_qty, self._pick(size, rate / 2), T)
+        np.rint(np.maximum(qty, 0.0), out=qty)
+
+        swap = self._pick(size, rate)
+        n_options = self.model.n_options[(swap // T) % self.model.n_products]
+        flat_option[swap] = (rng.random(swap.size) * n_options).astype(np.int32)
+        shuffle = self._pick(size, rate)
+        flat_priority[shuffle] = rng.random(shuffle.size)
+
+    def step(self) -> None:
+        N, rng = self.size, self.rng
+        a, b = self._tournament(), self._tournament()
+        # Uniform crossover over whole product rows keeps each product's timeline intact.
+        mated = rng.random(N) < self.config.crossover_rate
+        cross = (rng.random((N, self.model.n_products, 1)) < 0.5) & mated[:, None, None]
+        qty = np.where(cross, self.qty[b], self.qty[a])
+        option = np.where(cross, self.option[b], self.option[a])
+        priority = np.where(cross, self.priority[b], self.priority[a])
+        self._mutate(qty, option, priority)
+        scores = self._score(qty, option, priority)
+
+        elite = min(self.config.elite, N)
+        if elite:
+            keep = np.argsort(self.scores)[:elite]
+            drop = np.argsort(scores)[N - elite:]
+            qty[drop], option[drop], priority[drop] = self.qty[keep], self.option[keep], self.priority[keep]
+            scores[drop] = self.scores[keep]
+        self._set(qty, option, priority, scores)
+        self.generation += 1
+        self.history.append(float(scores.min()))
+
+    def run(self, generations: int, deadline: float, control: Optional[SearchControl] = None) -> None:
+        for _ in range(generations):
+            if time.perf_counter() >= deadline or (control is not None and control.cancelled):
+                break
+            self.step()
+            if control is not None:
+                control.report(self.generation, self.history[-1])
+
+    def best(self) -> Tuple[Solution, float]:
+        row = int(np.argmin(self.scores))
+        return Solution(self.qty[row].copy(), self.option[row].copy(), self.priority[row].copy()), float(self.scores[row])
+
+    def inject(self, solutions: Sequence[Solution]) -> None:
+        # Replace the worst individuals with incoming solutions (migration / warm start).
+        if not solutions:
+            return
+        incoming = list(solutions)[: self.size]
+        worst = np.argsort(self.scores)[self.size - len(incoming):]
+        qty = np.stack([s.qty for s in incoming])
+        option = np.stack([s.option for s in incoming])
+        priority = np.stack([s.priority for s in incoming])
+        self.qty[worst], self.option[worst], self.priority[worst] = qty, option, priority
+        self.scores[worst] = self._score(qty, option, priority)
+
+    def export(self) -> Dict[str, object]:
+        return {
+            "qty": self.qty, "option": self.option, "priority": self.priority, "scores": self.scores,
+            "generation": self.generation, "evaluations": self.evaluations, "history": self.history,
+        }
+
+    def restore(self, snapshot: Dict[str, object]) -> None:
+        self._set(snapshot["qty"], snapshot["option"], snapshot["priority"], snapshot["scores"])
+        self.generation = snapshot["generation"]
+        self.evaluations = snapshot["evaluations"]
+        self.history = list(snapshot["history"])
+
+    def result(self) -> SearchResult:
+        solution, score = self.best()
+        breakdown = breakdown_at(self._evaluate(*solution.stacked()), 0)
+        return SearchResult(
+            best=solution,
+            objective=score,
+            breakdown=breakdown,
+            iterations=self.generation,
+            evaluations=self.evaluations,
+            history=self.history,
+            details={"cache": self.cache.stats()},
+        )
+
+
+def run_genetic(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    rng: np.random.Generator,
+    deadline: float,
+    seeds: Sequence[Solution] = (),
+    control: Optional[SearchControl] = None,
+    constraints: Optional[CompiledConstraints] = None,
+) -> SearchResult:
+    engine = GeneticAlgorithm(model, config, rng, constraints=constraints)
+    engine.initialize(seeds)
+    engine.run(config.generations, deadline, control)
+    return engine.result()
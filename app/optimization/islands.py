@@ -0,0 +1,233 @@
+# TR: Surec havuzunda paralel ada (island) modeli; derlenmis diziler paylasimli bellekte tutulur.
+# EN: Island-model parallel search over a process pool; compiled arrays live in shared memory.
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.concurrency import pool_context
+from app.evaluation.constraints import CompiledConstraints
+from app.evaluation.fitness_cache import FitnessCache, merge_stats
+from app.frame.compiled.planning_model import PlanningModel
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.genetic import GeneticAlgorithm
+from app.optimization.solution import SearchResult, Solution
+from app.optimization.tabu import TabuSearch
+
+ArraySpec = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+# Worker-side attachments, kept alive for the lifetime of the worker process.
+_ATTACHED: Dict[Tuple[str, ...], Tuple[PlanningModel, List[SharedMemory]]] = {}
+# Worker-side fitness caches per (shared model, island); an island may land
+# on different workers between epochs, each keeping its own cache.
+_CACHES: Dict[Tuple[Tuple[str, ...], int], FitnessCache] = {}
+
+
+class SharedPlanningModel:
+    # Publishes every PlanningModel array once in shared memory; workers map
+    # them read-only instead of unpickling a copy per task.
+    def __init__(self, model: PlanningModel) -> None:
+        self.spec: ArraySpec = {}
+        self._blocks: List[SharedMemory] = []
+        for f in fields(model):
+            array = np.ascontiguousarray(getattr(model, f.name))
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.spec[f.name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedPlanningModel":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _spec_key(spec: ArraySpec) -> Tuple[str, ...]:
+    return tuple(name for name, _, _ in spec.values())
+
+
+def attach_model(spec: ArraySpec) -> PlanningModel:
+    key = _spec_key(spec)
+    cached = _ATTACHED.get(key)
+    if cached is not None:
+        return cached[0]
+    arrays, blocks = {}, []
+    for field_name, (name, shape, dtype) in spec.items():
+        block = SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[field_name] = array
+        blocks.append(block)
+    model = PlanningModel(**arrays)
+    _ATTACHED[key] = (model, blocks)
+    return model
+
+
+def _worker_cache(spec: ArraySpec, island: int, size: int) -> FitnessCache:
+    key = (_spec_key(spec), island)
+    if key not in _CACHES:
+        for stale in [k for k in _CACHES if k[0] != key[0]]:
+            del _CACHES[stale]
+        _CACHES[key] = FitnessCache(size)
+    return _CACHES[key]
+
+
+def _make_engine(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    rng: np.random.Generator,
+    cache: Optional[FitnessCache] = None,
+    constraints: Optional[CompiledConstraints] = None,
+):
+    if config.engine == "tabu":
+        return TabuSearch(model, config, rng, cache=cache, constraints=constraints)
+    return GeneticAlgorithm(model, config, rng, cache=cache, constraints=constraints)
+
+
+def _seed_engine(engine, seeds: Sequence[Solution]) -> None:
+    if isinstance(engine, GeneticAlgorithm):
+        engine.initialize(seeds)
+    elif seeds:
+        engine.reset(seeds[0])
+
+
+def run_epoch(
+    spec: ArraySpec,
+    config: OptimizeConfig,
+    island: Dict[str, object],
+    steps: int,
+    deadline: float,
+    migrants: Sequence[Solution],
+    constraints: Optional[CompiledConstraints] = None,
+) -> Dict[str, object]:
+    model = attach_model(spec)
+    rng = np.random.default_rng()
+    rng.bit_generator.state = island["rng"]
+    cache = _worker_cache(spec, island["id"], config.cache_size)
+    engine = _make_engine(model, config, rng, cache, constraints)
+    snapshot = island.get("engine")
+    if snapshot is None:
+        _seed_engine(engine, island.get("seeds", ()))
+    else:
+        engine.restore(snapshot)
+    engine.inject(migrants)
+    engine.run(steps, deadline)
+    best, value = engine.best()
+    elites = [best]
+    if isinstance(engine, GeneticAlgorithm):
+        order = np.argsort(engine.scores)[1: max(config.migrants, 1)]
+        elites += [Solution(engine.qty[i].copy(), engine.option[i].copy(), engine.priority[i].copy()) for i in order]
+    return {
+        "rng": rng.bit_generator.state,
+        "engine": engine.export(),
+        "best": best,
+        "best_value": value,
+        "elites": elites[: max(config.migrants, 1)],
+        "iterations": engine.generation if isinstance(engine, GeneticAlgorithm) else engine.iteration,
+        "evaluations": engine.evaluations,
+        "cache_id": (os.getpid(), island["id"]),
+        "cache": cache.stats(),
+    }
+
+
+def run_islands(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    rng: np.random.Generator,
+    deadline: float,
+    seeds: Sequence[Solution] = (),
+    control: Optional[SearchControl] = None,
+    constraints: Optional[CompiledConstraints] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> SearchResult:
+    n_islands = config.islands or config.workers
+    budget = config.iterations if config.engine == "tabu" else config.generations
+    islands: List[Dict[str, object]] = [
+        {"id": i, "rng": np.random.default_rng(int(rng.integers(2**63))).bit_generator.state, "seeds": list(seeds)}
+        for i in range(n_islands)
+    ]
+    caches: Dict[Tuple[int, int], Dict[str, float]] = {}
+    progress: List[List[Dict[str, float]]] = [[] for _ in range(n_islands)]
+    migrants: List[List[Solution]] = [[] for _ in range(n_islands)]
+    epochs, done = 0, 0
+
+    own_pool = executor is None
+    pool = executor or ProcessPoolExecutor(max_workers=config.workers, mp_context=pool_context())
+    try:
+        with SharedPlanningModel(model) as shared:
+            while done < budget and time.perf_counter() < deadline:
+                if control is not None and control.cancelled:
+                    break
+                steps = min(config.migration_interval, budget - done)
+                # perf_counter is per-process; hand workers a relative budget.
+                remaining = deadline - time.perf_counter()
+                futures = [
+                    pool.submit(
+                        _run_with_budget, shared.spec, config, islands[i], steps, remaining, migrants[i], constraints
+                    )
+                    for i in range(n_islands)
+                ]
+                results = [future.result() for future in futures]
+                done += steps
+                epochs += 1
+                for i, res in enumerate(results):
+                    islands[i] = {"id": i, "rng": res["rng"], "engine": res["engine"]}
+                    caches[res["cache_id"]] = res["cache"]
+                    progress[i].append({
+                        "epoch": epochs,
+                        "iterations": res["iterations"],
+                        "best_objective": res["best_value"],
+                    })
+                # Ring migration: island i receives the elites of island i - 1.
+                migrants = [results[i - 1]["elites"] if n_islands > 1 else [] for i in range(n_islands)]
+                winner = min(results, key=lambda r: r["best_value"])
+                if control is not None:
+                    control.report(done, winner["best_value"])
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    if not epochs:
+        if control is None or not control.cancelled:
+            raise ValueError("Time budget exhausted before the first island epoch")
+        # Cancelled before any epoch ran: hand back the seeded starting point.
+        final = _make_engine(model, config, rng, constraints=constraints)
+        _seed_engine(final, seeds)
+        return final.result()
+    final = _make_engine(model, config, np.random.default_rng(0), constraints=constraints)
+    final.restore(winner["engine"])
+    result = final.result()
+    result.evaluations = sum(r["evaluations"] for r in results)
+    result.iterations = max(r["iterations"] for r in results)
+    result.details["cache"] = merge_stats(list(caches.values()) + [final.cache.stats()])
+    result.details["islands"] = [
+        {"island": i, "best_objective": p[-1]["best_objective"], "iterations": p[-1]["iterations"], "epochs": p}
+        for i, p in enumerate(progress)
+    ]
+    return result
+
+
+def _run_with_budget(
+    spec: ArraySpec,
+    config: OptimizeConfig,
+    island: Dict[str, object],
+    steps: int,
+    remaining: float,
+    migrants: Sequence[Solution],
+    constraints: Optional[CompiledConstraints] = None,
+) -> Dict[str, object]:
+    return run_epoch(spec, config, island, steps, time.perf_counter() + remaining, migrants, constraints)
@@ -0,0 +1,141 @@
+# TR: Arka planda calisan optimizasyon isleri; ilerleme, olay akisi ve iptal.
+# EN: Background optimization jobs with progress, event stream and cancellation.
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.frame.services.frame_manager import FrameManager
+from app.optimization.control import SearchControl
+from app.optimization.optimizer import optimize_frame, parse_config
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED = {COMPLETED, FAILED, CANCELLED}
+
+
+class OptimizationJob:
+    def __init__(self, frame_id: str, payload: Dict[str, object]) -> None:
+        self.id = uuid.uuid4().hex
+        self.frame_id = frame_id
+        self.payload = payload
+        self.status = QUEUED
+        self.iteration = 0
+        self.best_objective: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, object]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, object]] = []
+        self.control = SearchControl(self._on_progress)
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def _emit(self, event: str, **data: object) -> None:
+        with self._lock:
+            self.events.append({"event": event, "seq": len(self.events), "time": time.time(), **data})
+
+    def _on_progress(self, iteration: int, best_objective: float) -> None:
+        self.iteration = iteration
+        if self.best_objective is None or best_objective < self.best_objective:
+            self.best_objective = best_objective
+            self._emit("improvement", iteration=iteration, best_objective=best_objective)
+
+    def events_since(self, cursor: int) -> List[Dict[str, object]]:
+        with self._lock:
+            return self.events[cursor:]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "frame_id": self.frame_id,
+            "status": self.status,
+            "iteration": self.iteration,
+            "best_objective": self.best_objective,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    def __init__(self, frames: FrameManager, max_workers: int = 4, max_finished: int = 256) -> None:
+        self._frames = frames
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimize")
+        self._jobs: "OrderedDict[str, OptimizationJob]" = OrderedDict()
+        self._max_finished = max_finished
+        self._lock = threading.Lock()
+
+    def submit(self, frame_id: str, payload: Dict[str, object]) -> OptimizationJob:
+        parse_config(payload)  # reject bad payloads before queueing
+        job = OptimizationJob(frame_id, payload)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job._emit("status", status=QUEUED)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[OptimizationJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[OptimizationJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[OptimizationJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.control.cancel()
+        return job
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(len(finished) - self._max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job: OptimizationJob, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        job._emit("done", status=status, best_objective=job.best_objective, error=job.error)
+
+    def _run(self, job: OptimizationJob) -> None:
+        if job.control.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status, job.started_at = RUNNING, time.time()
+        job._emit("status", status=RUNNING)
+        try:
+            frame = self._frames.get(job.frame_id)
+            if frame is None:
+                raise KeyError(f"Problem {job.frame_id} not found")
+            result = optimize_frame(
+                frame,
+                job.payload,
+                self._frames.index(job.frame_id),
+                control=job.control,
+                timeline=self._frames.timeline(job.frame_id),
+            )
+            state = result.pop("state")
+            job.result = result
+            if job.control.cancelled:
+                self._finish(job, CANCELLED)
+                return
+            if job.payload.get("commit", True):
+                self._frames.update_state(job.frame_id, state)
+            self._finish(job, COMPLETED)
+        except Exception as exc:  # surfaced through GET /jobs/{id}
+            # An engine may stop a cancelled search by raising; that is still a cancel.
+            if job.control.cancelled:
+                self._finish(job, CANCELLED)
+                return
+            job.error = str(exc)
+            self._finish(job, FAILED)
@@ -0,0 +1,186 @@
+# TR: Urun bazli Wagner-Whitin DP ile yapici parti buyuklugu cozucusu; kapasite onarimi ve sicak baslangic.
+# EN: Constructive lot-sizing solver: per-product Wagner-Whitin DP, capacity repair pass and warm start.
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.evaluation.constraints import CompiledConstraints
+from app.evaluation.fitness_cache import FitnessCache
+from app.evaluation.objective import ObjectiveWeights, breakdown_at
+from app.frame.compiled.frame_index import MISSING
+from app.frame.compiled.planning_model import PlanningModel
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.solution import SearchResult, Solution
+
+# pulled: overload moved to earlier buckets only; repaired: then deferred to
+# later buckets as well; uncapacitated: the plain DP plan.
+VARIANTS = ("pulled", "repaired", "uncapacitated")
+
+
+def wagner_whitin(net: np.ndarray, setup_cost: float, holding_cost: float) -> np.ndarray:
+    # Uncapacitated lot sizes (P, T) for net requirements (P, T), all products
+    # at once. F[t] is the cheapest cover of buckets [0, t); a lot made in j
+    # covers buckets j..t-1 and every unit needed in k is held k - j buckets.
+    P, T = net.shape
+    cum = np.concatenate([np.zeros((P, 1)), np.cumsum(net, axis=1)], axis=1)
+    weighted = np.concatenate([np.zeros((P, 1)), np.cumsum(net * np.arange(T), axis=1)], axis=1)
+    best = np.zeros((P, T + 1))
+    last = np.zeros((P, T + 1), dtype=np.int64)
+    for t in range(1, T + 1):
+        j = np.arange(t)
+        covered = cum[:, t, None] - cum[:, :t]
+        held = (weighted[:, t, None] - weighted[:, :t]) - j * covered
+        cost = best[:, :t] + setup_cost * (covered > 0) + holding_cost * held
+        # Ties go to the latest start: same cost, less stock on hand.
+        pick = t - 1 - np.argmin(cost[:, ::-1], axis=1)
+        best[:, t] = cost[np.arange(P), pick]
+        last[:, t] = pick
+
+    qty = np.zeros((P, T))
+    rows = np.arange(P)
+    end = np.full(P, T)
+    while (end > 0).any():
+        live = rows[end > 0]
+        start = last[live, end[live]]
+        qty[live, start] = cum[live, end[live]] - cum[live, start]
+        end[live] = start
+    return qty
+
+
+def assign_options(model: PlanningModel, qty: np.ndarray) -> np.ndarray:
+    # One option per product for the whole horizon: largest loads first, each
+    # onto the option whose machine has the most minutes left over the horizon.
+    P = model.n_products
+    left = model.capacity.sum(axis=1).astype(np.float64)
+    minutes = np.where(qty > 0, model.setup_min[:, None] + qty * model.unit_min[:, None], 0.0).sum(axis=1)
+    choice = np.zeros(P, dtype=np.int32)
+    for p in np.argsort(-minutes, kind="stable").tolist():
+        machines = model.opt_machine[p, : model.n_options[p]]
+        if (machines == MISSING).all():
+            continue
+        room = np.where(machines != MISSING, left[np.maximum(machines, 0)], -np.inf)
+        choice[p] = int(np.argmax(room))
+        left[machines[choice[p]]] -= minutes[p]
+    return choice
+
+
+def _shift_excess(
+    model: PlanningModel, qty: np.ndarray, machine: np.ndarray, movable: np.ndarray, buckets: Sequence[int], step: int
+) -> None:
+    # Moves run quantity out of overloaded (machine, bucket) cells into bucket
+    # t + step, in proportion to each lot's run minutes. Cells are visited in
+    # `buckets` order, so a shifted excess is itself repaired further along.
+    M = model.n_machines
+    on = (machine != MISSING) & movable
+    safe = np.maximum(machine, 0)
+    for t in buckets:
+        lots = on & (qty[:, t] > 0)
+        if not lots.any():
+            continue
+        minutes = model.setup_min + qty[:, t] * model.unit_min
+        load = np.bincount(safe[lots], weights=minutes[lots], minlength=M)
+        run = np.bincount(safe[lots], weights=(qty[:, t] * model.unit_min)[lots], minlength=M)
+        excess = np.maximum(load - model.capacity[:, t], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(run > 0, np.minimum(excess / run, 1.0), 0.0)
+        move = np.where(lots, np.minimum(np.ceil(qty[:, t] * share[safe]), qty[:, t]), 0.0)
+        qty[:, t] -= move
+        qty[:, t + step] += move
+
+
+def repair_capacity(
+    model: PlanningModel, qty: np.ndarray, option: np.ndarray, weights: ObjectiveWeights, defer: bool = True
+) -> np.ndarray:
+    # Overload is pulled forward in time first (extra holding); with `defer`,
+    # whatever is left in the first buckets is then pushed later (backlog). A
+    # product only moves when a minute of overload costs more than the unit
+    # it displaces.
+    qty = qty.copy()
+    T = model.n_weeks
+    machine = model.opt_machine[np.arange(model.n_products), option]
+    overload = weights.overload * model.unit_min
+    _shift_excess(model, qty, machine, overload > weights.holding, range(T - 1, 0, -1), -1)
+    if defer:
+        _shift_excess(model, qty, machine, overload > weights.backlog, range(T - 1), 1)
+    return qty
+
+
+def lot_sizing_plans(model: PlanningModel, weights: ObjectiveWeights) -> List[Solution]:
+    # One plan per VARIANTS entry. Lots on a machine are sequenced by mold so
+    # that equal molds run back to back.
+    P, T = model.shape
+    net = np.rint(model.lot_for_lot())
+    plain = wagner_whitin(net, weights.setup, weights.holding)
+    choice = assign_options(model, plain)
+    mold = model.opt_mold[np.arange(P), choice].astype(np.float64)
+    width = max(float(mold.max(initial=0.0)) + 2.0, 1.0)
+    priority = np.broadcast_to(((mold + 1.0) / width)[:, None], (P, T))
+    option = np.broadcast_to(choice[:, None], (P, T))
+    plans = {
+        "pulled": repair_capacity(model, plain, choice, weights, defer=False),
+        "repaired": repair_capacity(model, plain, choice, weights),
+        "uncapacitated": plain,
+    }
+    return [Solution(plans[name], option.copy(), priority.copy()) for name in VARIANTS]
+
+
+def rank_plans(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    constraints: Optional[CompiledConstraints] = None,
+    cache: Optional[FitnessCache] = None,
+) -> Tuple[List[int], Dict[str, np.ndarray], List[Solution]]:
+    # Which variant wins depends on the data (how tight capacity is) and on
+    # the scenario penalties (deferring is ruled out by a hard demand
+    # constraint), so all of them are scored in one batch.
+    plans = lot_sizing_plans(model, config.weights)
+    cache = cache or FitnessCache(config.cache_size)
+    qty = np.stack([plan.qty for plan in plans])
+    option = np.stack([plan.option for plan in plans])
+    priority = np.stack([plan.priority for plan in plans])
+    result = cache.evaluate(model, qty, option, priority, config.weights, constraints)
+    return np.argsort(result["objective"], kind="stable").tolist(), result, plans
+
+
+def warm_start_plans(
+    model: PlanningModel, config: OptimizeConfig, constraints: Optional[CompiledConstraints] = None
+) -> List[Solution]:
+    # Seeds for GA / tabu, best first (tabu starts from the first one).
+    order, _, plans = rank_plans(model, config, constraints)
+    return [plans[i] for i in order]
+
+
+def run_lot_sizing(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    rng: np.random.Generator,
+    deadline: float,
+    seeds: Sequence[Solution] = (),
+    control: Optional[SearchControl] = None,
+    constraints: Optional[CompiledConstraints] = None,
+) -> SearchResult:
+    # Deterministic: rng and deadline are accepted for the engine signature only.
+    cache = FitnessCache(config.cache_size)
+    order, result, plans = rank_plans(model, config, constraints, cache)
+    row = order[0]
+    objective = float(result["objective"][row])
+    if control is not None:
+        control.report(1, objective)
+    return SearchResult(
+        best=plans[row],
+        objective=objective,
+        breakdown=breakdown_at(result, row),
+        iterations=1,
+        evaluations=len(plans),
+        history=[objective],
+        details={
+            "cache": cache.stats(),
+            "lot_sizing": {
+                "variant": VARIANTS[row],
+                "candidates": {name: float(value) for name, value in zip(VARIANTS, result["objective"])},
+            },
+        },
+    )
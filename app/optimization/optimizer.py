@@ -1,11 +1,94 @@
-# TR: Optimizasyon katmani icin plug-in girisi (stub).
-# EN: Optimization layer plug-in entry (stub).
+# TR: Optimizasyon katmani icin plug-in girisi.
+# EN: Optimization layer plug-in entry.
 from __future__ import annotations
 
-from typing import Dict
+import time
+from typing import Callable, Dict, List, Optional
 
+import numpy as np
+from pydantic import ValidationError
+
+from app.evaluation.constraints import CompiledConstraints, compile_constraints
+from app.frame.compiled.capacity import CapacityTimeline, build_capacity_timeline
+from app.frame.compiled.frame_index import FrameIndex, build_frame_index
+from app.frame.compiled.planning_model import PlanningModel, build_planning_model
 from app.frame.models.problem import ProblemFrame
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.genetic import run_genetic
+from app.optimization.islands import run_islands
+from app.optimization.lot_sizing import run_lot_sizing, warm_start_plans
+from app.optimization.plan_builder import build_state
+from app.optimization.solution import SearchResult, Solution
+from app.optimization.tabu import run_tabu
+from app.telemetry import OPTIMIZER_EVALUATIONS, IterationTimer, stage
+
+Engine = Callable[..., SearchResult]
+
+ENGINES: Dict[str, Engine] = {
+    "ga": run_genetic,
+    "tabu": run_tabu,
+    "dp": run_lot_sizing,
+}
+
+
+def parse_config(payload: Dict[str, object]) -> OptimizeConfig:
+    try:
+        return OptimizeConfig.model_validate(payload)
+    except ValidationError as exc:
+        raise ValueError(str(exc)) from exc
+
+
+def warm_start_seeds(
+    model: PlanningModel, config: OptimizeConfig, constraints: Optional[CompiledConstraints] = None
+) -> List[Solution]:
+    if not config.warm_start or config.engine == "dp":
+        return []
+    with stage("optimize.warm_start"):
+        return warm_start_plans(model, config, constraints)
 
 
-def optimize_frame(frame: ProblemFrame, payload: Dict[str, object]) -> Dict[str, object]:
-    raise NotImplementedError("Optimizer plug-in not implemented yet.")
+def optimize_frame(
+    frame: ProblemFrame,
+    payload: Dict[str, object],
+    index: Optional[FrameIndex] = None,
+    control: Optional[SearchControl] = None,
+    timeline: Optional[CapacityTimeline] = None,
+) -> Dict[str, object]:
+    config = parse_config(payload)
+    started = time.perf_counter()
+    index = index or build_frame_index(frame)
+    timeline = timeline or build_capacity_timeline(frame, index)
+    with stage("optimize.model"):
+        model = build_planning_model(index, timeline)
+    rng = np.random.default_rng(config.seed)
+    islands = (config.workers > 1 or config.islands) and config.engine != "dp"
+    run = run_islands if islands else ENGINES[config.engine]
+    constraints = None
+    if config.scenario_constraints:
+        constraints = compile_constraints(frame.scenarioConfig.constraints, model.capacity, timeline)
+    control = control or SearchControl()
+    control.timer = IterationTimer(config.engine)
+    with stage("optimize.search"):
+        result = run(
+            model, config, rng, started + config.time_limit_sec,
+            seeds=warm_start_seeds(model, config, constraints), control=control, constraints=constraints,
+        )
+    OPTIMIZER_EVALUATIONS.inc(result.evaluations, engine=config.engine)
+    with stage("optimize.build_state"):
+        state = build_state(index, model, result.best, iteration=result.iterations)
+    return {
+        **result.details,
+        "engine": config.engine,
+        "objective": result.objective,
+        "breakdown": result.breakdown,
+        "iterations": result.iterations,
+        "evaluations": result.evaluations,
+        "constraints": {
+            "applied": constraints.describe() if constraints else [],
+            "skipped": constraints.skipped if constraints else [],
+            "unsupported": constraints.unsupported if constraints else [],
+        },
+        "elapsed_sec": time.perf_counter() - started,
+        "state": state,
+    }
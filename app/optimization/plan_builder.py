@@ -0,0 +1,53 @@
+# TR: Arama cozumunu lot ve stok satirlariyla State modeline cevirir.
+# EN: Converts a search solution into a State with lots and inventory rows.
+from __future__ import annotations
+
+import numpy as np
+
+from app.evaluation.objective import inventory_positions, resolve_options, sequence_lots
+from app.frame.compiled.frame_index import MISSING, FrameIndex
+from app.frame.compiled.planning_model import PlanningModel
+from app.frame.models.plan_table import PlanTable
+from app.frame.models.problem import LotInventory, State, StateMeta
+from app.optimization.solution import Solution
+
+
+def build_state(index: FrameIndex, model: PlanningModel, solution: Solution, iteration: int = 0) -> State:
+    qty = np.maximum(solution.qty, 0.0)
+    machine, mold = resolve_options(model, solution.option)
+    _, p, t, setup_start = sequence_lots(model, qty[None], machine[None], solution.priority[None])
+    lot_machine, lot_qty = machine[p, t], qty[p, t]
+    setup_sec = model.setup_min[p] * 60.0
+    run_sec = lot_qty * model.unit_min[p] * 60.0
+
+    n = p.size
+    process_start = setup_start + setup_sec
+    times = np.stack([setup_start, process_start, process_start, process_start + run_sec])
+    machine_codes, mold_codes = index.machines.codes, index.molds.codes
+    lot_mold = mold[p, t]
+    lots = PlanTable.from_columns(
+        lot_id=[f"L{row + 1}" for row in range(n)],
+        product=[index.products.codes[pi] for pi in p.tolist()],
+        process=[index.processes.code(int(model.process[pi])) or "" for pi in p.tolist()],
+        week=[index.time_buckets.codes[ti] for ti in t.tolist()],
+        qty=lot_qty,
+        times=times,
+        machine=[None if m == MISSING else machine_codes[m] for m in lot_machine.tolist()],
+        mold=[None if k == MISSING else mold_codes[k] for k in lot_mold.tolist()],
+    )
+
+    closing = inventory_positions(model.initial_stock, qty, model.demand)
+    opening = np.concatenate([model.initial_stock[:, None], closing[:, :-1]], axis=1)
+    inventory = [
+        LotInventory(
+            product_code=index.products.codes[pi],
+            time_bucket_id=index.time_buckets.codes[ti],
+            opening_stock=float(opening[pi, ti]),
+            production_qty=float(qty[pi, ti]),
+            demand=float(model.demand[pi, ti]),
+            closing_stock=float(closing[pi, ti]),
+        )
+        for pi in range(model.n_products)
+        for ti in range(model.n_weeks)
+    ]
+    return State(meta=StateMeta(iteration=iteration), lots=lots, inventory=inventory)
@@ -0,0 +1,32 @@
+# TR: Arama motorlarinin paylastigi cozum ve sonuc yapilari.
+# EN: Solution and result structures shared by the search engines.
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+@dataclass
+class Solution:
+    qty: np.ndarray        # (P, T) lot quantity per product and bucket
+    option: np.ndarray     # (P, T) index into the product's resource options
+    priority: np.ndarray   # (P, T) sequencing key within a machine and bucket
+
+    def copy(self) -> "Solution":
+        return Solution(self.qty.copy(), self.option.copy(), self.priority.copy())
+
+    def stacked(self) -> tuple:
+        return self.qty[None], self.option[None], self.priority[None]
+
+
+@dataclass
+class SearchResult:
+    best: Solution
+    objective: float
+    breakdown: Dict[str, float]
+    iterations: int
+    evaluations: int
+    history: List[float] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
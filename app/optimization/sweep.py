@@ -0,0 +1,176 @@
+# TR: Tek bir kayitli cerceve uzerinde ScenarioConfig varyantlarini paralel degerlendirir/optimize eder.
+# EN: Evaluates or optimizes ScenarioConfig variants of one stored frame in parallel.
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from app.concurrency import pool_context
+from app.evaluation.constraints import CompiledConstraints, check_constraints, compile_constraints
+from app.evaluation.kpi import KpiReport, kpi_summary, solution_kpis
+from app.evaluation.objective import COMPONENTS
+from app.frame.compiled.capacity import CapacityTimeline, machine_capacity
+from app.frame.compiled.frame_index import FrameIndex
+from app.frame.compiled.planning_model import build_planning_model
+from app.frame.ingest.problem_adapter import load_scenario_config
+from app.frame.models.problem import ScenarioConfig
+from app.optimization.config import OptimizeConfig
+from app.optimization.islands import ArraySpec, SharedPlanningModel, attach_model
+from app.optimization.optimizer import ENGINES, parse_config, warm_start_seeds
+
+DEFAULT_SWEEP_WORKERS = 4
+MAX_SWEEP_VARIANTS = 500
+# Requests above this are clamped: more processes than cores only add overhead.
+MAX_SWEEP_WORKERS = os.cpu_count() or 1
+
+
+class SweepConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    # ScenarioConfig payloads (dict or list constraints, like POST /frame);
+    # meta may be left out.
+    variants: List[Dict[str, Any]] = Field(min_length=1, max_length=MAX_SWEEP_VARIANTS)
+    # evaluate: score the stored state under each variant.
+    # optimize: run one search per variant; nothing is committed.
+    mode: Literal["evaluate", "optimize"] = "evaluate"
+    # OptimizeConfig payload shared by all variants (optimize mode).
+    optimize: Dict[str, Any] = Field(default_factory=dict)
+    workers: int = Field(default=DEFAULT_SWEEP_WORKERS, ge=1)
+
+
+def parse_sweep(payload: Dict[str, Any]) -> Tuple[SweepConfig, List[ScenarioConfig], OptimizeConfig]:
+    try:
+        sweep = SweepConfig.model_validate(payload)
+    except ValidationError as exc:
+        raise ValueError(str(exc)) from exc
+    scenarios = []
+    for i, raw in enumerate(sweep.variants):
+        raw = {"meta": {"name": f"variant_{i}"}, **raw}
+        # Checked here so that a bad variant fails the request before any
+        # evaluation or worker process starts.
+        try:
+            scenario = load_scenario_config(raw)
+            check_constraints(scenario.constraints)
+        except ValueError as exc:
+            raise ValueError(f"Variant {i}: {exc}") from None
+        scenarios.append(scenario)
+    config = parse_config({**sweep.optimize, "commit": False})
+    if sweep.mode == "optimize" and (config.workers > 1 or config.islands):
+        raise ValueError("Variants are the unit of parallelism in a sweep; use sweep workers, not optimize.workers")
+    return sweep, scenarios, config
+
+
+def _penalties(compiled: CompiledConstraints, values: Dict[str, float]) -> Dict[str, object]:
+    return {
+        "penalty": values.get("constraints", 0.0),
+        "hard_violations": values.get("hard_violations", 0.0),
+        "constraints": {spec["code"]: values.get(spec["code"], 0.0) for spec in compiled.describe()},
+        "skipped": compiled.skipped,
+        "unsupported": compiled.unsupported,
+    }
+
+
+def _summary(index: FrameIndex, report: KpiReport) -> Dict[str, object]:
+    summary = kpi_summary(index, report)
+    for key in ("inventory_mismatches", "inventory_mismatch_samples"):
+        summary.pop(key)
+    return summary
+
+
+def variant_budget(time_limit_sec: float, variants: int, workers: int) -> float:
+    # Search seconds per variant so that every round of `workers` variants
+    # together fits in the sweep's time limit.
+    return time_limit_sec / -(-variants // workers)
+
+
+def run_variant(
+    spec: ArraySpec, config: OptimizeConfig, constraints: CompiledConstraints, budget: float, deadline: float
+) -> Dict[str, object]:
+    # Worker side: the planning model is mapped from shared memory once per
+    # worker process and reused by every variant that lands there. deadline
+    # is wall-clock (time.time) so that it holds across processes.
+    model = attach_model(spec)
+    started = time.perf_counter()
+    remaining = max(min(budget, deadline - time.time()), 0.0)
+    # One seed for all variants, so differences come from the scenario.
+    rng = np.random.default_rng(config.seed)
+    result = ENGINES[config.engine](
+        model, config, rng, started + remaining, seeds=warm_start_seeds(model, config, constraints), constraints=constraints
+    )
+    return {
+        "objective": result.objective,
+        "breakdown": result.breakdown,
+        "iterations": result.iterations,
+        "evaluations": result.evaluations,
+        "kpis": solution_kpis(model, result.best.qty, result.best.option),
+        "elapsed_sec": time.perf_counter() - started,
+    }
+
+
+def sweep_frame(
+    scenarios: List[ScenarioConfig],
+    index: FrameIndex,
+    timeline: Optional[CapacityTimeline],
+    mode: str = "evaluate",
+    config: Optional[OptimizeConfig] = None,
+    kpis: Optional[KpiReport] = None,
+    workers: int = DEFAULT_SWEEP_WORKERS,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Dict[str, object]:
+    started = time.perf_counter()
+    rows: List[Dict[str, object]] = []
+    result: Dict[str, object] = {"mode": mode, "variants": len(scenarios)}
+    if mode == "evaluate":
+        # The stored state's KPIs do not depend on the scenario: only the
+        # constraint kernels run per variant, over the cached KPI arrays.
+        capacity = machine_capacity(index, timeline)
+        for i, scenario in enumerate(scenarios):
+            compiled = compile_constraints(scenario.constraints, capacity, timeline)
+            values = compiled.evaluate_state(index, kpis.closing, kpis.busy)
+            rows.append({"variant": i, "name": scenario.meta.name, **_penalties(compiled, values)})
+        result["kpis"] = _summary(index, kpis)
+        ranking = sorted(rows, key=lambda r: (r["hard_violations"], r["penalty"]))
+    else:
+        config = config or OptimizeConfig()
+        model = build_planning_model(index, timeline)
+        compiled = [compile_constraints(s.constraints, model.capacity, timeline) for s in scenarios]
+        # time_limit_sec bounds the whole sweep, not each variant.
+        workers = max(min(workers, len(scenarios), MAX_SWEEP_WORKERS), 1)
+        budget = variant_budget(config.time_limit_sec, len(scenarios), workers)
+        deadline = time.time() + config.time_limit_sec
+        result.update(workers=workers, variant_budget_sec=budget)
+        own_pool = executor is None
+        pool = executor or ProcessPoolExecutor(max_workers=workers, mp_context=pool_context())
+        try:
+            with SharedPlanningModel(model) as shared:
+                futures = [pool.submit(run_variant, shared.spec, config, c, budget, deadline) for c in compiled]
+                outcomes = [future.result() for future in futures]
+        finally:
+            if own_pool:
+                pool.shutdown()
+        for i, (scenario, outcome) in enumerate(zip(scenarios, outcomes)):
+            breakdown = outcome["breakdown"]
+            rows.append({
+                "variant": i,
+                "name": scenario.meta.name,
+                "objective": outcome["objective"],
+                **_penalties(compiled[i], breakdown),
+                # Objective without the scenario penalties: comparable across variants.
+                "cost": sum(breakdown.get(name, 0.0) for name in COMPONENTS),
+                "breakdown": {name: breakdown.get(name, 0.0) for name in COMPONENTS},
+                "kpis": _summary(index, outcome["kpis"]),
+                "iterations": outcome["iterations"],
+                "evaluations": outcome["evaluations"],
+                "elapsed_sec": outcome["elapsed_sec"],
+            })
+        result["engine"] = config.engine
+        ranking = sorted(rows, key=lambda r: (r["hard_violations"], r["cost"]))
+    result["rows"] = rows
+    result["ranking"] = [row["variant"] for row in ranking]
+    result["elapsed_sec"] = time.perf_counter() - started
+    return result
@@ -0,0 +1,444 @@
+# TR: Artimsal (delta) maliyet degerlendirmeli Tabu Arama motoru.
+# EN: Tabu Search engine with incremental (delta) move evaluation.
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.evaluation.constraints import CompiledConstraints, MoveDelta
+from app.evaluation.fitness_cache import FitnessCache
+from app.evaluation.objective import (
+    COMPONENTS,
+    breakdown_at,
+    inventory_positions,
+    machine_load,
+    resolve_options,
+)
+from app.frame.compiled.frame_index import MISSING
+from app.frame.compiled.planning_model import PlanningModel
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.solution import SearchResult, Solution
+
+Move = Tuple
+
+# Moves a non-incremental constraint kernel is fully scored for, per step.
+PENALTY_CANDIDATES = 4
+
+
+def _over(load: float, capacity: float) -> float:
+    return load - capacity if load > capacity else 0.0
+
+
+class TabuSearch:
+    def __init__(
+        self,
+        model: PlanningModel,
+        config: OptimizeConfig,
+        rng: np.random.Generator,
+        initial: Optional[Solution] = None,
+        cache: Optional[FitnessCache] = None,
+        constraints: Optional[CompiledConstraints] = None,
+    ) -> None:
+        self.model = model
+        self.config = config
+        self.rng = rng
+        # Moves are scored by delta; the cache serves full evaluations only.
+        self.cache = cache or FitnessCache(config.cache_size)
+        # Scenario constraint penalties are scored by kernel deltas; kernels
+        # without one fall back to a batch over the best few moves.
+        self.constraints = constraints if constraints is not None and constraints.kernels else None
+        self.penalty = 0.0
+        self.weights = [getattr(config.weights, name) for name in COMPONENTS]
+        self.tabu: Dict[tuple, int] = {}
+        self.iteration = 0
+        self.evaluations = 0
+        self.history: List[float] = []
+        self.reset(initial or self.initial_solution())
+
+    def initial_solution(self) -> Solution:
+        shape = self.model.shape
+        return Solution(np.rint(self.model.lot_for_lot()), np.zeros(shape, dtype=np.int32), self.rng.random(shape))
+
+    # -- state -----------------------------------------------------------
+
+    def reset(self, solution: Solution) -> None:
+        model = self.model
+        self.qty = np.maximum(solution.qty, 0.0).astype(np.float64)
+        self.option = solution.option.astype(np.int32)
+        self.priority = solution.priority.astype(np.float64)
+        self.machine, self.mold = resolve_options(model, self.option)
+        self.pos = inventory_positions(model.initial_stock, self.qty, model.demand)
+        self.load = machine_load(model, self.qty[None], self.machine[None])[0]
+
+        self.seq: Dict[Tuple[int, int], List[int]] = {}
+        p, t = np.nonzero((self.qty > 0) & (self.machine != MISSING))
+        order = np.lexsort((self.priority[p, t], t, self.machine[p, t]))
+        for pi, ti in zip(p[order].tolist(), t[order].tolist()):
+            self.seq.setdefault((int(self.machine[pi, ti]), ti), []).append(pi)
+        for key in self.seq:
+            self._renumber(key)
+
+        self.raw = [
+            float(np.maximum(-self.pos, 0.0).sum()),
+            float(np.maximum(self.pos, 0.0).sum()),
+            float((self.qty > 0).sum()),
+            float(np.maximum(self.load - model.capacity, 0.0).sum()),
+            float(sum(self._changes(key[1], seq) for key, seq in self.seq.items())),
+        ]
+        if self.constraints is not None:
+            self.penalty = float(self._penalties(self.qty[None], self.option[None], self.priority[None])[0])
+        self.current = self._value(self.raw) + self.penalty
+        self._snapshot()
+
+    def _snapshot(self) -> None:
+        self.best_solution = Solution(self.qty.copy(), self.option.copy(), self.priority.copy())
+        self.best_value = self.current
+
+    def _penalties(self, qty: np.ndarray, option: np.ndarray, priority: np.ndarray) -> np.ndarray:
+        model = self.model
+        machine, mold = resolve_options(model, option)
+        position = inventory_positions(model.initial_stock, qty, model.demand)
+        load = machine_load(model, qty, machine)
+        return self.constraints.evaluate_population(model, qty, machine, mold, priority, position, load)["constraints"]
+
+    def _candidate_penalties(self, moves: Sequence[Move]) -> np.ndarray:
+        # Applies every move to a copy of the plan and scores the whole batch.
+        K = len(moves)
+        qty = np.repeat(self.qty[None], K, axis=0)
+        option = np.repeat(self.option[None], K, axis=0)
+        priority = np.repeat(self.priority[None], K, axis=0)
+        for k, move in enumerate(moves):
+            if move[0] == "shift":
+                _, p, a, b, amount = move
+                # A new lot joins the end of its machine sequence, as in apply().
+                if qty[k, p, b] <= 0:
+                    priority[k, p, b] = 1.0
+                qty[k, p, a] = max(qty[k, p, a] - amount, 0.0)
+                qty[k, p, b] += amount
+            elif move[0] == "option":
+                _, p, t, opt = move
+                if self.model.opt_machine[p, opt] != self.machine[p, t]:
+                    priority[k, p, t] = 1.0
+                option[k, p, t] = opt
+            else:
+                _, m, t, i = move
+                seq = self.seq[(m, t)]
+                x, y = seq[i], seq[i + 1]
+                priority[k, x, t], priority[k, y, t] = priority[k, y, t], priority[k, x, t]
+        return self._penalties(qty, option, priority)
+
+    def _value(self, raw: Sequence[float]) -> float:
+        return sum(w * r for w, r in zip(self.weights, raw))
+
+    def _renumber(self, key: Tuple[int, int]) -> None:
+        seq = self.seq.get(key)
+        if not seq:
+            self.seq.pop(key, None)
+            return
+        t, width = key[1], len(seq)
+        for rank, p in enumerate(seq):
+            self.priority[p, t] = (rank + 0.5) / width
+
+    def _changes(self, t: int, seq: Sequence[int], override: Optional[Tuple[int, int]] = None) -> int:
+        # Mold switches along a machine sequence; lots without a mold are transparent.
+        prev, count = MISSING, 0
+        for p in seq:
+            mold = override[1] if override and override[0] == p else int(self.mold[p, t])
+            if mold == MISSING:
+                continue
+            if prev != MISSING and mold != prev:
+                count += 1
+            prev = mold
+        return count
+
+    def _minutes(self, p: int, qty: float) -> float:
+        return float(self.model.setup_min[p] + qty * self.model.unit_min[p])
+
+    # -- delta evaluation ------------------------------------------------
+
+    def _delta_load(self, cells: Sequence[Tuple[int, int, float]]) -> float:
+        delta = 0.0
+        for m, t, change in cells:
+            if m == MISSING or change == 0.0:
+                continue
+            cap, old = float(self.model.capacity[m, t]), float(self.load[m, t])
+            delta += _over(old + change, cap) - _over(old, cap)
+        return delta
+
+    def _delta_group(
+        self, key: Tuple[int, int], new_seq: Sequence[int], override: Optional[Tuple[int, int]] = None
+    ) -> int:
+        old_seq = self.seq.get(key, [])
+        return self._changes(key[1], new_seq, override) - self._changes(key[1], old_seq)
+
+    def delta_shift(self, p: int, a: int, b: int, amount: float) -> List[float]:
+        qa, qb = float(self.qty[p, a]), float(self.qty[p, b])
+        lo, hi = min(a, b), max(a, b)
+        seg = self.pos[p, lo:hi]
+        new = seg - amount if a < b else seg + amount
+        gone, born = qa - amount <= 0, qb <= 0
+        unit, setup = float(self.model.unit_min[p]) * amount, float(self.model.setup_min[p])
+        ma, mb = int(self.machine[p, a]), int(self.machine[p, b])
+        change = 0
+        if gone and ma != MISSING:
+            change += self._delta_group((ma, a), [x for x in self.seq[(ma, a)] if x != p])
+        if born and mb != MISSING:
+            change += self._delta_group((mb, b), self.seq.get((mb, b), []) + [p])
+        return [
+            float(np.maximum(-new, 0.0).sum() - np.maximum(-seg, 0.0).sum()),
+            float(np.maximum(new, 0.0).sum() - np.maximum(seg, 0.0).sum()),
+            float(born) - float(gone),
+            self._delta_load([
+                (ma, a, -unit - (setup if gone else 0.0)),
+                (mb, b, unit + (setup if born else 0.0)),
+            ]),
+            float(change),
+        ]
+
+    def delta_option(self, p: int, t: int, option: int) -> List[float]:
+        m, m2 = int(self.machine[p, t]), int(self.model.opt_machine[p, option])
+        k2 = int(self.model.opt_mold[p, option])
+        if m == m2:
+            change = self._delta_group((m, t), self.seq.get((m, t), []), (p, k2)) if m != MISSING else 0
+            return [0.0, 0.0, 0.0, 0.0, float(change)]
+        minutes = self._minutes(p, float(self.qty[p, t]))
+        change = 0
+        if m != MISSING:
+            change += self._delta_group((m, t), [x for x in self.seq[(m, t)] if x != p])
+        if m2 != MISSING:
+            change += self._delta_group((m2, t), self.seq.get((m2, t), []) + [p], (p, k2))
+        return [0.0, 0.0, 0.0, self._delta_load([(m, t, -minutes), (m2, t, minutes)]), float(change)]
+
+    def delta_swap(self, m: int, t: int, i: int) -> List[float]:
+        seq = list(self.seq[(m, t)])
+        seq[i], seq[i + 1] = seq[i + 1], seq[i]
+        return [0.0, 0.0, 0.0, 0.0, float(self._delta_group((m, t), seq))]
+
+    # -- move application ------------------------------------------------
+
+    def _add_load(self, m: int, t: int, change: float) -> None:
+        if m != MISSING:
+            self.load[m, t] += change
+
+    def _leave(self, p: int, t: int) -> None:
+        key = (int(self.machine[p, t]), t)
+        if key[0] != MISSING:
+            self.seq[key].remove(p)
+            self._renumber(key)
+
+    def _join(self, p: int, t: int) -> None:
+        key = (int(self.machine[p, t]), t)
+        if key[0] != MISSING:
+            self.seq.setdefault(key, []).append(p)
+            self._renumber(key)
+
+    def apply(self, move: Move, delta: Sequence[float]) -> None:
+        kind = move[0]
+        if kind == "shift":
+            _, p, a, b, amount = move
+            gone, born = self.qty[p, a] - amount <= 0, self.qty[p, b] <= 0
+            setup, unit = float(self.model.setup_min[p]), float(self.model.unit_min[p]) * amount
+            lo, hi = min(a, b), max(a, b)
+            self.pos[p, lo:hi] += -amount if a < b else amount
+            self._add_load(int(self.machine[p, a]), a, -unit - (setup if gone else 0.0))
+            self._add_load(int(self.machine[p, b]), b, unit + (setup if born else 0.0))
+            if gone:
+                self._leave(p, a)
+            self.qty[p, a] -= amount
+            self.qty[p, b] += amount
+            if gone:
+                self.qty[p, a] = 0.0
+            if born:
+                self._join(p, b)
+        elif kind == "option":
+            _, p, t, option = move
+            minutes = self._minutes(p, float(self.qty[p, t]))
+            m, m2 = int(self.machine[p, t]), int(self.model.opt_machine[p, option])
+            if m != m2:
+                self._leave(p, t)
+                self._add_load(m, t, -minutes)
+                self._add_load(m2, t, minutes)
+            self.option[p, t] = option
+            self.machine[p, t] = m2
+            self.mold[p, t] = self.model.opt_mold[p, option]
+            if m != m2:
+                self._join(p, t)
+        else:
+            _, m, t, i = move
+            seq = self.seq[(m, t)]
+            seq[i], seq[i + 1] = seq[i + 1], seq[i]
+            self._renumber((m, t))
+        self.raw = [r + d for r, d in zip(self.raw, delta)]
+        self.current = self._value(self.raw) + self.penalty
+
+    # -- neighborhood ----------------------------------------------------
+
+    def _attributes(self, move: Move) -> Tuple[tuple, tuple]:
+        # (attribute the move would touch, attribute that becomes tabu after it)
+        kind = move[0]
+        if kind == "shift":
+            _, p, a, b, _ = move
+            return ("shift", p, a, b), ("shift", p, b, a)
+        if kind == "option":
+            _, p, t, option = move
+            return ("option", p, t, option), ("option", p, t, int(self.option[p, t]))
+        _, m, t, i = move
+        seq = self.seq[(m, t)]
+        pair = ("swap", m, t, min(seq[i], seq[i + 1]), max(seq[i], seq[i + 1]))
+        return pair, pair
+
+    def sample_moves(self, count: int) -> List[Move]:
+        rng, model = self.rng, self.model
+        T = model.n_weeks
+        active = np.flatnonzero(self.qty.reshape(-1) > 0)
+        groups = [key for key, seq in self.seq.items() if len(seq) > 1]
+        moves: List[Move] = []
+        if not active.size:
+            return moves
+        for kind in rng.integers(0, 3, count).tolist():
+            cell = int(active[rng.integers(0, active.size)])
+            p, t = divmod(cell, T)
+            if kind == 0 and T > 1:
+                b = int(np.clip(t + rng.choice((-2, -1, 1, 2)), 0, T - 1))
+                if b != t:
+                    qty = float(self.qty[p, t])
+                    amount = qty if qty <= 1 or rng.random() < 0.5 else float(np.ceil(qty / 2))
+                    moves.append(("shift", p, t, b, amount))
+            elif kind == 1 and model.n_options[p] > 1:
+                option = int(rng.integers(0, model.n_options[p] - 1))
+                moves.append(("option", p, t, option + int(option >= self.option[p, t])))
+            elif kind == 2 and groups:
+                m, tt = groups[int(rng.integers(0, len(groups)))]
+                moves.append(("swap", m, tt, int(rng.integers(0, len(self.seq[(m, tt)]) - 1))))
+        return moves
+
+    def delta(self, move: Move) -> List[float]:
+        self.evaluations += 1
+        if move[0] == "shift":
+            return self.delta_shift(*move[1:])
+        if move[0] == "option":
+            return self.delta_option(*move[1:])
+        return self.delta_swap(*move[1:])
+
+    def _move_penalties(
+        self, moves: Sequence[Move], deltas: Sequence[List[float]], tabu: Sequence[bool]
+    ) -> np.ndarray:
+        # Penalty of the plan after each move (inf: not scored). Shifts never
+        # touch the last week's position, so the final backlog never changes.
+        penalties = np.full(len(moves), np.inf)
+        pending = []
+        for k, delta in enumerate(deltas):
+            change = self.constraints.delta(
+                MoveDelta(backlog=delta[0], final_backlog=0.0, overload=delta[3], capacity=self.model.capacity)
+            )
+            if change is None:
+                pending.append(k)
+            else:
+                penalties[k] = self.penalty + change
+        if pending:
+            pending.sort(key=lambda k: (tabu[k], self._value(deltas[k])))
+            pending = pending[:PENALTY_CANDIDATES]
+            penalties[pending] = self._candidate_penalties([moves[k] for k in pending])
+        return penalties
+
+    def step(self) -> bool:
+        chosen, chosen_delta, chosen_value, chosen_penalty = None, None, float("inf"), self.penalty
+        moves = self.sample_moves(self.config.neighborhood_size)
+        deltas = [self.delta(move) for move in moves]
+        tabu = [self.tabu.get(self._attributes(move)[0], -1) >= self.iteration for move in moves]
+        penalties = self._move_penalties(moves, deltas, tabu) if self.constraints is not None and moves else None
+        for k, (move, delta) in enumerate(zip(moves, deltas)):
+            value = self.current + self._value(delta)
+            if penalties is not None:
+                value += penalties[k] - self.penalty
+            # Aspiration: a tabu move is allowed when it beats the best plan found so far.
+            if tabu[k] and value >= self.best_value:
+                continue
+            if value < chosen_value:
+                chosen, chosen_delta, chosen_value = move, delta, value
+                chosen_penalty = self.penalty if penalties is None else float(penalties[k])
+        self.iteration += 1
+        if chosen is None:
+            return False
+        _, forbidden = self._attributes(chosen)
+        self.penalty = chosen_penalty
+        self.apply(chosen, chosen_delta)
+        self.tabu[forbidden] = self.iteration + self.config.tabu_tenure
+        if self.iteration % 256 == 0:
+            self.tabu = {k: v for k, v in self.tabu.items() if v >= self.iteration}
+        if self.current < self.best_value - 1e-9:
+            self._snapshot()
+        self.history.append(self.best_value)
+        return True
+
+    def run(self, iterations: int, deadline: float, control: Optional[SearchControl] = None) -> None:
+        for _ in range(iterations):
+            if time.perf_counter() >= deadline or (control is not None and control.cancelled):
+                break
+            if not self.step():
+                break
+            if control is not None:
+                control.report(self.iteration, self.best_value)
+
+    def _full(self, solution: Solution) -> Dict[str, np.ndarray]:
+        return self.cache.evaluate(self.model, *solution.stacked(), self.config.weights, self.constraints)
+
+    def current_solution(self) -> Solution:
+        return Solution(self.qty.copy(), self.option.copy(), self.priority.copy())
+
+    def best(self) -> Tuple[Solution, float]:
+        return self.best_solution.copy(), self.best_value
+
+    def inject(self, solutions: Sequence[Solution]) -> None:
+        # Restart the walk from an incoming solution when it is better than the current one.
+        for solution in solutions:
+            value = float(self._full(solution)["objective"][0])
+            if value < self.current:
+                best_solution, best_value = self.best_solution, self.best_value
+                self.reset(solution)
+                if best_value < self.best_value:
+                    self.best_solution, self.best_value = best_solution, best_value
+
+    def export(self) -> Dict[str, object]:
+        return {
+            "current": self.current_solution(), "best": self.best_solution, "best_value": self.best_value,
+            "tabu": self.tabu, "iteration": self.iteration, "evaluations": self.evaluations, "history": self.history,
+        }
+
+    def restore(self, snapshot: Dict[str, object]) -> None:
+        self.reset(snapshot["current"])
+        self.best_solution, self.best_value = snapshot["best"], snapshot["best_value"]
+        self.tabu = dict(snapshot["tabu"])
+        self.iteration = snapshot["iteration"]
+        self.evaluations = snapshot["evaluations"]
+        self.history = list(snapshot["history"])
+
+    def result(self) -> SearchResult:
+        solution, _ = self.best()
+        full = self._full(solution)
+        return SearchResult(
+            best=solution,
+            objective=float(full["objective"][0]),
+            breakdown=breakdown_at(full, 0),
+            iterations=self.iteration,
+            evaluations=self.evaluations,
+            history=self.history,
+            details={"cache": self.cache.stats()},
+        )
+
+
+def run_tabu(
+    model: PlanningModel,
+    config: OptimizeConfig,
+    rng: np.random.Generator,
+    deadline: float,
+    seeds: Sequence[Solution] = (),
+    control: Optional[SearchControl] = None,
+    constraints: Optional[CompiledConstraints] = None,
+) -> SearchResult:
+    engine = TabuSearch(model, config, rng, seeds[0] if seeds else None, constraints=constraints)
+    engine.run(config.iterations, deadline, control)
+    return engine.result()
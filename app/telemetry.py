@@ -0,0 +1,182 @@
+# TR: Asama zamanlayicisi, sayac/histogram kaydi ve Prometheus metin ciktisi.
+# EN: Stage timer, counter/histogram registry and Prometheus text exposition.
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ITERATION_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()) -> None:
+        self.name, self.description, self.labels = name, description, tuple(labels)
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    # Per label set: one count per bucket (the last one is +Inf), sum and count.
+    def __init__(
+        self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS
+    ) -> None:
+        self.name, self.description, self.labels = name, description, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts..., +Inf count, sum
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labels))
+        return 0 if series is None else int(sum(series[:-1]))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                total = 0.0
+                for bound, hits in zip(self.buckets + (float("inf"),), series):
+                    total += hits
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {_number(total)}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {repr(series[-1])}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {_number(total)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, description, labels))
+
+    def histogram(
+        self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, description, labels, buckets))
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        # gauges: point-in-time values (cache size, queue depth) read at scrape time.
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for name, value in (gauges or {}).items():
+            lines.extend([f"# TYPE {name} gauge", f"{name} {_number(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("planner_stage_seconds", "Duration of pipeline stages.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "planner_http_request_seconds", "HTTP request duration by route template.", ("method", "route", "status")
+)
+OPTIMIZER_ITERATIONS = REGISTRY.counter(
+    "planner_optimizer_iterations_total", "Optimizer iterations (GA generations, tabu moves).", ("engine",)
+)
+OPTIMIZER_ITERATION_SECONDS = REGISTRY.histogram(
+    "planner_optimizer_iteration_seconds", "Mean iteration time between progress reports.", ("engine",),
+    ITERATION_BUCKETS,
+)
+OPTIMIZER_EVALUATIONS = REGISTRY.counter(
+    "planner_optimizer_evaluations_total", "Objective evaluations per optimizer run.", ("engine",)
+)
+
+# Set by the request middleware when ?profile=1 asks for an inline breakdown.
+_profile: ContextVar[Optional[List[Dict[str, object]]]] = ContextVar("profile", default=None)
+_depth: ContextVar[int] = ContextVar("stage_depth", default=0)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    # Times one pipeline stage into STAGE_SECONDS; inside a profiled request
+    # the stage is also recorded, in call order, with its nesting depth.
+    records = _profile.get()
+    record = None
+    if records is not None:
+        record = {"stage": name, "depth": _depth.get(), "sec": 0.0}
+        records.append(record)
+    token = _depth.set(_depth.get() + 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _depth.reset(token)
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if record is not None:
+            record["sec"] = elapsed
+
+
+@contextmanager
+def profiling() -> Iterator[List[Dict[str, object]]]:
+    records: List[Dict[str, object]] = []
+    token = _profile.set(records)
+    try:
+        yield records
+    finally:
+        _profile.reset(token)
+
+
+class IterationTimer:
+    # Turns optimizer progress reports into iteration telemetry. Reports may
+    # cover several iterations (island epochs), hence the mean per report.
+    def __init__(self, engine: str) -> None:
+        self.engine = engine
+        self._last = time.perf_counter()
+        self._iteration = 0
+
+    def __call__(self, iteration: int) -> None:
+        now = time.perf_counter()
+        done = iteration - self._iteration
+        if done > 0:
+            OPTIMIZER_ITERATIONS.inc(done, engine=self.engine)
+            OPTIMIZER_ITERATION_SECONDS.observe((now - self._last) / done, engine=self.engine)
+            self._last, self._iteration = now, iteration
@@ -0,0 +1,2 @@
+# TR: Sentetik problem ureteci ve olcekleme benchmark paketi.
+# EN: Synthetic problem generator and scaling benchmark suite.
@@ -0,0 +1,53 @@
+# TR: Benchmark komut satiri: python -m benchmarks --sizes xs,s,m --out sonuc.json --baseline onceki.json
+# EN: Benchmark command line: python -m benchmarks --sizes xs,s,m --out result.json --baseline previous.json
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from benchmarks.harness import DEFAULT_REPEAT, DEFAULT_SIZES, DEFAULT_THRESHOLD, SIZES, STAGES, compare, run_benchmarks
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Scaling benchmarks over synthetic frames.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help=f"comma-separated, from {','.join(SIZES)}")
+    parser.add_argument("--stages", default="", help=f"comma-separated, from {','.join(STAGES)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="write the JSON result here")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    try:
+        result = run_benchmarks(
+            sizes=[s for s in args.sizes.split(",") if s],
+            stages=[s for s in args.stages.split(",") if s] or None,
+            repeat=args.repeat,
+            seed=args.seed,
+            log=lambda line: print(line, file=sys.stderr),
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    for stage, steps in result["scaling"].items():
+        for step in steps:
+            if step["superlinear"]:
+                print(f"superlinear: {stage} {step['from']}->{step['to']} k={step['exponent']:.2f}", file=sys.stderr)
+    failed = False
+    if args.baseline:
+        result["comparison"] = compare(result, json.loads(args.baseline.read_text()), args.threshold)
+        for entry in result["comparison"]["regressions"]:
+            print(f"regression: {entry['size']} {entry['stage']} x{entry['ratio']:.2f}", file=sys.stderr)
+        failed = bool(result["comparison"]["regressions"])
+    text = json.dumps(result, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
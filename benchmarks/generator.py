@@ -0,0 +1,189 @@
+# TR: Tohumlu, yapilandirilabilir boyutta gecerli ProblemFrame payload'lari uretir.
+# EN: Seeded generator of valid ProblemFrame payloads of configurable size.
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
+
+HORIZON_START = date(2025, 1, 6)    # a Monday
+SHIFT_SEGMENTS = [
+    {"code": "NIGHT", "start": "00:00", "end": "08:00", "constraints": ["NO_MOLD_CHANGE_AT_NIGHT"]},
+    {"code": "DAY", "start": "08:00", "end": "16:00", "constraints": []},
+    {"code": "EVENING", "start": "16:00", "end": "24:00", "constraints": []},
+]
+SCENARIO_CONSTRAINTS = {
+    "DEMAND_SATISFACTION_PER_WEEK": {"shift_based": False, "type": "hard", "weight": None},
+    "NO_MOLD_CHANGE_AT_NIGHT": {"shift_based": True, "type": "hard", "weight": None},
+    "SHIFT_TEMPLATES": {"shift_based": False, "type": "soft", "weight": 10.0},
+}
+
+
+class GeneratorConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    products: int = Field(default=10, ge=1)
+    steps: int = Field(default=3, ge=1)             # process steps per product; the last one is molded
+    machines: int = Field(default=4, ge=1)
+    molds: int = Field(default=8, ge=1)
+    # Share of machine x mold pairs that are compatible (every mold keeps at least one).
+    compat_density: float = Field(default=0.3, gt=0, le=1)
+    molds_per_product: int = Field(default=2, ge=1)
+    weeks: int = Field(default=4, ge=1)
+    order_lines: int = Field(default=100, ge=0)
+    lots: int = Field(default=200, ge=0)
+    seed: int = 0
+
+
+def _stamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def generate_problem_frame(config: GeneratorConfig) -> Dict[str, Any]:
+    # Raw payload, as POST /frame takes it. Every reference resolves, so the
+    # frame passes validate_batch; the same config always gives the same frame.
+    rng = np.random.default_rng(config.seed)
+    P, S, M, K, T = config.products, config.steps, config.machines, config.molds, config.weeks
+    processes = [f"AP{(k + 1) * 100}" for k in range(S)]
+    molded = processes[-1]
+    product_codes = [f"P{p:05d}" for p in range(P)]
+    machine_ids = list(range(1, M + 1))
+    mold_codes = [f"KLP{k:05d}" for k in range(K)]
+    weeks = [f"W{t + 1:03d}_25" for t in range(T)]
+    week_start = [HORIZON_START + timedelta(weeks=t) for t in range(T)]
+
+    compatible = rng.random((K, M)) < config.compat_density
+    compatible[np.arange(K), rng.integers(0, M, size=K)] = True
+    mold_machines = [np.flatnonzero(row) for row in compatible]
+    allowed = [
+        rng.choice(K, size=min(config.molds_per_product, K), replace=False) for _ in range(P)
+    ]
+    cycle_sec = rng.uniform(20.0, 120.0, size=(P, S)).round(1)
+
+    products = []
+    for p, code in enumerate(product_codes):
+        steps = []
+        for k, process in enumerate(processes):
+            steps.append({
+                "process_code": process,
+                "step_no": (k + 1) * 10,
+                "name": f"Step {k + 1}",
+                "output_material": f"{code}_S{k + 1}",
+                "yield_factor": 0.98,
+                "base_qty": 1.0,
+                "base_qty_type": "ADET",
+                "setup_time_min": 30,
+                "cycle_time_sec": float(cycle_sec[p, k]),
+                "process_input": [],
+            })
+        products.append({"code": code, "name": f"Product {p}", "base_unit": "ADET", "process_data": steps})
+
+    line_product = rng.integers(0, P, size=config.order_lines)
+    line_week = rng.integers(0, T, size=config.order_lines)
+    line_qty = rng.integers(10, 500, size=config.order_lines) * 10
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for p, t, qty in zip(line_product.tolist(), line_week.tolist(), line_qty.tolist()):
+        groups.setdefault(p, []).append({"week": weeks[t], "qty": float(qty)})
+    orders = [{"product_code": product_codes[p], "orders": groups[p]} for p in sorted(groups)]
+
+    lot_product = rng.integers(0, P, size=config.lots)
+    lot_week = rng.integers(0, T, size=config.lots)
+    lot_qty = rng.integers(10, 200, size=config.lots) * 10
+    lot_day = rng.integers(0, 6, size=config.lots)
+    lot_minute = rng.integers(0, 16 * 60, size=config.lots)
+    lot_pick = rng.random((config.lots, 2))
+    lots = []
+    for i in range(config.lots):
+        p, t = int(lot_product[i]), int(lot_week[i])
+        molds = allowed[p]
+        mold = int(molds[int(lot_pick[i, 0] * len(molds))])
+        machines = mold_machines[mold]
+        machine = machine_ids[int(machines[int(lot_pick[i, 1] * len(machines))])]
+        qty = float(lot_qty[i])
+        setup_start = datetime.combine(week_start[t], datetime.min.time()) + timedelta(
+            days=int(lot_day[i]), minutes=int(lot_minute[i])
+        )
+        process_start = setup_start + timedelta(minutes=30)
+        process_end = process_start + timedelta(seconds=round(qty * cycle_sec[p, -1]))
+        lots.append({
+            "lot_id": f"L{i:07d}",
+            "product_code": product_codes[p],
+            "process_code": molded,
+            "week": weeks[t],
+            "qty": qty,
+            "qty_type": "ADET",
+            "setup_start_time": _stamp(setup_start),
+            "setup_end_time": _stamp(process_start),
+            "process_start_time": _stamp(process_start),
+            "process_end_time": _stamp(process_end),
+            "resources": [{"type": "machine", "id": machine}, {"type": "mold", "id": mold_codes[mold]}],
+        })
+
+    days = [HORIZON_START + timedelta(days=d) for d in range(7 * T)]
+    return {
+        "problemData": {
+            "problem_meta": {
+                "problem_code": f"SYN_{P}x{T}_{config.seed}",
+                "horizon_type": "Week",
+                "base_shift_templates_code": "S3",
+            },
+            "time_buckets": [
+                {"id": week, "index": t, "start_date": start.isoformat(), "end_date": (start + timedelta(days=6)).isoformat()}
+                for t, (week, start) in enumerate(zip(weeks, week_start))
+            ],
+            "orders": orders,
+            "stocks": [
+                {"product_code": code, "warehouse": "sevk", "qty": float(qty)}
+                for code, qty in zip(product_codes, rng.integers(0, 100, size=P) * 10)
+            ],
+            "products": products,
+            "processes": [
+                {"code": process, "name": f"Process {process}", "constraints": ["machine", "mold"] if process == molded else []}
+                for process in processes
+            ],
+            "resources": {
+                "machine": [{"id": m, "name": f"Press {m}", "process_code": molded} for m in machine_ids],
+                "mold": [
+                    {
+                        "code": code,
+                        "name": f"Mold {code}",
+                        "process_code": molded,
+                        "compatible_machines_id": [machine_ids[m] for m in mold_machines[k].tolist()],
+                    }
+                    for k, code in enumerate(mold_codes)
+                ],
+            },
+            "shift_templates": [{"code": "S3", "name": "3 shifts", "segments": SHIFT_SEGMENTS}],
+            "work_calendar": [
+                {"date": day.isoformat(), "shift_templates_code": "S3", "holiday": day.weekday() == 6} for day in days
+            ],
+            "compatibility": {
+                "machine_mold_pairs": [
+                    {"machine_id": machine_ids[m], "mold_code": mold_codes[k], "process_code": molded}
+                    for k in range(K)
+                    for m in mold_machines[k].tolist()
+                ],
+                "product_molds": [
+                    {"product_code": code, "process_code": molded, "allowed_molds": [mold_codes[k] for k in allowed[p].tolist()]}
+                    for p, code in enumerate(product_codes)
+                ],
+            },
+        },
+        "scenarioConfig": {"meta": {"name": "Synthetic"}, "constraints": SCENARIO_CONSTRAINTS},
+        "state": {"meta": {"iteration": 0}, "plan": lots},
+    }
+
+
+def frame_records(payload: Dict[str, Any]) -> int:
+    # Input size used for scaling exponents: rows across the large collections.
+    data = payload["problemData"]
+    return (
+        sum(len(group["orders"]) for group in data["orders"])
+        + sum(len(product["process_data"]) for product in data["products"])
+        + len(data["compatibility"]["machine_mold_pairs"])
+        + len(data["compatibility"]["product_molds"])
+        + len(data["work_calendar"])
+        + len(payload["state"].get("plan") or [])
+    )
@@ -0,0 +1,248 @@
+# TR: Boyut merdiveni uzerinde asama surelerini olcer, olcekleme usteli hesaplar ve bazal sonucla karsilastirir.
+# EN: Times each pipeline stage across a size ladder, derives scaling exponents and compares against a baseline.
+from __future__ import annotations
+
+import gc
+import json
+import math
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.evaluation.evaluator import evaluate_frame
+from app.evaluation.problem_validator import validate_references
+from app.frame.compiled.capacity import CapacityTimeline, build_capacity_timeline
+from app.frame.compiled.frame_index import FrameIndex, build_frame_index
+from app.frame.ingest.problem_adapter import load_problem_frame
+from app.frame.models.problem import ProblemFrame
+from app.frame.repositories.problem_repo import ProblemRepository
+from app.frame.repositories.write_behind import WriteBehindRepository
+from app.frame.services.frame_manager import FrameManager
+from app.optimization.optimizer import optimize_frame
+from benchmarks.generator import GeneratorConfig, frame_records, generate_problem_frame
+
+SIZES: Dict[str, GeneratorConfig] = {
+    "xs": GeneratorConfig(products=10, machines=4, molds=8, weeks=4, order_lines=100, lots=200),
+    "s": GeneratorConfig(products=100, machines=10, molds=40, weeks=12, order_lines=2000, lots=5000),
+    "m": GeneratorConfig(products=500, machines=30, molds=150, weeks=26, order_lines=20000, lots=50000),
+    "l": GeneratorConfig(products=2000, machines=80, molds=600, weeks=52, order_lines=100000, lots=250000),
+}
+DEFAULT_SIZES = ("xs", "s", "m")
+DEFAULT_REPEAT = 3
+# A stage whose time grows faster than records ** SUPERLINEAR between two
+# sizes is flagged; times below MIN_SECONDS are too noisy to judge.
+SUPERLINEAR = 1.2
+MIN_SECONDS = 0.01
+DEFAULT_THRESHOLD = 1.25
+GA_RUN = {"engine": "ga", "seed": 1, "population_size": 20, "generations": 20, "time_limit_sec": 600, "commit": False}
+DP_RUN = {"engine": "dp", "time_limit_sec": 600, "commit": False}
+TABU_RUN = {"engine": "tabu", "seed": 1, "iterations": 200, "neighborhood_size": 20, "time_limit_sec": 600, "commit": False}
+
+
+class Bench:
+    # Inputs of one ladder step. Stages time their own work; anything they
+    # depend on is built here once, untimed, on first use.
+    def __init__(self, payload: Dict[str, Any], workdir: Path) -> None:
+        self.body = json.dumps(payload).encode("utf-8")
+        self.workdir = workdir
+        self.runs = 0
+
+    @cached_property
+    def frame(self) -> ProblemFrame:
+        return load_problem_frame(json.loads(self.body))
+
+    @cached_property
+    def index(self) -> FrameIndex:
+        return build_frame_index(self.frame)
+
+    @cached_property
+    def timeline(self) -> CapacityTimeline:
+        return build_capacity_timeline(self.frame, self.index)
+
+    @cached_property
+    def repo(self) -> ProblemRepository:
+        return ProblemRepository(base_path=self.workdir / "repo")
+
+    @cached_property
+    def stored_id(self) -> str:
+        self.repo.save("stored", self.frame)
+        return "stored"
+
+    @cached_property
+    def client(self):
+        # Imported here: the app module builds its global manager on import.
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        return TestClient(app)
+
+    @cached_property
+    def api_id(self) -> str:
+        return self.client.post("/frame", content=self.body, headers={"content-type": "application/json"}).json()["id"]
+
+    def next_id(self) -> str:
+        self.runs += 1
+        return f"run_{self.runs}"
+
+
+def _api_post(bench: Bench) -> None:
+    resp = bench.client.post("/frame", content=bench.body, headers={"content-type": "application/json"})
+    resp.raise_for_status()
+
+
+def _api_get(bench: Bench) -> None:
+    bench.client.get(f"/frame/{bench.api_id}").raise_for_status()
+
+
+def _api_evaluate(bench: Bench) -> None:
+    bench.client.post(f"/frame/{bench.api_id}/evaluate").raise_for_status()
+
+
+STAGES: Dict[str, Callable[[Bench], Any]] = {
+    "ingest": lambda b: load_problem_frame(json.loads(b.body)),
+    "index": lambda b: build_frame_index(b.frame),
+    "validate": lambda b: validate_references(b.frame, b.index),
+    "timeline": lambda b: build_capacity_timeline(b.frame, b.index),
+    "evaluate": lambda b: evaluate_frame(b.frame, b.index, b.timeline),
+    "repo_save": lambda b: b.repo.save(b.next_id(), b.frame),
+    # Trusted load plus the state decode it defers.
+    "repo_load": lambda b: b.repo.load(b.stored_id).state,
+    "api_post": _api_post,
+    "api_get": _api_get,
+    "api_evaluate": _api_evaluate,
+    "optimize_ga": lambda b: optimize_frame(b.frame, dict(GA_RUN), b.index, timeline=b.timeline),
+    "optimize_tabu": lambda b: optimize_frame(b.frame, dict(TABU_RUN), b.index, timeline=b.timeline),
+    "optimize_dp": lambda b: optimize_frame(b.frame, dict(DP_RUN), b.index, timeline=b.timeline),
+}
+
+
+@contextmanager
+def isolated_api(workdir: Path) -> Iterator[None]:
+    # API stages must not write into the server's own store: the routes get a
+    # manager over a scratch repository for the duration of the run.
+    from app.api import routes
+
+    previous = routes.manager
+    repo = WriteBehindRepository(ProblemRepository(base_path=workdir / "api"))
+    routes.manager = FrameManager(repo)
+    try:
+        yield
+    finally:
+        repo.close()
+        routes.manager = previous
+
+
+def time_stage(fn: Callable[[Bench], Any], bench: Bench, repeat: int) -> Dict[str, Any]:
+    fn(bench)   # warm-up: lazy inputs, imports and caches are not timed
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn(bench)
+        times.append(time.perf_counter() - started)
+    return {"median_sec": statistics.median(times), "min_sec": min(times), "runs": times}
+
+
+def run_benchmarks(
+    sizes: Sequence[str] = DEFAULT_SIZES,
+    stages: Optional[Sequence[str]] = None,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = 0,
+    configs: Optional[Dict[str, GeneratorConfig]] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    configs = configs or SIZES
+    stages = list(stages or STAGES)
+    unknown = [name for name in sizes if name not in configs] + [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown sizes or stages: {unknown}")
+    results = []
+    api = any(stage.startswith("api_") for stage in stages)
+    with tempfile.TemporaryDirectory() as tmp, isolated_api(Path(tmp)) if api else nullcontext():
+        for size in sizes:
+            config = configs[size].model_copy(update={"seed": seed})
+            started = time.perf_counter()
+            payload = generate_problem_frame(config)
+            row = {
+                "size": size,
+                "config": config.model_dump(),
+                "records": frame_records(payload),
+                "generate_sec": time.perf_counter() - started,
+                "stages": {},
+            }
+            bench = Bench(payload, Path(tmp) / size)
+            for stage in stages:
+                row["stages"][stage] = time_stage(STAGES[stage], bench, repeat)
+                if log:
+                    log(f"{size:>4} {stage:<14} {row['stages'][stage]['median_sec']:10.4f}s")
+            results.append(row)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+        "scaling": scaling(results),
+    }
+
+
+def scaling(results: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    # Exponent k in time ~ records ** k between consecutive sizes.
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for small, large in zip(results, results[1:]):
+        growth = large["records"] / small["records"]
+        for stage, timing in large["stages"].items():
+            before = small["stages"].get(stage)
+            if before is None or growth <= 1 or before["median_sec"] <= 0:
+                continue
+            exponent = math.log(timing["median_sec"] / before["median_sec"]) / math.log(growth)
+            out.setdefault(stage, []).append({
+                "from": small["size"],
+                "to": large["size"],
+                "exponent": exponent,
+                "superlinear": exponent > SUPERLINEAR and timing["median_sec"] >= MIN_SECONDS,
+            })
+    return out
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_seconds: float = MIN_SECONDS,
+) -> Dict[str, Any]:
+    # Stage times of sizes present in both runs; a regression is a median
+    # slower by more than `threshold` x, ignoring times below min_seconds.
+    before = {(row["size"], stage): t for row in baseline["results"] for stage, t in row["stages"].items()}
+    rows, regressions = [], []
+    for row in current["results"]:
+        for stage, timing in row["stages"].items():
+            old = before.get((row["size"], stage))
+            if old is None:
+                continue
+            ratio = timing["median_sec"] / old["median_sec"] if old["median_sec"] > 0 else math.inf
+            entry = {
+                "size": row["size"],
+                "stage": stage,
+                "baseline_sec": old["median_sec"],
+                "current_sec": timing["median_sec"],
+                "ratio": ratio,
+            }
+            entry["regression"] = ratio > threshold and timing["median_sec"] >= min_seconds
+            rows.append(entry)
+            if entry["regression"]:
+                regressions.append(entry)
+    return {"threshold": threshold, "compared": rows, "regressions": regressions}
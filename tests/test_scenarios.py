@@ -5,11 +5,16 @@ TR: API ve veri modeli icin ornek senaryo testlerini calistirir.
 EN: Runs sample scenario tests for the API and data model.
 """
 
+import csv
+import io
 import json
+import pickle
 import sys
 import tempfile
+import time
 from pathlib import Path
 
+import numpy as np
 from fastapi.testclient import TestClient
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -17,9 +22,40 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
 from app.frame.ingest.problem_adapter import load_problem_frame
+from app.frame.ingest.stream_ingest import IngestError, StreamingFrameBuilder, iter_json_array, load_problem_frame_stream
 from app.main import app
 from app.frame.repositories.problem_repo import ProblemRepository
-from app.evaluation.problem_validator import validate_references
+from app.frame.repositories.state_codec import decode_state, encode_state
+from app.frame.repositories.write_behind import WriteBehindRepository
+from app.evaluation.constraints import ConstraintKernel, compile_constraints
+from app.evaluation.evaluator import evaluate_frame
+from app.evaluation.fitness_cache import FitnessCache
+from app.evaluation.kpi import compute_kpis
+from app.evaluation.objective import evaluate_population
+from app.evaluation.problem_validator import validate_batch, validate_references
+from app.frame.compiled.bom import build_routing, explode, material_requirements
+from app.frame.compiled.capacity import build_capacity_timeline
+from app.frame.compiled.compatibility import members
+from app.frame.compiled.planning_model import build_planning_model
+from app.optimization.config import OptimizeConfig
+from app.optimization.control import SearchControl
+from app.optimization.genetic import pull_earlier
+from app.optimization.islands import run_islands
+from app.optimization.jobs import JobManager, OptimizationJob
+from app.optimization.lot_sizing import lot_sizing_plans, wagner_whitin
+from app.optimization.optimizer import parse_config
+from app.optimization.sweep import MAX_SWEEP_WORKERS, variant_budget
+from app.optimization.tabu import TabuSearch
+from app.frame.compiled.frame_index import MISSING, build_frame_index
+from app.frame.models import problem as problem_models
+from app.frame.models.plan_table import PlanItem, PlanResource, PlanTable
+from app.frame.models.problem import State
+from app.frame.services.frame_manager import FrameManager
+from app.frame.services.requirements import step_quantities
+from app.frame.services.state_patch import StatePatch
+from app.telemetry import OPTIMIZER_ITERATIONS, Histogram
+from benchmarks.generator import GeneratorConfig, generate_problem_frame
+from benchmarks.harness import compare, run_benchmarks
 
 
 DATA_DIR = Path(__file__).parent / "data"
@@ -182,6 +218,1078 @@ def scenario_repository_save_load() -> None:
             raise AssertionError("Repository load mismatch on problem_code")
 
 
+def scenario_repository_state_versions() -> None:
+    # TR: Ana verinin icerik ozetiyle bir kez saklandigini ve state'lerin eklemeli surumlendigini test eder.
+    # EN: Tests master data is stored once by content hash and states are appended as versions.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    frame = load_problem_frame(payload)
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = ProblemRepository(base_path=tmp)
+        repo.save("A", frame)
+        repo.save("B", frame)
+        if len(list(Path(tmp, "blobs").glob("*.json"))) != 2:
+            raise AssertionError("Identical problemData/scenarioConfig should be stored once")
+        blob_times = [p.stat().st_mtime_ns for p in Path(tmp, "blobs").iterdir()]
+        if repo.save_state("A", State()) != 2 or repo.save_state("A", frame.state) != 3:
+            raise AssertionError("Expected consecutive state versions")
+        if [p.stat().st_mtime_ns for p in Path(tmp, "blobs").iterdir()] != blob_times:
+            raise AssertionError("State updates must not rewrite master data")
+        versions = repo.list_states("A")
+        if [v["version"] for v in versions] != [1, 2, 3] or not versions[-1]["head"] or versions[1]["lots"] != 0:
+            raise AssertionError(f"Unexpected versions: {versions}")
+        if repo.load("A").state != frame.state or repo.load_state("A", 2) != State():
+            raise AssertionError("Expected head and prior versions to load")
+        for path in Path(tmp, "states", "A").glob("00000002.*"):
+            path.unlink()
+        if repo.list_states("A") != versions:
+            raise AssertionError("Version summaries should come from the manifest, not the state files")
+        Path(tmp, "LEGACY.json").write_text(json.dumps(frame.model_dump(mode="json")), encoding="utf-8")
+        repo = ProblemRepository(base_path=tmp)
+        if repo.load("LEGACY") is None or not repo.exists("LEGACY"):
+            raise AssertionError("Old single-file frames should still load")
+    pid = _post_frame(payload)
+    # Without a flush the write-behind store would coalesce both into one version.
+    API_CLIENT.post("/persistence/flush")
+    API_CLIENT.post(f"/frame/{pid}/state", json={"meta": {"iteration": 9}})
+    listed = API_CLIENT.get(f"/frame/{pid}/states").json()["versions"]
+    if [v["iteration"] for v in listed][-1] != 9 or len(listed) != 2:
+        raise AssertionError(f"Unexpected GET /frame/{{id}}/states: {listed}")
+    first = API_CLIENT.get(f"/frame/{pid}/states/1")
+    if first.status_code != 200 or len(first.json()["lots"]) != len(frame.state.lots):
+        raise AssertionError(f"Unexpected GET /frame/{{id}}/states/1: {first.text}")
+    if API_CLIENT.get(f"/frame/{pid}/states/99").status_code != 404:
+        raise AssertionError("Expected 404 for a missing state version")
+
+
+def scenario_trusted_lazy_load() -> None:
+    # TR: State'in npz ikili ikizinden yeniden dogrulamasiz ve ilk eriste cozuldugunu, pickle dosyalarinin okunmadigini test eder.
+    # EN: Tests the state decodes from its npz binary twin without revalidation on first access and pickle files are never read.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    frame = load_problem_frame(payload)
+    with tempfile.TemporaryDirectory() as tmp:
+        ProblemRepository(base_path=tmp).save("A", frame)
+        repo = ProblemRepository(base_path=tmp)
+        loaded = repo.load("A")
+        if loaded.state_loaded or loaded.problemData != frame.problemData:
+            raise AssertionError("Trusted load should defer the state")
+        manager = FrameManager(repo)
+        if manager.get("A").state_loaded:
+            raise AssertionError("FrameManager.get should not decode the state")
+        original = State.model_validate
+        State.model_validate = classmethod(lambda cls, *a, **k: (_ for _ in ()).throw(AssertionError()))
+        try:
+            state = loaded.state
+        finally:
+            State.model_validate = original
+        if state != frame.state or not loaded.state_loaded:
+            raise AssertionError("State should decode from the binary twin on first access")
+        if loaded.model_dump(mode="json") != frame.model_dump(mode="json"):
+            raise AssertionError("A lazily loaded frame should serialize like the original")
+        checked = repo.load("A", trusted=False)
+        if not checked.state_loaded or checked.state != frame.state:
+            raise AssertionError("Untrusted load should validate everything eagerly")
+        binaries = list(Path(tmp).rglob("*.bin"))
+        if [b.parent.name for b in binaries] != ["A"]:
+            raise AssertionError(f"Only states should have a binary twin: {binaries}")
+        with np.load(binaries[0], allow_pickle=False) as arrays:
+            if "lots.qty" not in arrays:
+                raise AssertionError("Expected the state columns in the npz twin")
+        # A pickle (e.g. from an older release) in place of the twin is never unpickled.
+        binaries[0].write_bytes(pickle.dumps((2, {"meta": None}), protocol=pickle.HIGHEST_PROTOCOL))
+        if repo.load_state("A", 1) != frame.state:
+            raise AssertionError("A non-npz binary twin should fall back to JSON")
+        binaries[0].unlink()
+        if repo.load("A").model_dump(mode="json") != frame.model_dump(mode="json"):
+            raise AssertionError("Missing binary files should fall back to JSON")
+    if API_CLIENT.get("/openapi.json").status_code != 200:
+        raise AssertionError("Expected the OpenAPI schema to build")
+
+
+def scenario_write_behind_repository() -> None:
+    # TR: Arka plan yazicinin kayitlari birlestirdigini, atomik yazdigini ve flush ile diske indirdigini test eder.
+    # EN: Tests the write-behind writer coalesces saves, writes atomically and lands everything on flush.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    frame = load_problem_frame(payload)
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = WriteBehindRepository(ProblemRepository(base_path=tmp), coalesce_sec=0.2)
+        manager = FrameManager(repo)
+        pid = manager.save(frame)
+        if not repo.exists(pid) or Path(tmp, "frames", f"{pid}.json").exists():
+            raise AssertionError("Save should be queued, not written on the request thread")
+        for i in range(5):
+            manager.update_state(pid, State(meta={"iteration": i}))
+        if repo.queue_depth() != 1 or repo.load(pid).state.meta.iteration != 4:
+            raise AssertionError("Pending saves of one id should coalesce and stay readable")
+        if not manager.flush(timeout=10) or repo.queue_depth() != 0:
+            raise AssertionError("Expected flush to drain the queue")
+        stats = repo.stats()
+        versions = ProblemRepository(base_path=tmp).list_states(pid)
+        if stats["writes"] != 1 or stats["coalesced"] != 5 or stats["errors"] or len(versions) != 1:
+            raise AssertionError(f"Unexpected writer stats {stats} / versions {versions}")
+        manager.update_state(pid, State())
+        if [v["lots"] for v in manager.states(pid)] != [0, 0] or list(Path(tmp).rglob("*.tmp")):
+            raise AssertionError("Expected a second version and no leftover temp files")
+        repo.close(timeout=10)
+
+        class FlakyRepository(ProblemRepository):
+            failures = 2
+
+            def save_state(self, problem_id: str, state: State) -> int:
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError("disk full")
+                return super().save_state(problem_id, state)
+
+        flaky = FlakyRepository(base_path=tmp)
+        repo = WriteBehindRepository(flaky, coalesce_sec=0.0)
+        repo.save_state(pid, State(meta={"iteration": 7}))
+        if not repo.flush(timeout=10) or repo.stats()["errors"] or flaky.list_states(pid)[-1]["iteration"] != 7:
+            raise AssertionError("A transient write failure should be retried")
+        flaky.failures = 10
+        repo.save_state(pid, State())
+        if repo.flush(timeout=10) or repo.stats()["errors"] != 1:
+            raise AssertionError("flush() must report a write that failed for good")
+        repo.close(timeout=10)
+    flushed = API_CLIENT.post("/persistence/flush").json()
+    if not flushed["flushed"] or flushed["queue_depth"] != 0:
+        raise AssertionError(f"Unexpected POST /persistence/flush: {flushed}")
+
+
+def scenario_stream_ingest() -> None:
+    # TR: Buyuk dizilerin CSV/NDJSON/JSON yan dosyalardan parca parca alindigini ve hatalarin erken raporlandigini test eder.
+    # EN: Tests the big arrays are ingested in chunks from CSV/NDJSON/JSON side files and errors are reported early.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    data, state = payload["problemData"], payload["state"]
+    weeks = [bucket["id"] for bucket in data["time_buckets"]]
+    lines = [{"product_code": "P1", "week": weeks[i % len(weeks)], "qty": float(i)} for i in range(500)]
+    skeleton = json.loads(json.dumps(payload))
+    skeleton["problemData"]["orders"] = []
+    skeleton["problemData"]["stocks"] = []
+    skeleton["state"] = {"meta": state["meta"], "inventory": state["lots"]}
+
+    stocks_text = json.dumps(data["stocks"] * 3, indent=2)
+    if list(iter_json_array(io.StringIO(stocks_text), read_chars=7)) != data["stocks"] * 3:
+        raise AssertionError("Chunked JSON array reader should match json.loads")
+    with tempfile.TemporaryDirectory() as tmp:
+        orders_csv = Path(tmp, "orders.csv")
+        with orders_csv.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=["product_code", "week", "qty"])
+            writer.writeheader()
+            writer.writerows(lines)
+        plan_ndjson = Path(tmp, "plan.ndjson")
+        plan_ndjson.write_text("\n".join(json.dumps(lot) for lot in state["plan"]), encoding="utf-8")
+        stocks_json = Path(tmp, "stocks.json")
+        stocks_json.write_text(json.dumps(data["stocks"]), encoding="utf-8")
+        frame = load_problem_frame_stream(
+            skeleton,
+            {"orders": orders_csv, "state.plan": plan_ndjson, "stocks": stocks_json},
+            chunk_size=64,
+        )
+    group = frame.problemData.orders[0]
+    if len(frame.problemData.orders) != 1 or [o.qty for o in group.orders] != [float(i) for i in range(500)]:
+        raise AssertionError("Order lines should be grouped per product in feed order")
+    if len(frame.state.lots) != len(state["plan"]) or len(frame.problemData.stocks) != len(data["stocks"]):
+        raise AssertionError("Expected plan and stock feeds in the frame")
+    if len({id(o.week) for o in group.orders}) > len(weeks):
+        raise AssertionError("Repeated codes should be interned")
+
+    consumed = []
+
+    def bad_feed():
+        for i in range(1000):
+            consumed.append(i)
+            yield {"product_code": "NOPE", "week": weeks[0], "qty": "x" if i == 3 else 1}
+
+    builder = StreamingFrameBuilder(skeleton, chunk_size=10, max_errors=5)
+    try:
+        builder.extend("orders", bad_feed())
+        raise AssertionError("Expected IngestError")
+    except IngestError as exc:
+        if len(consumed) > 10 or exc.errors[0]["row"] != 3 or exc.errors[0]["code"] != "INVALID":
+            raise AssertionError(f"Errors should surface in the first chunk: {len(consumed)} {exc.errors[:2]}")
+
+    body = "\n".join(
+        [json.dumps(skeleton)]
+        + [json.dumps({"section": "orders", "record": line}) for line in lines[:50]]
+        + [json.dumps({"section": "state.plan", "record": lot}) for lot in state["plan"]]
+    )
+    res = API_CLIENT.post("/frame/ingest?chunk_size=16", content=body.encode("utf-8"))
+    if res.status_code != 200 or res.json()["rows"]["orders"] != 50:
+        raise AssertionError(f"Unexpected POST /frame/ingest: {res.status_code} {res.text[:300]}")
+    stored = API_CLIENT.get(f"/frame/{res.json()['id']}").json()
+    if len(stored["problemData"]["orders"][0]["orders"]) != 50 or len(stored["state"]["lots"]) != len(state["plan"]):
+        raise AssertionError("Ingested frame should hold the streamed records")
+    bad = body + "\n" + json.dumps({"section": "orders", "record": {"product_code": "P1", "week": "NOPE", "qty": 1}})
+    res = API_CLIENT.post("/frame/ingest", content=bad.encode("utf-8"))
+    if res.status_code != 400 or res.json()["detail"]["errors"][0]["code"] != "UNKNOWN_TIME_BUCKET":
+        raise AssertionError(f"Expected structured ingest errors: {res.text[:300]}")
+
+
+def scenario_api_frames_batch() -> None:
+    # TR: Toplu cerceve olusturmada paralel dogrulamayi, kare bazli hatalari ve tek seferde kaydi test eder.
+    # EN: Tests bulk frame creation: parallel validation, per-frame errors and one batched save.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    bad = deep_copy(payload)
+    bad["problemData"]["products"][0]["process_data"][0]["process_code"] = "AP999"
+    frames = [payload] * 9 + [bad]
+    resp = API_CLIENT.post("/frames/batch?workers=1000", json=frames)
+    body = resp.json()
+    if resp.status_code != 200 or body["saved"] != 9 or body["failed"] != 1:
+        raise AssertionError(f"POST /frames/batch failed: {resp.text}")
+    ids = [item.get("id") for item in body["frames"]]
+    if len(set(ids[:9])) != 9 or ids[9] is not None or "AP999" not in body["frames"][9]["error"]:
+        raise AssertionError(f"Expected distinct ids and the invalid frame's error: {body['frames']}")
+    if API_CLIENT.get(f"/frame/{ids[4]}").status_code != 200:
+        raise AssertionError("Batched frames should be readable")
+    lines = "\n".join([json.dumps(payload), "{not json", json.dumps(bad)])
+    resp = API_CLIENT.post(
+        "/frames/batch?atomic=true", content=lines, headers={"content-type": "application/x-ndjson"}
+    )
+    body = resp.json()
+    if resp.status_code != 200 or body["saved"] != 0 or [i for i, f in enumerate(body["frames"]) if "id" in f]:
+        raise AssertionError(f"An atomic batch with invalid frames should save nothing: {resp.text}")
+    for content in ("{}", "[]", "[1"):
+        if API_CLIENT.post("/frames/batch", content=content).status_code != 400:
+            raise AssertionError(f"Expected 400 for batch body {content!r}")
+    frame = load_problem_frame(payload)
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = ProblemRepository(base_path=tmp)
+        repo.save_many({f"B{i}": frame for i in range(5)})
+        blobs = [p for p in Path(tmp).rglob("*.json") if p.parent.name == "blobs"]
+        if not all(repo.exists(f"B{i}") for i in range(5)) or len(blobs) != 2:
+            raise AssertionError(f"Shared master data should be stored once: {len(blobs)} blobs")
+
+
+def scenario_plan_table_columns() -> None:
+    # TR: State.lots'un sutun bazli PlanTable olarak tutuldugunu ve PlanItem'a birebir geri dondugunu test eder.
+    # EN: Tests State.lots is held as a columnar PlanTable and round-trips to PlanItem exactly.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    lot = payload["state"]["plan"][0]
+    records = [
+        dict(lot, lot_id="A", resources=[{"type": "machine", "id": 12}, {"type": "mold", "id": "M1"}]),
+        dict(lot, lot_id=None, week=None, setup_start_time=None, resources=[]),
+        dict(lot, lot_id="C", product_code="P2", resources=[{"type": "machine", "id": "12"}]),
+    ]
+    state = State.model_validate({"plan": records})
+    if not isinstance(state.lots, PlanTable) or state.lots is not state.plan or len(state.lots) != 3:
+        raise AssertionError("Expected a columnar PlanTable shared by lots and plan")
+    dumped = state.model_dump(mode="json")["lots"]
+    expected = [PlanItem.model_validate(r).model_dump(mode="json") for r in records]
+    if dumped != expected or state.lots[2] != PlanItem.model_validate(records[2]):
+        raise AssertionError(f"PlanTable should serialize like PlanItem: {dumped}")
+    if state.lots.machine.tolist() != [0, -1, 2] or state.lots.mold.tolist() != [1, -1, -1]:
+        raise AssertionError("Expected machine/mold columns; 12 and '12' stay distinct ids")
+    joined = PlanTable.concat([PlanTable.from_records(records[2:]), state.lots])
+    if joined.to_records() != state.lots.to_records()[2:] + state.lots.to_records():
+        raise AssertionError("concat should remap code pools")
+    try:
+        State.model_validate({"lots": records + [{"product_code": "P1"}]})
+        raise AssertionError("Expected invalid lots to be rejected")
+    except ValueError as exc:
+        if "3.process_code" not in str(exc):
+            raise AssertionError(f"Validation errors should name the lot row: {exc}")
+    frame = load_problem_frame(payload)
+    index = build_frame_index(frame)
+    if index.lot_machine.tolist() != [index.machines.get("12")] or index.lot_qty.tolist() != [4800.0]:
+        raise AssertionError("FrameIndex should read the plan columns directly")
+    aware = dict(lot, setup_start_time="2023-10-10T12:00:00+03:00", setup_end_time="2023-10-10T09:30:00Z")
+    table = State.model_validate({"plan": [aware, lot]}).lots
+    times = [(r["setup_start_time"], r["setup_end_time"]) for r in table.to_records(mode="json")]
+    if times != [("2023-10-10T12:00:00+03:00", "2023-10-10T09:30:00+00:00"), (lot["setup_start_time"], lot["setup_end_time"])]:
+        raise AssertionError(f"Timestamps should keep their UTC offset, naive ones stay naive: {times}")
+    if decode_state(encode_state(State(lots=table))).lots != table or table.time("setup_start_time")[0] != table.time("setup_end_time")[0] - 1800:
+        raise AssertionError("The offset should survive the binary codec and epochs stay UTC")
+    if problem_models.PlanItem is not PlanItem or problem_models.PlanResource is not PlanResource:
+        raise AssertionError("PlanItem / PlanResource should still be importable from app.frame.models.problem")
+
+
+def scenario_frame_index_interning() -> None:
+    # TR: FrameIndex kodlari tamsayiya cevirir ve dizileri dogru derler.
+    # EN: Checks FrameIndex interns codes and compiles arrays correctly.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    payload["state"]["plan"][0]["resources"].append({"type": "mold", "id": "KLP_X"})
+    frame = load_problem_frame(payload)
+    index = build_frame_index(frame)
+    if (index.n_products, index.n_weeks, index.n_machines, index.n_molds) != (1, 1, 1, 1):
+        raise AssertionError(f"Unexpected index sizes: {index}")
+    if index.demand.tolist() != [[30000.0]] or index.initial_stock.tolist() != [5000.0]:
+        raise AssertionError("Demand/stock arrays mismatch")
+    if index.lot_machine.tolist() != [0] or index.lot_week.tolist() != [0]:
+        raise AssertionError("Lot arrays mismatch")
+    if index.molds.is_known(index.res_ref[index.res_kind == 1]).tolist() != [False]:
+        raise AssertionError("Expected referenced-only mold to be flagged unknown")
+    if index.machines.get("M01") < index.n_machines or index.machines.get("NOPE") != MISSING:
+        raise AssertionError("Compatibility machine should be interned after known machines")
+
+
+def scenario_compatibility_index() -> None:
+    # TR: Uyumluluk bit kumelerinin cift tablolari ile kalip listelerini birlestirdigini ve opsiyonlara yansidigini test eder.
+    # EN: Tests the compatibility bitsets merge the pair tables with the mold lists and feed the options.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    index = build_frame_index(load_problem_frame(payload))
+    compat = index.compat
+    machine, process = index.machines.get(12), index.processes.get("AP300")
+    mold, product = index.molds.get("KLP_P1_01"), index.products.get("P1")
+    # Mold-level compatible_machines_id [12, 3]: 12 is the press, 3 matches no machine.
+    if compat.pair_allowed([machine, machine], [mold, index.molds.get("KLP_P1_02")], process).tolist() != [True, False]:
+        raise AssertionError("Expected mold-level machine list merged into the pair bitsets")
+    if members(compat.machines_for_mold(mold, process), compat.n_machines).tolist() != [machine]:
+        raise AssertionError("machines_for_mold mismatch")
+    if members(compat.molds_for_machine(machine, process), compat.n_molds).tolist() != [mold]:
+        raise AssertionError("molds_for_machine mismatch")
+    if compat.mold_allowed(product, process, [mold, MISSING]).tolist() != [True, False]:
+        raise AssertionError("mold_allowed mismatch")
+    if compat.product_processes(product).tolist() != [process]:
+        raise AssertionError("product_processes mismatch")
+    model = build_planning_model(index)
+    if (int(model.opt_machine[0, 0]), int(model.opt_mold[0, 0])) != (machine, mold):
+        raise AssertionError("Expected (press, KLP_P1_01) as the first option")
+
+    payload = deep_copy(payload)
+    del payload["problemData"]["compatibility"]
+    for entry in payload["problemData"]["resources"]["mold"]:
+        entry.pop("compatible_machines_id")
+        entry.pop("supported_products_id")
+    compat = build_frame_index(load_problem_frame(payload)).compat
+    if compat.restricts_pairs or compat.restricts_products:
+        raise AssertionError("Expected no restriction without compatibility data")
+    if not compat.pair_allowed(machine, mold, process) or not compat.mold_allowed(product, process, mold):
+        raise AssertionError("Expected every combination allowed without compatibility data")
+
+    # supported_products_id [1, 23] names no product code, so with product_molds
+    # empty the mold stays unrestricted for the lot's product.
+    payload = deep_copy(load_json(DATA_DIR / "problemFrame.json"))
+    payload["problemData"]["compatibility"]["product_molds"] = []
+    payload["state"]["plan"][0]["resources"].append({"type": "mold", "id": "KLP_P1_01"})
+    frame = load_problem_frame(payload)
+    if build_frame_index(frame).compat.restricts_products:
+        raise AssertionError("Unresolved supported_products_id should not restrict products")
+    errors = validate_references(frame)
+    if errors:
+        raise AssertionError(f"Expected the mold allowed without product restrictions: {errors}")
+
+
+def scenario_frame_index_cache() -> None:
+    # TR: FrameManager indeksi bir kez derler ve state guncellemesinde dusurur.
+    # EN: FrameManager compiles the index once and drops it on state update.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    frame = load_problem_frame(payload)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = FrameManager(ProblemRepository(base_path=tmp))
+        pid = manager.save(frame)
+        first = manager.index(pid)
+        if manager.index(pid) is not first:
+            raise AssertionError("Expected cached FrameIndex")
+        manager.update_state(pid, State())
+        second = manager.index(pid)
+        if second is first or second.n_lots != 0:
+            raise AssertionError("Expected index rebuild after update_state")
+
+
+def scenario_frame_cache_bounds() -> None:
+    # TR: Cerceve onbelleginin giris/bayt butcesiyle LRU tahliye yaptigini ve id kontrolunun dosya okumadigini test eder.
+    # EN: Tests the frame cache evicts LRU entries by count/byte budget and id checks never read frame files.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = ProblemRepository(base_path=tmp)
+        manager = FrameManager(repo, cache_entries=2)
+        loads = []
+        original_load = repo.load
+        repo.load = lambda pid: loads.append(pid) or original_load(pid)
+        ids = [manager.save(load_problem_frame(payload)) for _ in range(3)]
+        if len(set(ids)) != 3 or loads:
+            raise AssertionError(f"Id collisions should not load frames: {ids}, loads={loads}")
+        stats = manager.cache_stats()
+        if stats["size"] != 2 or stats["evictions"] != 1 or stats["bytes"] <= 0:
+            raise AssertionError(f"Unexpected cache stats: {stats}")
+        if manager.get(ids[0]) is None or loads != [ids[0]] or manager.get(ids[0]) is None:
+            raise AssertionError(f"Evicted frame should reload once: {loads}")
+        if manager.cache_stats()["hits"] != 1 or manager.get("missing") is not None or len(loads) != 1:
+            raise AssertionError("Unknown ids should not hit the repository")
+        tight = FrameManager(ProblemRepository(base_path=tmp), cache_bytes=1)
+        for pid in ids:
+            tight.index(pid)
+        if tight.cache_stats()["size"] != 1:
+            raise AssertionError(f"Byte budget should keep only the newest frame: {tight.cache_stats()}")
+    if "frame_cache" not in API_CLIENT.get("/health").json():
+        raise AssertionError("Expected frame cache stats in /health")
+
+
+def scenario_batch_validation_cap() -> None:
+    # TR: Toplu dogrulamanin yapisal hata kayitlarini sinirladigini ve saydigini test eder.
+    # EN: Tests batch validation caps structured error records and counts per class.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    lot = payload["state"]["plan"][0]
+    payload["state"]["plan"] = [dict(lot, lot_id=f"L{i}", week="CW00_00") for i in range(50)]
+    frame = load_problem_frame(payload)
+    report = validate_batch(frame, max_errors=5)
+    if len(report.errors) != 5 or not report.truncated:
+        raise AssertionError(f"Expected 5 capped errors, got: {report.errors}")
+    if report.counts.get("plan.UNKNOWN_TIME_BUCKET") != 50:
+        raise AssertionError(f"Expected 50 time bucket errors, got: {report.counts}")
+    first = report.errors[0]
+    if (first["code"], first["entity"], first["id"], first["ref"]) != ("UNKNOWN_TIME_BUCKET", "plan", "L0", "CW00_00"):
+        raise AssertionError(f"Unexpected error record: {first}")
+    resp = API_CLIENT.post(f"/frame/{_get_frame_id()}/validate", params={"mode": "batch", "max_errors": 3})
+    if resp.status_code != 200 or resp.json().get("error_counts") != {}:
+        raise AssertionError(f"POST /frame/{{id}}/validate?mode=batch failed: {resp.text}")
+
+
+def _multi_week_payload() -> dict:
+    # TR: Iki urun, iki makine, iki kalip ve dort haftalik genisletilmis ornek.
+    # EN: Extended sample with two products, two machines, two molds and four weeks.
+    payload = load_json(DATA_DIR / "problemFrame.json")
+    data = payload["problemData"]
+    starts = ["2025-11-24", "2025-12-01", "2025-12-08", "2025-12-15"]
+    data["time_buckets"] = [{"id": f"CW{43 + i}_25", "index": i, "start_date": day} for i, day in enumerate(starts)]
+    p2 = deep_copy(data["products"][0])
+    p2["code"] = "P2"
+    data["products"].append(p2)
+    data["orders"] = [
+        {"product_code": "P1", "orders": [{"week": "CW43_25", "qty": 8000}, {"week": "CW44_25", "qty": 12000},
+                                          {"week": "CW46_25", "qty": 10000}]},
+        {"product_code": "P2", "orders": [{"week": "CW44_25", "qty": 6000}, {"week": "CW45_25", "qty": 9000}]},
+    ]
+    data["resources"]["machine"].append({"id": 13, "name": "Pres 2", "process_code": "AP300"})
+    mold2 = deep_copy(data["resources"]["mold"][0])
+    mold2.update({"id": 4, "code": "KLP_P1_02", "name": "P1 Kalıp 2"})
+    data["resources"]["mold"].append(mold2)
+    data["compatibility"]["machine_mold_pairs"] = [
+        {"machine_id": 12, "mold_code": "KLP_P1_01", "process_code": "AP300"},
+        {"machine_id": 12, "mold_code": "KLP_P1_02", "process_code": "AP300"},
+        {"machine_id": 13, "mold_code": "KLP_P1_02", "process_code": "AP300"},
+    ]
+    data["compatibility"]["product_molds"].append(
+        {"product_code": "P2", "process_code": "AP300", "allowed_molds": ["KLP_P1_02"]}
+    )
+    return payload
+
+
+def _post_frame(payload: dict) -> str:
+    resp = API_CLIENT.post("/frame", json=payload)
+    if resp.status_code != 200:
+        raise AssertionError(f"POST /frame failed: {resp.text}")
+    return resp.json()["id"]
+
+
+def scenario_api_optimize_ga() -> None:
+    # TR: GA motorunun tohumla tekrarlanabilir gecerli bir State yazdigini test eder.
+    # EN: Tests the GA engine writes back a valid, seed-reproducible State.
+    pid = _post_frame(load_json(DATA_DIR / "problemFrame.json"))
+    body = {"engine": "ga", "seed": 7, "population_size": 12, "generations": 15, "time_limit_sec": 5}
+    first = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json=body)
+    second = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json=body)
+    if first.status_code != 200 or second.status_code != 200:
+        raise AssertionError(f"POST /frame/{{id}}/optimize failed: {first.text}")
+    if first.json()["objective"] != second.json()["objective"]:
+        raise AssertionError("Expected identical objective for identical seed")
+    state = API_CLIENT.get(f"/frame/{pid}").json()["state"]
+    if not state["lots"] or state["lots"][0]["product_code"] != "P1":
+        raise AssertionError(f"Expected optimized lots in stored state, got: {state}")
+    valid = API_CLIENT.post(f"/frame/{pid}/validate").json()
+    if not valid["valid"]:
+        raise AssertionError(f"Optimized state failed validation: {valid}")
+    bad = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"population_size": 1})
+    if bad.status_code != 400:
+        raise AssertionError(f"Expected 400 for invalid optimize payload, got: {bad.status_code}")
+
+
+def scenario_tabu_delta_consistency() -> None:
+    # TR: Tabu motorunun artimsal amac degerinin tam degerlendirmeyle ayni kaldigini test eder.
+    # EN: Tests that the tabu engine's incremental objective matches a full re-evaluation.
+    frame = load_problem_frame(_multi_week_payload())
+    model = build_planning_model(build_frame_index(frame))
+    config = OptimizeConfig(engine="tabu", seed=3, neighborhood_size=8)
+    search = TabuSearch(model, config, np.random.default_rng(3))
+    start = search.current
+    search.run(300, time.perf_counter() + 10)
+    full = evaluate_population(model, search.qty[None], search.option[None], search.priority[None], config.weights)
+    if abs(float(full["objective"][0]) - search.current) > 1e-6 * max(1.0, abs(search.current)):
+        raise AssertionError(f"Delta objective drifted: {search.current} vs {full['objective'][0]}")
+    if search.best_value > start:
+        raise AssertionError("Tabu best should never be worse than the start plan")
+    pid = _post_frame(_multi_week_payload())
+    resp = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"engine": "tabu", "seed": 1, "iterations": 200})
+    if resp.status_code != 200 or not API_CLIENT.post(f"/frame/{pid}/validate").json()["valid"]:
+        raise AssertionError(f"Tabu optimize failed: {resp.text}")
+
+
+def scenario_ga_pull_mutation() -> None:
+    # TR: Ardisik kovalar birlikte secildiginde one cekme mutasyonunun toplam miktari korudugunu test eder.
+    # EN: Tests the pull mutation keeps the total quantity when adjacent buckets are picked together.
+    rng = np.random.default_rng(3)
+    T = 6
+    for _ in range(200):
+        qty = rng.integers(0, 100, (4, 3, T)).astype(np.float64).reshape(-1)
+        total = qty.sum()
+        pull_earlier(qty, rng.integers(0, qty.size, 30), T)
+        if qty.sum() != total:
+            raise AssertionError(f"Pull mutation changed total quantity: {total} -> {qty.sum()}")
+    qty = np.array([0.0, 10.0, 20.0, 30.0])
+    pull_earlier(qty, np.array([1, 2, 3, 3]), 4)
+    if qty.tolist() != [10.0, 0.0, 20.0, 30.0]:
+        raise AssertionError(f"Unexpected pull result: {qty.tolist()}")
+
+
+def scenario_lot_sizing() -> None:
+    # TR: Wagner-Whitin DP'nin, kapasite onariminin, "dp" motorunun ve sicak baslangicin sonuclarini test eder.
+    # EN: Tests the Wagner-Whitin DP, the capacity repair, the "dp" engine and the GA warm start.
+    net = np.array([[10.0, 10.0, 10.0, 10.0], [0.0, 100.0, 0.0, 100.0]])
+    qty = wagner_whitin(net, setup_cost=50.0, holding_cost=1.0)
+    if qty.tolist() != [[40.0, 0.0, 0.0, 0.0], [0.0, 100.0, 0.0, 100.0]]:
+        raise AssertionError(f"Unexpected Wagner-Whitin lots: {qty.tolist()}")
+    if wagner_whitin(net, setup_cost=5.0, holding_cost=1.0).tolist() != net.tolist():
+        raise AssertionError("Cheap setups should give lot-for-lot")
+
+    frame = load_problem_frame(generate_problem_frame(GeneratorConfig(products=20, weeks=6, order_lines=60, lots=0)))
+    index = build_frame_index(frame)
+    model = build_planning_model(index, build_capacity_timeline(frame, index))
+    config = OptimizeConfig()
+    plans = lot_sizing_plans(model, config.weights)
+    net = np.rint(model.lot_for_lot()).sum(axis=1)
+    if any(not np.allclose(plan.qty.sum(axis=1), net) for plan in plans):
+        raise AssertionError("Lot sizing must produce exactly the net requirement per product")
+    base = np.rint(model.lot_for_lot())
+    lot_for_lot = evaluate_population(model, base[None], np.zeros((1,) + base.shape, dtype=np.int32),
+                                      plans[0].priority[None], config.weights)["objective"][0]
+    scores = [evaluate_population(model, *plan.stacked(), config.weights)["objective"][0] for plan in plans]
+    if min(scores) > lot_for_lot:
+        raise AssertionError(f"DP plans should not lose to lot-for-lot: {scores} vs {lot_for_lot}")
+
+    pid = _post_frame(_multi_week_payload())
+    resp = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"engine": "dp", "commit": True})
+    if resp.status_code != 200 or resp.json()["iterations"] != 1 or "variant" not in resp.json()["lot_sizing"]:
+        raise AssertionError(f"dp optimize failed: {resp.text}")
+    if not API_CLIENT.post(f"/frame/{pid}/validate").json()["valid"]:
+        raise AssertionError("dp state failed validation")
+    state = API_CLIENT.get(f"/frame/{pid}").json()["state"]
+    if not state["lots"] or not state["inventory"]:
+        raise AssertionError(f"Expected lots and inventory rows from dp, got: {state}")
+    body = {"engine": "ga", "seed": 2, "population_size": 8, "generations": 3, "commit": False}
+    warm = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json=body).json()
+    if warm["objective"] > resp.json()["objective"] + 1e-6:
+        raise AssertionError("A warm-started GA must keep the DP plan as its floor")
+
+
+def scenario_bom_requirements() -> None:
+    # TR: Rota derlemesini, cok seviyeli patlatmayi, stok netlemesini ve /requirements endpoint'ini test eder.
+    # EN: Tests routing compilation, multi-level explosion, stock netting and the /requirements endpoint.
+    payload = generate_problem_frame(GeneratorConfig(products=3, steps=3, weeks=4, order_lines=30, lots=0))
+    payload["problemData"]["stocks"] = [{"product_code": "P00000_S2", "warehouse": "wip", "qty": 100.0}]
+    frame = load_problem_frame(payload)
+    index = build_frame_index(frame)
+    routing = build_routing(frame, index)
+    demand = index.demand
+    steps = step_quantities(routing, np.stack([demand, 2 * demand]))
+    rows = np.flatnonzero(index.step_product == 0)
+    expected = [demand[0] / 0.98 ** 2, demand[0] / 0.98, demand[0]]
+    if not np.allclose(steps[0, rows], expected) or not np.allclose(steps[1, rows], 2 * np.array(expected)):
+        raise AssertionError(f"Unexpected upstream step quantities: {steps[0, rows]}")
+    gross, net = material_requirements(routing, demand)
+    s1, s2 = routing.materials.get("P00000_S1"), routing.materials.get("P00000_S2")
+    if not np.isclose(net[s2].sum(), gross[s2].sum() - 100.0) or not np.isclose(net[s1].sum(), net[s2].sum() / 0.98):
+        raise AssertionError("Intermediate stock should be netted before exploding further down")
+    if not np.allclose(explode(routing, demand)[0], gross[0]):
+        raise AssertionError("Products carry their own requirement")
+
+    pid = _post_frame(load_json(DATA_DIR / "problemFrame.json"))
+    resp = API_CLIENT.get(f"/frame/{pid}/requirements", params={"kind": "purchased"})
+    rows = resp.json().get("materials", [])
+    if resp.status_code != 200 or [row["material"] for row in rows] != ["BH114"]:
+        raise AssertionError(f"GET /frame/{{id}}/requirements failed: {resp.text}")
+    # 25 per unit with 1% scrap at 97% yield, for 30000 ordered minus 5000 in stock.
+    if abs(rows[0]["total_net"] - 25000 * 25 * 1.01 / 0.97) > 1e-6:
+        raise AssertionError(f"Unexpected purchased requirement: {rows[0]}")
+    plan = API_CLIENT.get(f"/frame/{pid}/requirements", params={"source": "plan"})
+    if plan.status_code != 200 or API_CLIENT.get("/frame/missing/requirements").status_code != 404:
+        raise AssertionError(f"Plan-based requirements failed: {plan.text}")
+
+
+def scenario_api_optimize_islands() -> None:
+    # TR: Ada modelinin surec havuzunda calistigini ve ada bazli ilerleme dondugunu test eder.
+    # EN: Tests the island model runs in a process pool and reports per-island progress.
+    pid = _post_frame(_multi_week_payload())
+    body = {
+        "seed": 5, "workers": 2, "population_size": 6, "generations": 4,
+        "migration_interval": 2, "time_limit_sec": 60, "commit": False,
+    }
+    resp = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json=body)
+    if resp.status_code != 200:
+        raise AssertionError(f"POST /frame/{{id}}/optimize (islands) failed: {resp.text}")
+    islands = resp.json().get("islands", [])
+    if len(islands) != 2 or any(len(island["epochs"]) != 2 for island in islands):
+        raise AssertionError(f"Expected 2 islands x 2 epochs, got: {islands}")
+    best = min(island["best_objective"] for island in islands)
+    if abs(best - resp.json()["objective"]) > 1e-6:
+        raise AssertionError("Reported objective should be the best island objective")
+
+
+def scenario_fitness_cache() -> None:
+    # TR: Onbellegin kanonik plan ozetiyle isabet ettigini, LRU tahliyesini ve sonuclarin birebir ayni kaldigini test eder.
+    # EN: Tests canonical-key cache hits, LRU eviction and results identical to a direct evaluation.
+    model = build_planning_model(build_frame_index(load_problem_frame(_multi_week_payload())))
+    rng = np.random.default_rng(0)
+    shape = (6,) + model.shape
+    qty = np.rint(rng.uniform(0, 2, shape)) * 1000
+    option = (rng.random(shape) * model.n_options[:, None]).astype(np.int32)
+    priority = rng.random(shape)
+    weights = OptimizeConfig().weights
+    cache = FitnessCache(max_entries=4)
+    direct = evaluate_population(model, qty, option, priority, weights)
+    cached = cache.evaluate(model, qty, option, priority, weights)
+    if any(not np.allclose(direct[name], cached[name]) for name in direct):
+        raise AssertionError("Cached evaluation differs from direct evaluation")
+    if cache.stats()["misses"] != 6 or cache.stats()["evictions"] != 2 or len(cache) != 4:
+        raise AssertionError(f"Unexpected cache stats after first batch: {cache.stats()}")
+    # Genes of empty lots are ignored by the canonical key.
+    cache.evaluate(model, qty[2:], np.where(qty > 0, option, 0)[2:], np.where(qty > 0, priority, 0.5)[2:], weights)
+    if cache.stats()["hits"] != 4:
+        raise AssertionError(f"Expected canonical hits for re-encoded plans, got: {cache.stats()}")
+    pid = _post_frame(_multi_week_payload())
+    body = {"seed": 1, "population_size": 10, "generations": 30, "commit": False}
+    stats = API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json=body).json()["cache"]
+    if stats["hits"] + stats["misses"] != 10 * 31 + 1 or stats["hits"] == 0:
+        raise AssertionError(f"Unexpected optimize cache stats: {stats}")
+
+
+def scenario_kpi_engine() -> None:
+    # TR: KPI motorunun stok dengesi, zamaninda karsilama ve stok satiri capraz kontrolunu test eder.
+    # EN: Tests the KPI engine's stock balance, on-time fulfillment and inventory cross-check.
+    index = build_frame_index(load_problem_frame(load_json(DATA_DIR / "problemFrame.json")))
+    report = compute_kpis(index)
+    if report.closing[0, 0] != index.initial_stock[0] + report.production[0, 0] - index.demand[0, 0]:
+        raise AssertionError("Closing stock should follow opening + production - demand")
+    served = np.clip(report.opening + report.production, 0.0, report.demand)
+    if not np.allclose(report.served, served) or report.fulfillment_rate > 1:
+        raise AssertionError(f"Unexpected fulfillment: {report.fulfillment_rate}")
+    # The sample inventory row reports values that do not match the balance.
+    if report.mismatch_count != 3 or {m["field"] for m in report.mismatches} != {"opening_stock", "production_qty", "closing_stock"}:
+        raise AssertionError(f"Unexpected inventory mismatches: {report.mismatches}")
+    if report.makespan_hours is None or report.makespan_hours <= 0 or not (report.busy > 0).any():
+        raise AssertionError("Expected makespan and machine busy minutes from lot timestamps")
+    pid = _post_frame(_multi_week_payload())
+    API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"seed": 3, "generations": 20})
+    kpis = API_CLIENT.post(f"/frame/{pid}/evaluate").json()["kpis"]
+    if kpis["inventory_mismatches"] != 0 or not kpis["machine_utilization"]:
+        raise AssertionError(f"Optimized state should balance its own inventory rows: {kpis}")
+
+
+def scenario_state_patch() -> None:
+    # TR: PATCH /frame/{id}/state ile lot bazli ekle/guncelle/sil ve artimli KPI guncellemesini test eder.
+    # EN: Tests lot-level insert/update/delete via PATCH /frame/{id}/state and the incremental KPI update.
+    pid = _post_frame(_multi_week_payload())
+    API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"seed": 3, "generations": 20})
+    lots = API_CLIENT.get(f"/frame/{pid}").json()["state"]["lots"]
+    moved = dict(lots[0], week="CW46_25", qty=lots[0]["qty"] + 500)
+    added = dict(lots[-1], lot_id="NEW", qty=250.0)
+    patch = {"upsert": [moved, added], "delete": [lots[1]["lot_id"]]}
+    resp = API_CLIENT.patch(f"/frame/{pid}/state", json=patch)
+    body = resp.json()
+    if resp.status_code != 200 or (body["inserted"], body["updated"], body["deleted"]) != (1, 1, 1):
+        raise AssertionError(f"PATCH /frame/{{id}}/state failed: {resp.text}")
+    state = API_CLIENT.get(f"/frame/{pid}").json()["state"]
+    ids = [lot["lot_id"] for lot in state["lots"]]
+    if ids != [lots[0]["lot_id"]] + [lot["lot_id"] for lot in lots[2:]] + ["NEW"] or state["lots"][0]["week"] != "CW46_25":
+        raise AssertionError(f"Updates should stay in place and inserts append: {ids}")
+    frame = load_problem_frame(API_CLIENT.get(f"/frame/{pid}").json())
+    index = build_frame_index(frame)
+    full = evaluate_frame(frame, index, build_capacity_timeline(frame, index))["kpis"]
+    for key in ("total_qty", "fulfilled_on_time", "backlog_unit_weeks", "ending_stock", "makespan_hours"):
+        if not np.isclose(body["kpis"][key], full[key]):
+            raise AssertionError(f"Incremental {key} {body['kpis'][key]} != full recompute {full[key]}")
+    if body["kpis"]["machine_utilization"].keys() != full["machine_utilization"].keys() or not np.allclose(
+        list(body["kpis"]["machine_utilization"].values()), list(full["machine_utilization"].values())
+    ):
+        raise AssertionError("Incremental machine utilization should match a full recompute")
+    if full["inventory_mismatches"] != 0 or body["kpis"]["inventory_mismatches"] != 0:
+        raise AssertionError("Inventory rows of touched products should be rewritten from the new balance")
+    if API_CLIENT.post(f"/frame/{pid}/evaluate").json()["kpis"]["total_qty"] != body["kpis"]["total_qty"]:
+        raise AssertionError("Evaluate should reuse the patched KPIs")
+    bad = API_CLIENT.patch(f"/frame/{pid}/state", json={"upsert": [dict(moved, product_code="NOPE")]})
+    if bad.status_code != 400 or "NOPE" not in bad.text:
+        raise AssertionError(f"Expected touched lots to be validated: {bad.text}")
+    for invalid in ({"delete": ["missing"]}, {"upsert": [added], "delete": ["NEW"]}, {"upsert": [dict(added, lot_id=None)]}):
+        if API_CLIENT.patch(f"/frame/{pid}/state", json=invalid).status_code != 400:
+            raise AssertionError(f"Expected 400 for {invalid}")
+    if API_CLIENT.get(f"/frame/{pid}").json()["state"] != state:
+        raise AssertionError("Rejected patches must not change the state")
+    if API_CLIENT.patch("/frame/nope/state", json={"delete": []}).status_code != 404:
+        raise AssertionError("Expected 404 for an unknown frame")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = FrameManager(ProblemRepository(base_path=tmp))
+        pid = manager.save(load_problem_frame(_multi_week_payload()))
+        index = manager.index(pid)
+        sizes = [len(index.products), len(index.machines), len(index.molds)]
+        lot = dict(added, product_code="NOPE", resources=[{"type": "machine", "id": "M_NEW"}, {"type": "mold", "id": "K_NEW"}])
+        try:
+            manager.patch_state(pid, StatePatch(upsert=[lot]))
+            raise AssertionError("Expected the unknown product to be rejected")
+        except ValueError:
+            pass
+        if manager.index(pid) is not index or [len(index.products), len(index.machines), len(index.molds)] != sizes:
+            raise AssertionError("A rejected patch must not intern codes into the cached index")
+
+
+def scenario_api_frame_views() -> None:
+    # TR: GET /frame icin alan projeksiyonu, filtreli lot sayfalama, ETag/304 ve gzip yanitlarini test eder.
+    # EN: Tests field projection, filtered lot paging, ETag/304 and gzip responses for GET /frame.
+    pid = _post_frame(_multi_week_payload())
+    API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"seed": 3, "generations": 20})
+    full = API_CLIENT.get(f"/frame/{pid}")
+    lots = full.json()["state"]["lots"]
+    if full.headers.get("content-encoding") != "gzip" or not full.headers.get("etag"):
+        raise AssertionError(f"Expected a compressed frame with an etag: {dict(full.headers)}")
+    meta = API_CLIENT.get(f"/frame/{pid}?fields=state.meta,problemData.problem_meta").json()
+    if meta != {"state": {"meta": full.json()["state"]["meta"]},
+                "problemData": {"problem_meta": full.json()["problemData"]["problem_meta"]}}:
+        raise AssertionError(f"Unexpected projection: {meta}")
+    if API_CLIENT.get(f"/frame/{pid}?fields=state,state.lots").json() != {"state": full.json()["state"]}:
+        raise AssertionError("A parent field should cover its children")
+    if API_CLIENT.get(f"/frame/{pid}?fields=state.model_dump").status_code != 400:
+        raise AssertionError("Unknown fields should be rejected")
+    documented = API_CLIENT.get("/openapi.json").json()["paths"]["/frame/{frame_id}"]["get"]["responses"]
+    if "schema" in documented["200"]["content"]["application/json"] or "304" not in documented:
+        raise AssertionError(f"GET /frame should not promise a full ProblemFrame body: {documented}")
+    etag = full.headers["etag"]
+    cached = API_CLIENT.get(f"/frame/{pid}?fields=state.meta", headers={"If-None-Match": etag})
+    if cached.status_code != 304 or cached.content:
+        raise AssertionError(f"Expected 304 for an unchanged frame: {cached.status_code}")
+    paged, cursor = [], 0
+    while cursor is not None:
+        page = API_CLIENT.get(f"/frame/{pid}/lots?limit=3&product=P1&cursor={cursor}").json()
+        paged += page["lots"]
+        cursor = page["next_cursor"]
+    if paged != [lot for lot in lots if lot["product_code"] == "P1"] or page["total"] != len(paged):
+        raise AssertionError("Paging over P1 lots should return each of them once, in order")
+    machine = str(lots[0]["resources"][0]["id"])
+    page = API_CLIENT.get(f"/frame/{pid}/lots?machine={machine}&week={lots[0]['week']}").json()
+    expected = [lot for lot in lots if lot["week"] == lots[0]["week"]
+                and any(r["type"] == "machine" and str(r["id"]) == machine for r in lot["resources"])]
+    if page["lots"] != expected or page["next_cursor"] is not None:
+        raise AssertionError(f"Unexpected machine/week filter result: {page}")
+    API_CLIENT.patch(f"/frame/{pid}/state", json={"delete": [lots[0]["lot_id"]]})
+    changed = API_CLIENT.get(f"/frame/{pid}?fields=state.meta", headers={"If-None-Match": etag})
+    if changed.status_code != 200 or changed.headers["etag"] == etag:
+        raise AssertionError("A state change should produce a new etag")
+    if API_CLIENT.get("/frame/nope/lots").status_code != 404:
+        raise AssertionError("Expected 404 for an unknown frame")
+
+
+def scenario_capacity_timeline() -> None:
+    # TR: Vardiya/takvim genislemesini, tatil gunlerini, makine vardiyalarini ve zaman damgasi aramasini test eder.
+    # EN: Tests shift/calendar expansion, holidays, machine shifts and timestamp lookup.
+    payload = _multi_week_payload()
+    data = payload["problemData"]
+    data["shift_templates"] = [
+        {"code": "S3", "segments": [
+            {"code": "DAY", "start": "06:00", "end": "14:00"},
+            {"code": "EVENING", "start": "14:00", "end": "22:00"},
+            {"code": "NIGHT", "start": "22:00", "end": "06:00", "constraints": ["NO_MOLD_CHANGE_AT_NIGHT"]},
+        ]},
+        {"code": "S1", "segments": [{"code": "DAY", "start": "08:00", "end": "16:00"}]},
+    ]
+    data["work_calendar"] = [
+        {"date": "2025-12-01", "shift_templates_code": "S1"},
+        {"date": "2025-12-02", "shift_templates_code": "S3", "holiday": True},
+    ]
+    data["resources"]["machine"][1]["shifts"] = ["DAY"]
+    data["resources"]["machine"][1]["weekly_capacity"] = {"CW46_25": 1234}
+    frame = load_problem_frame(payload)
+    index = build_frame_index(frame)
+    timeline = build_capacity_timeline(frame, index)
+    # Week 1: 7 S3 days; the last night spills 6h into week 2. Week 2: spill,
+    # one S1 day, one holiday, five S3 days (again spilling 6h).
+    if timeline.capacity[0, 0] != 7 * 1440 - 360 or timeline.capacity[0, 1] != 360 + 480 + 5 * 1440 - 360:
+        raise AssertionError(f"Unexpected S3 capacity: {timeline.capacity[0]}")
+    if timeline.capacity[1, 0] != 7 * 480 or timeline.capacity[1, 3] != 1234:
+        raise AssertionError(f"Machine shifts / weekly_capacity not applied: {timeline.capacity[1]}")
+    night = index.bucket_start[0] + 23 * 3600
+    day = index.bucket_start[0] + 9 * 3600
+    if not timeline.covered_by(np.array([night]), "NO_MOLD_CHANGE_AT_NIGHT")[0]:
+        raise AssertionError("Night timestamp should be covered by NO_MOLD_CHANGE_AT_NIGHT")
+    if timeline.covered_by(np.array([day]), "NO_MOLD_CHANGE_AT_NIGHT")[0]:
+        raise AssertionError("Day timestamp should not be covered by the night constraint")
+    available = timeline.machine_available(np.array([1, 1]), np.array([day, night]))
+    if available.tolist() != [True, False]:
+        raise AssertionError(f"Machine 13 only works DAY shifts, got: {available}")
+    holiday_noon = index.bucket_start[1] + 86400 + 12 * 3600
+    if timeline.locate(np.array([holiday_noon]))[0] != MISSING:
+        raise AssertionError("Holiday should have no covering segment")
+    bad = deep_copy(payload)
+    bad["problemData"]["shift_templates"][0]["segments"][0]["start"] = "8h"
+    if API_CLIENT.post("/frame", json=bad).status_code != 400:
+        raise AssertionError("Invalid shift times should be rejected")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = FrameManager(ProblemRepository(base_path=tmp))
+        pid = manager.save(frame)
+        cached = manager.timeline(pid)
+        manager.update_state(pid, State())
+        if manager.timeline(pid) is not cached or not np.array_equal(cached.capacity, timeline.capacity):
+            raise AssertionError("Timeline should be cached per frame and survive state updates")
+
+
+def scenario_constraint_kernels() -> None:
+    # TR: Senaryo kisitlarinin cekirdeklere derlendigini, pasiflerin atlandigini ve tabu artimsal cezasinin tutarli kaldigini test eder.
+    # EN: Tests scenario constraints compile to kernels, inactive ones are skipped and tabu penalties stay consistent.
+    payload = _multi_week_payload()
+    payload["scenarioConfig"]["constraints"]["MAX_OVERTIME"] = {"type": "soft", "weight": 1.0}
+    payload["scenarioConfig"]["constraints"]["MIN_LOT_SIZE"] = {"type": "soft", "active": False}
+    frame = load_problem_frame(payload)
+    index = build_frame_index(frame)
+    timeline = build_capacity_timeline(frame, index)
+    model = build_planning_model(index, timeline)
+    compiled = compile_constraints(frame.scenarioConfig.constraints, model.capacity, timeline)
+    if [k.code for k in compiled.kernels] != ["DEMAND_SATISFACTION_PER_WEEK", "NO_MOLD_CHANGE_AT_NIGHT", "SHIFT_TEMPLATES"]:
+        raise AssertionError(f"Unexpected kernels: {compiled.describe()}")
+    if compiled.skipped != ["MIN_LOT_SIZE"] or compiled.unsupported != ["MAX_OVERTIME"]:
+        raise AssertionError(f"Unexpected skipped/unsupported: {compiled.skipped} {compiled.unsupported}")
+    # Two lots with different molds on machine 12 at the start of week 2 (night
+    # shift) -> one night mold change; moving P2 to machine 13 removes it.
+    qty = np.zeros((2,) + model.shape)
+    qty[:, :, 1] = 100.0
+    option = np.zeros(qty.shape, dtype=np.int32)
+    option[1, 1, 1] = 1
+    priority = np.zeros(qty.shape)
+    priority[:, 1, 1] = 0.5
+    weights = OptimizeConfig().weights
+    result = evaluate_population(model, qty, option, priority, weights, compiled)
+    if result["NO_MOLD_CHANGE_AT_NIGHT_raw"].tolist() != [1.0, 0.0]:
+        raise AssertionError(f"Unexpected night mold changes: {result['NO_MOLD_CHANGE_AT_NIGHT_raw']}")
+    plain = evaluate_population(model, qty, option, priority, weights)
+    if not np.allclose(result["objective"], plain["objective"] + result["constraints"]):
+        raise AssertionError("Constraint penalties should add to the objective")
+    config = OptimizeConfig(engine="tabu", seed=2, neighborhood_size=8)
+    # Night kernel active: partly batch-scored; without it every kernel scores by delta.
+    incremental = compile_constraints(
+        [c for c in frame.scenarioConfig.constraints if c.code != "NO_MOLD_CHANGE_AT_NIGHT"], model.capacity, timeline
+    )
+    for constraints in (compiled, incremental):
+        search = TabuSearch(model, config, np.random.default_rng(2), constraints=constraints)
+        search.run(150, time.perf_counter() + 10)
+        full = evaluate_population(model, search.qty[None], search.option[None], search.priority[None], weights, constraints)
+        if abs(float(full["objective"][0]) - search.current) > 1e-6 * max(1.0, abs(search.current)):
+            raise AssertionError(f"Tabu penalty drifted: {search.current} vs {full['objective'][0]}")
+    pid = _post_frame(payload)
+    body = API_CLIENT.post(f"/frame/{pid}/evaluate").json()["constraints"]
+    if [row["code"] for row in body["breakdown"]] != [k.code for k in compiled.kernels]:
+        raise AssertionError(f"Unexpected evaluate constraint breakdown: {body}")
+    duplicated = frame.scenarioConfig.constraints + [frame.scenarioConfig.constraints[0]]
+    try:
+        compile_constraints(duplicated, model.capacity, timeline)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected duplicate constraint codes to be rejected")
+    try:
+        ConstraintKernel(frame.scenarioConfig.constraints[0], model.capacity, timeline)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("ConstraintKernel should be abstract")
+
+
+def _wait_job(job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = API_CLIENT.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def scenario_synthetic_benchmark() -> None:
+    # TR: Sentetik ureticinin tohumla ayni gecerli cerceveyi urettigini ve benchmark karsilastirmasini test eder.
+    # EN: Tests the seeded generator yields the same valid frame and the benchmark baseline comparison.
+    config = GeneratorConfig(products=6, steps=2, machines=3, molds=5, weeks=3, order_lines=40, lots=60, seed=4)
+    payload = generate_problem_frame(config)
+    if payload != generate_problem_frame(config) or payload == generate_problem_frame(config.model_copy(update={"seed": 5})):
+        raise AssertionError("The generator should be deterministic per seed")
+    frame = load_problem_frame(deep_copy(payload))
+    errors = validate_references(frame)
+    if errors or len(frame.state.lots) != 60 or sum(len(g.orders) for g in frame.problemData.orders) != 40:
+        raise AssertionError(f"Generated frame should be valid and sized as asked: {errors[:5]}")
+    configs = {"a": config, "b": config.model_copy(update={"products": 30, "order_lines": 400, "lots": 600})}
+    result = run_benchmarks(["a", "b"], ["ingest", "evaluate", "api_get"], repeat=1, configs=configs)
+    rows = result["results"]
+    if [row["size"] for row in rows] != ["a", "b"] or set(rows[1]["stages"]) != {"ingest", "evaluate", "api_get"}:
+        raise AssertionError(f"Unexpected benchmark result: {rows}")
+    if "ingest" not in result["scaling"] or rows[1]["records"] <= rows[0]["records"]:
+        raise AssertionError(f"Expected scaling exponents between sizes: {result['scaling']}")
+    baseline = json.loads(json.dumps(result))
+    for timing in baseline["results"][1]["stages"].values():
+        timing["median_sec"] /= 10
+    report = compare(result, baseline, threshold=1.5, min_seconds=0)
+    slow = {entry["stage"] for entry in report["regressions"]}
+    if len(report["compared"]) != 6 or len(slow) != 3 or any(entry["size"] != "b" for entry in report["regressions"]):
+        raise AssertionError(f"Unexpected baseline comparison: {report}")
+
+
+def scenario_metrics_profile() -> None:
+    # TR: Asama zamanlayicisini, /metrics Prometheus ciktisini ve ?profile=1 asama dokumunu test eder.
+    # EN: Tests the stage timer, the Prometheus /metrics output and the ?profile=1 stage breakdown.
+    histogram = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, stage="x")
+    lines = histogram.render()
+    if 't_seconds_bucket{stage="x",le="1.0"} 3' not in lines or 't_seconds_count{stage="x"} 4' not in lines:
+        raise AssertionError(f"Histogram buckets should be cumulative: {lines}")
+    before = OPTIMIZER_ITERATIONS.value(engine="ga")
+    resp = API_CLIENT.post("/frame?profile=1", json=load_json(DATA_DIR / "problemFrame.json"))
+    stages = [record["stage"] for record in resp.json().get("profile", {}).get("stages", [])]
+    if resp.status_code != 200 or not {"adapter.validate", "frame.validate", "frame.timeline"} <= set(stages):
+        raise AssertionError(f"Expected an inline stage breakdown: {stages}")
+    if "adapter.validate;dur=" not in resp.headers.get("server-timing", ""):
+        raise AssertionError(f"Expected a Server-Timing header: {dict(resp.headers)}")
+    pid = resp.json()["id"]
+    if "profile" in API_CLIENT.post(f"/frame/{pid}/evaluate").json():
+        raise AssertionError("Profiles are opt-in")
+    API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"seed": 1, "generations": 7, "population_size": 6})
+    if OPTIMIZER_ITERATIONS.value(engine="ga") - before != 7:
+        raise AssertionError("Every GA generation should be counted")
+    text = API_CLIENT.get("/metrics").text
+    for needle in (
+        'planner_stage_seconds_bucket{stage="adapter.validate",le="+Inf"}',
+        'planner_http_request_seconds_count{method="POST",route="/frame/{frame_id}/evaluate",status="200"}',
+        'planner_optimizer_iteration_seconds_count{engine="ga"}',
+        "planner_frame_cache_hits ",
+        "planner_persistence_queue_depth ",
+    ):
+        if needle not in text:
+            raise AssertionError(f"Missing {needle} in /metrics")
+
+
+def scenario_api_sweep() -> None:
+    # TR: Tek bir cerceve uzerinde ScenarioConfig varyantlarinin karsilastirma tablosunu test eder.
+    # EN: Tests the comparison table for ScenarioConfig variants of one stored frame.
+    pid = _post_frame(_multi_week_payload())
+    API_CLIENT.post(f"/frame/{pid}/optimize?wait=true", json={"seed": 3, "generations": 20})
+    state = API_CLIENT.get(f"/frame/{pid}").json()["state"]
+    base = load_json(DATA_DIR / "problemFrame.json")["scenarioConfig"]
+    variants = [
+        base,
+        {"constraints": [{"code": "SHIFT_TEMPLATES", "type": "soft", "weight": 50.0}]},
+        {"constraints": [{"code": "SHIFT_TEMPLATES", "type": "hard", "active": False}]},
+    ]
+    resp = API_CLIENT.post(f"/frame/{pid}/sweep", json={"variants": variants})
+    body = resp.json()
+    if resp.status_code != 200 or len(body["rows"]) != 3 or "order_fulfillment_rate" not in body["kpis"]:
+        raise AssertionError(f"POST /frame/{{id}}/sweep failed: {resp.text}")
+    rows = body["rows"]
+    if rows[1]["name"] != "variant_1" or rows[2]["skipped"] != ["SHIFT_TEMPLATES"] or rows[2]["penalty"] != 0:
+        raise AssertionError(f"Unexpected evaluate rows: {rows}")
+    if not np.isclose(rows[1]["constraints"]["SHIFT_TEMPLATES"], 5 * rows[0]["constraints"]["SHIFT_TEMPLATES"]):
+        raise AssertionError("Variant weights should scale the same violations")
+    body = {"variants": variants[1:], "mode": "optimize", "workers": 2,
+            "optimize": {"seed": 1, "generations": 5, "population_size": 6, "time_limit_sec": 30}}
+    resp = API_CLIENT.post(f"/frame/{pid}/sweep", json=body)
+    rows = resp.json().get("rows", [])
+    if resp.status_code != 200 or len(rows) != 2 or sorted(resp.json()["ranking"]) != [0, 1]:
+        raise AssertionError(f"Optimize sweep failed: {resp.text}")
+    if any(row["kpis"]["total_demand"] != 45000 or row["iterations"] != 5 for row in rows):
+        raise AssertionError(f"Each variant should be optimized against the same master data: {rows}")
+    workers = min(2, MAX_SWEEP_WORKERS)
+    if (resp.json()["workers"], resp.json()["variant_budget_sec"]) != (workers, 30 / -(-2 // workers)):
+        raise AssertionError(f"Unexpected sweep workers / budget: {resp.text}")
+    if variant_budget(5.0, 500, 4) != 0.04 or variant_budget(5.0, 3, 4) != 5.0:
+        raise AssertionError("The variant budget should keep the whole sweep within time_limit_sec")
+    if API_CLIENT.get(f"/frame/{pid}").json()["state"] != state:
+        raise AssertionError("A sweep must not commit any state")
+    bad = dict(body, optimize={"workers": 2})
+    if API_CLIENT.post(f"/frame/{pid}/sweep", json=bad).status_code != 400:
+        raise AssertionError("Nested island runs should be rejected")
+    duplicate = {"constraints": [{"code": "SHIFT_TEMPLATES", "type": "soft"}] * 2}
+    for mode in ("evaluate", "optimize"):
+        dup = {"variants": [variants[1], duplicate], "mode": mode, "optimize": body["optimize"]}
+        resp = API_CLIENT.post(f"/frame/{pid}/sweep", json=dup)
+        if resp.status_code != 400 or "Variant 1: Duplicate active constraint" not in resp.text:
+            raise AssertionError(f"Expected 400 for duplicate constraint codes ({mode}): {resp.text}")
+    if API_CLIENT.post("/frame/nope/sweep", json={"variants": variants}).status_code != 404:
+        raise AssertionError("Expected 404 for an unknown frame")
+
+
+def scenario_api_optimize_job() -> None:
+    # TR: Asenkron optimizasyon isinin 202 donup tamamlandiginda State'i kaydettigini test eder.
+    # EN: Tests an async optimization job returns 202 and commits the State when it completes.
+    pid = _post_frame(_multi_week_payload())
+    body = {"seed": 2, "population_size": 8, "generations": 20, "time_limit_sec": 10}
+    resp = API_CLIENT.post(f"/frame/{pid}/optimize", json=body)
+    if resp.status_code != 202 or resp.json()["status"] not in ("queued", "running"):
+        raise AssertionError(f"Expected 202 with a queued job, got: {resp.status_code} {resp.text}")
+    job = _wait_job(resp.json()["id"])
+    if job["status"] != "completed" or job["iteration"] != 20 or job["best_objective"] is None:
+        raise AssertionError(f"Unexpected job outcome: {job}")
+    if "state" in job["result"] or abs(job["result"]["objective"] - job["best_objective"]) > 1e-6:
+        raise AssertionError(f"Job result should summarize the best objective without the state: {job}")
+    if API_CLIENT.get(f"/frame/{pid}").json()["state"]["meta"].get("iteration") != 20:
+        raise AssertionError("Completed job should commit its State")
+    events = API_CLIENT.get(f"/jobs/{job['id']}/events").text
+    if "event: improvement" not in events or not events.rstrip().split("\n\n")[-1].startswith("event: done"):
+        raise AssertionError(f"Unexpected event stream: {events}")
+    if API_CLIENT.get("/jobs/missing").status_code != 404:
+        raise AssertionError("Expected 404 for an unknown job")
+    if API_CLIENT.post(f"/frame/{pid}/optimize", json={"population_size": 1}).status_code != 400:
+        raise AssertionError("Invalid payloads should be rejected before queueing")
+
+
+def scenario_api_optimize_job_cancel() -> None:
+    # TR: Uzun suren bir isin DELETE ile is birlikci olarak iptal edildigini ve State yazmadigini test eder.
+    # EN: Tests a long job is cooperatively cancelled via DELETE and does not commit a State.
+    pid = _post_frame(_multi_week_payload())
+    before = API_CLIENT.get(f"/frame/{pid}").json()["state"]
+    body = {"engine": "tabu", "seed": 4, "iterations": 10**9, "time_limit_sec": 60}
+    job_id = API_CLIENT.post(f"/frame/{pid}/optimize", json=body).json()["id"]
+    time.sleep(0.2)
+    if API_CLIENT.delete(f"/jobs/{job_id}").status_code != 200:
+        raise AssertionError("DELETE /jobs/{id} failed")
+    job = _wait_job(job_id, timeout=10)
+    if job["status"] != "cancelled":
+        raise AssertionError(f"Expected cancelled job, got: {job}")
+    if API_CLIENT.get(f"/frame/{pid}").json()["state"] != before:
+        raise AssertionError("Cancelled job must not commit a State")
+
+
+
+def scenario_islands_cancel() -> None:
+    # TR: Ilk epoktan once iptal edilen ada isinin FAILED degil CANCELLED olarak bittigini test eder.
+    # EN: Tests an island run cancelled before its first epoch ends CANCELLED, not FAILED.
+    payload = _multi_week_payload()
+    model = build_planning_model(build_frame_index(load_problem_frame(payload)))
+    config = parse_config({"seed": 1, "workers": 2, "population_size": 6, "generations": 4})
+    control = SearchControl()
+    control.cancel()
+    result = run_islands(model, config, np.random.default_rng(1), time.perf_counter() + 60, control=control)
+    if result.iterations != 0 or not np.isfinite(result.objective):
+        raise AssertionError(f"Expected the seeded solution back, got {result.iterations} iterations")
+    pid = _post_frame(payload)
+    body = {"seed": 1, "workers": 2, "population_size": 6, "generations": 10**6, "time_limit_sec": 60}
+    job_id = API_CLIENT.post(f"/frame/{pid}/optimize", json=body).json()["id"]
+    API_CLIENT.delete(f"/jobs/{job_id}")
+    job = _wait_job(job_id, timeout=30)
+    if job["status"] != "cancelled" or job["error"] is not None:
+        raise AssertionError(f"Expected cancelled islands job, got: {job}")
+
+
+
+def scenario_job_cancel_on_error() -> None:
+    # TR: Iptal sirasinda hata firlatan bir aramanin isi FAILED degil CANCELLED yaptigini test eder.
+    # EN: Tests a search that raises while being cancelled leaves the job CANCELLED, not FAILED.
+    class RaisingFrames:
+        def __init__(self, cancel: bool) -> None:
+            self.cancel = cancel
+
+        def get(self, frame_id: str):
+            if self.cancel:
+                job.control.cancel()
+            raise RuntimeError("search stopped")
+
+    for cancel, status in ((True, "cancelled"), (False, "failed")):
+        job = OptimizationJob("F1", {})
+        JobManager(RaisingFrames(cancel))._run(job)
+        if job.status != status or (job.error is None) != cancel:
+            raise AssertionError(f"Expected a {status} job, got: {job.to_dict()}")
+
+
 if __name__ == "__main__":
     scenarios = [
         ("basic_validation", scenario_basic_validation),
@@ -195,6 +1303,36 @@ if __name__ == "__main__":
         ("incompatible_machine_mold", scenario_incompatible_machine_mold),
         ("constraints_dict_normalization", scenario_constraints_dict_normalization),
         ("repository_save_load", scenario_repository_save_load),
+        ("repository_state_versions", scenario_repository_state_versions),
+        ("trusted_lazy_load", scenario_trusted_lazy_load),
+        ("write_behind_repository", scenario_write_behind_repository),
+        ("stream_ingest", scenario_stream_ingest),
+        ("api_frames_batch", scenario_api_frames_batch),
+        ("plan_table_columns", scenario_plan_table_columns),
+        ("frame_index_interning", scenario_frame_index_interning),
+        ("compatibility_index", scenario_compatibility_index),
+        ("frame_index_cache", scenario_frame_index_cache),
+        ("frame_cache_bounds", scenario_frame_cache_bounds),
+        ("batch_validation_cap", scenario_batch_validation_cap),
+        ("api_optimize_ga", scenario_api_optimize_ga),
+        ("tabu_delta_consistency", scenario_tabu_delta_consistency),
+        ("ga_pull_mutation", scenario_ga_pull_mutation),
+        ("lot_sizing", scenario_lot_sizing),
+        ("bom_requirements", scenario_bom_requirements),
+        ("api_optimize_islands", scenario_api_optimize_islands),
+        ("fitness_cache", scenario_fitness_cache),
+        ("kpi_engine", scenario_kpi_engine),
+        ("state_patch", scenario_state_patch),
+        ("api_frame_views", scenario_api_frame_views),
+        ("capacity_timeline", scenario_capacity_timeline),
+        ("constraint_kernels", scenario_constraint_kernels),
+        ("synthetic_benchmark", scenario_synthetic_benchmark),
+        ("metrics_profile", scenario_metrics_profile),
+        ("api_sweep", scenario_api_sweep),
+        ("api_optimize_job", scenario_api_optimize_job),
+        ("api_optimize_job_cancel", scenario_api_optimize_job_cancel),
+        ("islands_cancel", scenario_islands_cancel),
+        ("job_cancel_on_error", scenario_job_cancel_on_error),
     ]
     for name, fn in scenarios:
         fn()